@@ -0,0 +1,26 @@
+-- Script para adicionar o indicador de contrato cancelado
+-- Execute este script no Supabase Dashboard (SQL Editor)
+
+-- Contrato cancelado = TODAS as suas comissões no Sienge estão canceladas.
+-- Calculado uma vez por sincronização (sync_comissoes), em vez de a cada consulta.
+ALTER TABLE sienge_contratos
+ADD COLUMN IF NOT EXISTS cancelado BOOLEAN DEFAULT FALSE;
+
+-- Preencher a partir das comissões já gravadas
+UPDATE sienge_contratos ct
+SET cancelado = TRUE
+WHERE EXISTS (
+    SELECT 1 FROM sienge_comissoes c
+    WHERE c.numero_contrato = ct.numero_contrato AND c.building_id = ct.building_id
+)
+AND NOT EXISTS (
+    SELECT 1 FROM sienge_comissoes c
+    WHERE c.numero_contrato = ct.numero_contrato AND c.building_id = ct.building_id
+      AND UPPER(COALESCE(c.installment_status, '')) NOT LIKE '%CANCEL%'
+);
+
+-- Listagens e buscas só leem contratos não cancelados
+CREATE INDEX IF NOT EXISTS idx_contratos_ativos ON sienge_contratos (building_id, numero_contrato)
+WHERE cancelado IS NOT TRUE;
+
+COMMENT ON COLUMN sienge_contratos.cancelado IS 'TRUE quando todas as comissões do contrato estão canceladas (calculado na sincronização)';
@@ -0,0 +1,50 @@
+-- Script para adicionar as colunas do gatilho calculado na sincronização
+-- Execute este script no Supabase Dashboard (SQL Editor)
+
+-- Valor que o contrato precisa ter pago para liberar a comissão
+ALTER TABLE sienge_comissoes
+ADD COLUMN IF NOT EXISTS valor_gatilho DECIMAL(15,2);
+
+-- Se o valor pago já atingiu o gatilho
+ALTER TABLE sienge_comissoes
+ADD COLUMN IF NOT EXISTS atingiu_gatilho BOOLEAN DEFAULT FALSE;
+
+-- Quando atingiu_gatilho passou para verdadeiro
+ALTER TABLE sienge_comissoes
+ADD COLUMN IF NOT EXISTS data_atingiu_gatilho TIMESTAMPTZ;
+
+-- Mesma informação no modelo de leitura
+ALTER TABLE comissoes_enriquecidas
+ADD COLUMN IF NOT EXISTS data_atingiu_gatilho TIMESTAMPTZ;
+
+-- Filtro de gatilho da listagem de comissões
+CREATE INDEX IF NOT EXISTS idx_comissoes_atingiu_gatilho ON sienge_comissoes (atingiu_gatilho);
+
+-- Comentários nas colunas
+COMMENT ON COLUMN sienge_comissoes.valor_gatilho IS 'Valor do gatilho pela regra da comissão (calculado na sincronização)';
+COMMENT ON COLUMN sienge_comissoes.atingiu_gatilho IS 'Valor pago do contrato >= valor_gatilho (calculado na sincronização)';
+COMMENT ON COLUMN sienge_comissoes.data_atingiu_gatilho IS 'Data em que o gatilho foi atingido';
+
+-- Gravação em lote da avaliação de gatilhos (supabase.rpc('gravar_gatilhos_comissoes', ...)).
+-- Só atualiza: uma comissão apagada entre a leitura e a gravação não é recriada.
+-- p_linhas: [{"id": ..., "valor_gatilho": ..., "atingiu_gatilho": ..., "data_atingiu_gatilho": ...}]
+CREATE OR REPLACE FUNCTION gravar_gatilhos_comissoes(p_linhas JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH alteradas AS (
+        UPDATE sienge_comissoes c
+        SET valor_gatilho = l.valor_gatilho,
+            atingiu_gatilho = l.atingiu_gatilho,
+            data_atingiu_gatilho = l.data_atingiu_gatilho
+        FROM jsonb_to_recordset(p_linhas) AS l(
+            id BIGINT,
+            valor_gatilho DECIMAL(15,2),
+            atingiu_gatilho BOOLEAN,
+            data_atingiu_gatilho TIMESTAMPTZ
+        )
+        WHERE c.id = l.id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM alteradas;
+$$;
@@ -0,0 +1,23 @@
+-- Script para adicionar os documentos normalizados dos corretores
+-- Execute este script no Supabase Dashboard (SQL Editor)
+
+-- CPF e CNPJ só com letras e números, em maiúsculas (mesma regra de
+-- documentos.normalizar_documento): quem tem os dois entra com qualquer um deles.
+-- Coluna gerada, então o banco a mantém sem depender da sincronização.
+ALTER TABLE sienge_corretores
+ADD COLUMN IF NOT EXISTS documentos TEXT[] GENERATED ALWAYS AS (
+    ARRAY_REMOVE(ARRAY[
+        NULLIF(UPPER(REGEXP_REPLACE(COALESCE(cpf, ''), '[^0-9A-Za-z]', '', 'g')), ''),
+        NULLIF(UPPER(REGEXP_REPLACE(COALESCE(cnpj, ''), '[^0-9A-Za-z]', '', 'g')), '')
+    ], NULL)
+) STORED;
+
+-- Índice GIN para a busca documentos @> ARRAY[documento] do login
+CREATE INDEX IF NOT EXISTS idx_corretores_documentos ON sienge_corretores USING GIN (documentos);
+
+COMMENT ON COLUMN sienge_corretores.documentos IS 'CPF e CNPJ normalizados (coluna gerada), usados na busca do login';
+
+-- Versão anterior deste script: a coluna documento (só o documento principal,
+-- gravada pela aplicação) foi substituída pela coluna gerada acima
+DROP INDEX IF EXISTS idx_corretores_documento;
+ALTER TABLE sienge_corretores DROP COLUMN IF EXISTS documento;
@@ -0,0 +1,12 @@
+-- Script para adicionar o username normalizado dos usuários
+-- Execute este script no Supabase Dashboard (SQL Editor)
+
+-- Username sem espaços nas pontas e em minúsculas: chave de busca do login.
+-- Coluna gerada: o banco a mantém em todo INSERT/UPDATE, inclusive nos já existentes
+ALTER TABLE usuarios
+ADD COLUMN IF NOT EXISTS username_normalizado TEXT GENERATED ALWAYS AS (LOWER(BTRIM(username))) STORED;
+
+-- Índice hash: o login só faz busca por igualdade
+CREATE INDEX IF NOT EXISTS idx_usuarios_username_normalizado ON usuarios USING HASH (username_normalizado);
+
+COMMENT ON COLUMN usuarios.username_normalizado IS 'LOWER(BTRIM(username)), usado na busca do login (mesma regra de AuthManager.autenticar)';
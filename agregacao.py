@@ -0,0 +1,150 @@
+"""
+Agregação - Sistema de Comissões Young
+Totais de comissões agrupados por dimensões (empreendimento × mês, corretor × regra...).
+
+A agregação usa o snapshot colunar quando disponível (numpy) e, sem ele, uma
+única passada pelas linhas do relatório. Os filtros são os mesmos do relatório
+e o resultado fica em cache por versão 'comissoes' de versao_dados: enquanto
+os dados não mudam, a mesma consulta não é recalculada.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from colunar import snapshot_comissoes
+from versao_dados import obter_versao
+
+CHAVE_VERSAO = 'comissoes'
+
+# Dimensões aceitas em group_by
+DIMENSOES = ('building', 'broker', 'regra', 'month', 'year', 'status_aprovacao', 'status_parcela', 'auditoria')
+
+# Métricas de valor_comissao aceitas em metric
+METRICAS = ('count', 'sum', 'avg', 'min', 'max')
+METRICAS_PADRAO = ['sum', 'count']
+
+MAX_DIMENSOES = 4
+MAX_ENTRADAS_CACHE = 256
+
+_cache: Dict[tuple, Dict] = {}
+_lock = threading.Lock()
+
+
+def validar_parametros(group_by: str, metric: str) -> Tuple[List[str], List[str]]:
+    """Dimensões e métricas da query string; ValueError com a mensagem para o usuário se inválidas"""
+    dimensoes = list(dict.fromkeys(d.strip() for d in (group_by or '').split(',') if d.strip()))
+    metricas = list(dict.fromkeys(m.strip() for m in (metric or '').split(',') if m.strip())) or METRICAS_PADRAO
+
+    invalidas = [d for d in dimensoes if d not in DIMENSOES]
+    if invalidas:
+        raise ValueError(f"group_by inválido: {', '.join(invalidas)}. Use: {', '.join(DIMENSOES)}")
+    if len(dimensoes) > MAX_DIMENSOES:
+        raise ValueError(f"Máximo de {MAX_DIMENSOES} dimensões em group_by")
+    invalidas = [m for m in metricas if m not in METRICAS]
+    if invalidas:
+        raise ValueError(f"metric inválido: {', '.join(invalidas)}. Use: {', '.join(METRICAS)}")
+
+    return dimensoes, metricas
+
+
+def agregar_comissoes(sync, dimensoes: List[str], metricas: List[str], filtros: Dict) -> Dict:
+    """
+    {'grupos': [{dimensões..., métricas...}], 'total': {métricas...}} das comissões
+    que passam nos filtros do relatório (ver filtros_relatorio em app.py)
+    """
+    # Com o snapshot, a chave usa a versão dos dados que ele tem de fato
+    snapshot = snapshot_comissoes.pronto(sync.supabase)
+    versao = snapshot.versao if snapshot else obter_versao(sync.supabase, CHAVE_VERSAO)
+    chave = (versao, tuple(dimensoes), tuple(metricas),
+             tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in filtros.items())))
+
+    if versao:
+        with _lock:
+            if chave in _cache:
+                return _cache[chave]
+
+    if snapshot:
+        resultado = snapshot.agregar(dimensoes, metricas, **filtros)
+    else:
+        resultado = agregar_linhas(sync.listar_relatorio_comissoes(**filtros), dimensoes, metricas)
+    resultado['grupos'] = ordenar_grupos(resultado['grupos'], dimensoes)
+
+    if versao:
+        with _lock:
+            # Resultados de versões anteriores não servem mais
+            for antiga in [k for k in _cache if k[0] != versao]:
+                del _cache[antiga]
+            if len(_cache) >= MAX_ENTRADAS_CACHE:
+                _cache.clear()
+            _cache[chave] = resultado
+    return resultado
+
+
+def agregar_linhas(linhas: Iterable[Dict], dimensoes: List[str], metricas: List[str]) -> Dict:
+    """Agregação em uma passada pelas linhas de comissoes_enriquecidas (sem numpy)"""
+    grupos: Dict[tuple, Dict] = {}
+    total = _acumulador({})
+
+    for linha in linhas:
+        campos = {}
+        for dimensao in dimensoes:
+            campos.update(_campos_linha(linha, dimensao))
+        chave = tuple(campos[d] for d in dimensoes)
+
+        valor = float(linha.get('valor_comissao') or 0)
+        grupo = grupos.get(chave)
+        if grupo is None:
+            grupo = grupos[chave] = _acumulador(campos)
+        for acumulador in (grupo, total):
+            acumulador['count'] += 1
+            acumulador['sum'] += valor
+            acumulador['min'] = valor if acumulador['min'] is None else min(acumulador['min'], valor)
+            acumulador['max'] = valor if acumulador['max'] is None else max(acumulador['max'], valor)
+
+    resultado_total = _metricas(total, metricas)
+    return {
+        'grupos': [{**g['campos'], **_metricas(g, metricas)} for g in grupos.values()],
+        'total': resultado_total
+    }
+
+
+def ordenar_grupos(grupos: List[Dict], dimensoes: List[str]) -> List[Dict]:
+    """Ordena pelos valores das dimensões, com nulos por último"""
+    return sorted(grupos, key=lambda g: tuple(
+        (g.get(d) is None, g.get(d) if g.get(d) is not None else 0) for d in dimensoes
+    ))
+
+
+def _campos_linha(linha: Dict, dimensao: str) -> Dict:
+    """Campos de saída de uma linha na dimensão (mesmo formato de SnapshotComissoes.agregar)"""
+    if dimensao == 'building':
+        valor = str(linha['building_id']) if linha.get('building_id') else None
+        return {'building': valor, 'building_nome': linha.get('empreendimento_nome')}
+    if dimensao == 'broker':
+        return {'broker': linha.get('broker_id'), 'broker_nome': linha.get('broker_nome')}
+    if dimensao == 'regra':
+        return {'regra': linha.get('regra_gatilho_id'), 'regra_nome': linha.get('regra_nome')}
+    if dimensao in ('month', 'year'):
+        data = linha.get('data_contrato')
+        return {dimensao: str(data)[:7 if dimensao == 'month' else 4] if data else None}
+    if dimensao == 'auditoria':
+        auditoria = linha.get('auditoria_aprovada')
+        return {'auditoria': 'pendente' if auditoria is None else ('sim' if auditoria else 'nao')}
+    if dimensao == 'status_parcela':
+        return {'status_parcela': linha.get('installment_status') or None}
+    return {dimensao: linha.get(dimensao) or None}
+
+
+def _acumulador(campos: Dict) -> Dict:
+    return {'campos': campos, 'count': 0, 'sum': 0.0, 'min': None, 'max': None}
+
+
+def _metricas(acumulador: Dict, metricas: List[str]) -> Dict:
+    valores = {
+        'count': acumulador['count'],
+        'sum': round(acumulador['sum'], 2),
+        'avg': round(acumulador['sum'] / acumulador['count'], 2) if acumulador['count'] else None,
+        'min': round(acumulador['min'], 2) if acumulador['min'] is not None else None,
+        'max': round(acumulador['max'], 2) if acumulador['max'] is not None else None,
+    }
+    return {m: valores[m] for m in metricas}
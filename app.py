@@ -6,18 +6,31 @@ Aplicação Flask principal com todas as rotas e funcionalidades
 import os
 import re
 import logging
+import threading
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, session
+from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, session, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_cors import CORS
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # Importar módulos do sistema
-from auth_manager import AuthManager, traduzir_status, Usuario, CorretorUser
+from auth_manager import AuthManager, LoginOcupadoError, traduzir_status, Usuario, CorretorUser
+from documentos import normalizar_documento
+from limitador_login import limitador_login, normalizar_tipo_login
 from sienge_client import sienge_client
-from sync_sienge_supabase import SiengeSupabaseSync
+from sync_sienge_supabase import SiengeSupabaseSync, nome_empreendimento
 from aprovacao_comissoes import AprovacaoComissoes
+from leitura_paginada import ler_tabela
+from gatilho import calcular_valor_gatilho
+from indice_busca import indice_contratos
+from colunar import snapshot_comissoes
+from agregacao import agregar_comissoes, validar_parametros as validar_parametros_agregacao
+from versao_dados import marcar_versao
+from respostas_http import com_etag, comprimir_resposta
+from json_provider import JsonProviderRapido
+from exportacao import gerar_csv, gerar_xlsx, MIMETYPES as MIMETYPES_EXPORTACAO
+from email_outbox import enviador_emails
 
 load_dotenv()
 
@@ -51,6 +64,9 @@ if len(SECRET_KEY) < 32:
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
 
+# Serialização JSON com orjson (cai no json da stdlib se não estiver instalado)
+app.json = JsonProviderRapido(app)
+
 # Configurar CORS de forma restritiva
 PRODUCTION_URL = os.getenv('PRODUCTION_URL', 'http://localhost:5000')
 CORS(app, 
@@ -62,6 +78,9 @@ CORS(app,
 # Limite de tamanho de upload
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 
+# Compressão gzip/brotli das respostas JSON e HTML (negociada por Accept-Encoding)
+app.after_request(comprimir_resposta)
+
 logger.info(f"Flask app inicializado. CORS configurado para: {PRODUCTION_URL}")
 
 # Configurar Flask-Login
@@ -73,42 +92,200 @@ login_manager.login_message = 'Por favor, faça login para acessar esta página.
 # Inicializar AuthManager
 auth_manager = AuthManager()
 
+# Envio em segundo plano da fila email_outbox (e-mails deixados por workers anteriores inclusive)
+enviador_emails.iniciar()
+
+
+def descricao_regra(linha: dict) -> str:
+    """Regra de regras_gatilho de uma linha de comissoes_enriquecidas, formatada para exibição"""
+    percentual = linha.get('regra_percentual') or 0
+    
+    if linha.get('tipo_regra') == 'faturamento':
+        regra_descricao = f"Fat. Mín. R$ {linha.get('regra_faturamento_minimo') or 0:,.0f} → {percentual}%"
+        if linha.get('regra_percentual_auditoria'):
+            regra_descricao += f" (+{linha.get('regra_percentual_auditoria')}% auditoria)"
+    else:
+        regra_descricao = f"{percentual}%"
+        if linha.get('regra_inclui_itbi'):
+            regra_descricao += " + ITBI"
+    return regra_descricao
+
+
+def linha_relatorio_comissao(linha: dict) -> dict:
+    """Formata uma linha de comissoes_enriquecidas para o relatório de comissões"""
+    tipo_regra = linha.get('tipo_regra') or 'gatilho'
+    regra_descricao = descricao_regra(linha)
+    
+    return {
+        'numero_contrato': linha.get('numero_contrato'),
+        'lote': linha.get('lote'),
+        'cliente': linha.get('cliente'),
+        'empreendimento': linha.get('empreendimento_nome') or 'Não informado',
+        'empreendimento_id': linha.get('building_id'),
+        'corretor': linha.get('broker_nome') or 'Não informado',
+        'corretor_id': linha.get('broker_id'),
+        'regra_id': linha.get('regra_gatilho_id'),
+        'regra_nome': linha.get('regra_nome') or 'Não definida',
+        'regra_descricao': regra_descricao,
+        'tipo_regra': tipo_regra,
+        'auditoria_aprovada': linha.get('auditoria_aprovada'),
+        'valor_comissao': float(linha.get('valor_comissao') or 0),
+        'status_aprovacao': linha.get('status_aprovacao') or 'Pendente',
+        'data_contrato': linha.get('data_contrato')
+    }
+
+
+def filtros_relatorio(args) -> dict:
+    """Filtros do relatório de comissões a partir da query string (múltiplos valores separados por vírgula)"""
+    def lista(nome):
+        return [s.strip() for s in args.get(nome, '').split(',') if s.strip()]
+    
+    return {
+        'empreendimentos': lista('empreendimento_id'),
+        'corretores': lista('corretor_id'),
+        'regras': lista('regra_id'),
+        'auditorias': lista('auditoria'),
+        'data_inicio': data_filtro(args, 'data_inicio'),
+        'data_fim': data_filtro(args, 'data_fim')
+    }
+
+
+def data_filtro(args, nome: str) -> str:
+    """Data (AAAA-MM-DD) da query string; ValueError com a mensagem para o usuário se malformada"""
+    valor = args.get(nome, '').strip()
+    if valor:
+        try:
+            datetime.strptime(valor, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"{nome} inválido: {valor}. Use o formato AAAA-MM-DD")
+    return valor
+
 
-# Função para calcular o valor do gatilho
-def calcular_valor_gatilho(valor_a_vista: float, valor_itbi: float, regra: str) -> float:
+def linhas_relatorio(sync, filtros: dict, resumo: dict):
     """
-    Calcula o valor do gatilho baseado na regra de comissão.
+    Gera as linhas formatadas do relatório (do snapshot colunar ou do modelo de leitura)
+    e acumula os totais em `resumo`, que está completo quando o gerador termina.
+    """
+    corretores_unicos = set()
+    resumo.update({'total_vendas': 0, 'total_comissoes': 0, 'total_corretores': 0, 'auditorias_aprovadas': 0})
+    
+    # Snapshot colunar em memória quando disponível; senão, consulta paginada no Supabase
+    snapshot = snapshot_comissoes.pronto(sync.supabase)
+    origem = snapshot.linhas_relatorio(sync.supabase, **filtros) if snapshot else sync.listar_relatorio_comissoes(**filtros)
     
-    Regras suportadas:
-    - '10% + ITBI': 10% do valor à vista + ITBI
-    - '10%': 10% do valor à vista
-    - '5%': 5% do valor à vista
-    - '6%': 6% do valor à vista
+    for linha in origem:
+        item = linha_relatorio_comissao(linha)
+        
+        resumo['total_vendas'] += 1
+        resumo['total_comissoes'] += item['valor_comissao']
+        if item['auditoria_aprovada'] == True:
+            resumo['auditorias_aprovadas'] += 1
+        corretores_unicos.add(item['corretor'])
+        resumo['total_corretores'] = len(corretores_unicos)
+        
+        yield item
+
+
+def relatorio_ndjson(sync, filtros: dict, linhas_por_bloco: int = 200):
     """
-    if not regra:
-        regra = '10% + ITBI'
+    Relatório em NDJSON: um objeto JSON por linha do relatório e, por último,
+    {"tipo": "resumo", "resumo": {...}} (ou {"tipo": "erro", ...} se a leitura falhar)
+    """
+    resumo = {}
+    bloco = []
+    try:
+        for item in linhas_relatorio(sync, filtros, resumo):
+            bloco.append(app.json.dumps(item))
+            if len(bloco) >= linhas_por_bloco:
+                yield '\n'.join(bloco) + '\n'
+                bloco = []
+        bloco.append(app.json.dumps({'tipo': 'resumo', 'resumo': resumo}))
+    except Exception as e:
+        print(f"[ERRO RELATÓRIO] {str(e)}")
+        bloco.append(app.json.dumps({'tipo': 'erro', 'erro': str(e)}))
+    yield '\n'.join(bloco) + '\n'
+
+
+def info_contrato(linha: dict, building_id) -> dict:
+    """Monta a resposta de /api/contrato-info a partir de uma linha de comissoes_enriquecidas"""
+    status_parcela = linha.get('installment_status')
+    regra_gatilho = linha.get('regra_gatilho') or '10% + ITBI'
+    valor_itbi = linha.get('valor_itbi') or 0
     
-    regra_lower = regra.lower().strip()
+    # Regra exibida = regra avaliada (gatilho.avaliar_gatilho): a de regras_gatilho quando
+    # vinculada (faturamento usa o faturamento mínimo como valor_gatilho), senão o texto
+    if linha.get('tipo_regra') == 'faturamento' or linha.get('regra_percentual') is not None:
+        regra_exibida = descricao_regra(linha)
+    else:
+        regra_exibida = regra_gatilho
+    valor_pago = linha.get('valor_pago') or 0
     
-    if '10%' in regra_lower and 'itbi' in regra_lower:
-        return (valor_a_vista * 0.10) + valor_itbi
-    elif '10%' in regra_lower:
-        return valor_a_vista * 0.10
-    elif '5%' in regra_lower:
-        return valor_a_vista * 0.05
-    elif '6%' in regra_lower:
-        return valor_a_vista * 0.06
+    # Gatilho avaliado na sincronização; calcula aqui só se ainda não foi avaliado
+    if linha.get('valor_gatilho') is not None:
+        valor_gatilho = float(linha['valor_gatilho'])
+        atingiu_gatilho = bool(linha.get('atingiu_gatilho'))
     else:
-        # Tentar extrair percentual da string
-        match = re.search(r'(\d+[,.]?\d*)\s*%', regra)
-        if match:
-            percentual = float(match.group(1).replace(',', '.')) / 100
-            if 'itbi' in regra_lower:
-                return (valor_a_vista * percentual) + valor_itbi
-            return valor_a_vista * percentual
-        
-        # Padrão: 10% + ITBI
-        return (valor_a_vista * 0.10) + valor_itbi
+        valor_a_vista_calc = float(linha.get('valor_a_vista') or linha.get('valor_total') or 0)
+        valor_gatilho = calcular_valor_gatilho(valor_a_vista_calc, float(valor_itbi), regra_gatilho)
+        atingiu_gatilho = float(valor_pago) >= valor_gatilho if valor_gatilho > 0 else False
+    
+    return {
+        'numero_contrato': linha.get('numero_contrato'),
+        'nome_cliente': linha.get('nome_cliente'),
+        'data_contrato': linha.get('data_contrato'),
+        'valor_total': linha.get('valor_total'),
+        'valor_a_vista': linha.get('valor_a_vista'),
+        'corretor_principal': linha.get('corretor_principal'),
+        'valor_comissao': linha.get('valor_comissao') or linha.get('commission_value'),
+        'status_parcela': traduzir_status(status_parcela) if status_parcela else None,
+        'valor_itbi': valor_itbi,
+        'valor_pago': valor_pago,
+        'building_id': building_id,
+        'empreendimento_nome': linha.get('empreendimento_nome') or nome_empreendimento(building_id),
+        'company_id': linha.get('company_id'),
+        'regra_gatilho': regra_exibida,
+        'valor_gatilho': valor_gatilho,
+        'atingiu_gatilho': atingiu_gatilho
+    }
+
+
+def atualizar_indice_busca(supabase):
+    """Atualiza o índice da busca por lote deste worker logo após uma sincronização"""
+    try:
+        indice_contratos.atualizar(supabase)
+    except Exception as e:
+        print(f"[Índice] Erro ao atualizar índice de busca: {str(e)}")
+
+
+# Reconstrução completa de comissoes_enriquecidas fora da requisição (uma por vez neste worker)
+_reconstrucao_lock = threading.Lock()
+_reconstrucao_pendente = threading.Event()
+
+
+def reconstruir_modelo_leitura():
+    """Agenda a reconstrução completa do modelo de leitura numa thread e retorna na hora"""
+    _reconstrucao_pendente.set()
+    if _reconstrucao_lock.acquire(blocking=False):
+        threading.Thread(target=_reconstruir_modelo_leitura, name='modelo-leitura', daemon=True).start()
+    # Se já há uma em andamento, ela vê o pedido pendente e roda de novo ao terminar
+
+
+def _reconstruir_modelo_leitura():
+    try:
+        while _reconstrucao_pendente.is_set():
+            _reconstrucao_pendente.clear()
+            try:
+                sync = SiengeSupabaseSync()
+                resultado = sync.atualizar_comissoes_enriquecidas()
+                marcar_versao(sync.supabase, 'contratos')
+                print(f"[Modelo de leitura] Reconstrução concluída: {resultado}")
+            except Exception as e:
+                print(f"[Modelo de leitura] Erro na reconstrução: {str(e)}")
+    finally:
+        _reconstrucao_lock.release()
+    # Pedido que chegou entre o fim do laço e a liberação do lock
+    if _reconstrucao_pendente.is_set():
+        reconstruir_modelo_leitura()
 
 
 # ==================== FLASK-LOGIN CALLBACKS ====================
@@ -130,24 +307,38 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         senha = request.form.get('senha', '')
-        tipo_login = request.form.get('tipo_login', 'gestor')
+        tipo_login = normalizar_tipo_login(request.form.get('tipo_login', 'gestor'))
+        ip = request.remote_addr or ''
+        
+        # Muitas falhas recentes deste IP ou usuário: recusa antes de consultar o banco
+        espera = limitador_login.verificar(ip, tipo_login, username)
+        if espera:
+            flash(f'Muitas tentativas de login. Tente novamente em {(espera + 59) // 60} minuto(s).', 'error')
+            return render_template('login_unificado.html'), 429, {'Retry-After': str(espera)}
         
-        if tipo_login == 'corretor':
-            # Login de corretor (CPF)
-            usuario = auth_manager.autenticar_corretor(username, senha)
-            if usuario:
-                login_user(usuario)
+        try:
+            if tipo_login == 'corretor':
+                # Login de corretor (CPF)
+                usuario = auth_manager.autenticar_corretor(username, senha)
+            else:
+                # Login de gestor
+                usuario = auth_manager.autenticar(username, senha)
+        except LoginOcupadoError:
+            # Verificação de senhas saturada: recusa rápida em vez de segurar o worker
+            flash('Muitos acessos no momento. Tente novamente em alguns segundos.', 'error')
+            return render_template('login_unificado.html'), 503
+        
+        if usuario:
+            limitador_login.registrar_sucesso(ip, tipo_login, username)
+            login_user(usuario)
+            if tipo_login == 'corretor':
                 return redirect(url_for('dashboard_corretor'))
-        else:
-            # Login de gestor
-            usuario = auth_manager.autenticar(username, senha)
-            if usuario:
-                login_user(usuario)
-                # Redirecionar direção para página específica
-                if usuario.perfil == 'Direção':
-                    return redirect(url_for('dashboard_direcao'))
-                return redirect(url_for('dashboard'))
+            # Redirecionar direção para página específica
+            if usuario.perfil == 'Direção':
+                return redirect(url_for('dashboard_direcao'))
+            return redirect(url_for('dashboard'))
         
+        limitador_login.registrar_falha(ip, tipo_login, username)
         flash('Credenciais inválidas', 'error')
     
     return render_template('login_unificado.html')
@@ -185,6 +376,15 @@ def health_check():
             'error': str(e)
         }), 503
 
+@app.route('/api/login/metricas')
+@login_required
+def metricas_login():
+    """Métricas do limitador de tentativas de login deste worker"""
+    if not current_user.is_admin:
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    return jsonify({'sucesso': True, **limitador_login.obter_metricas()}), 200
+
 @app.route('/api/health')
 def api_health_check():
     """Endpoint de healthcheck da API"""
@@ -250,22 +450,46 @@ def listar_empreendimentos():
 
 @app.route('/api/contratos', methods=['GET'])
 @login_required
+@com_etag('contratos')
 def listar_contratos():
+    """
+    Lista contratos. Com apenas building_id retorna a lista do empreendimento (usada nos selects).
+    Sem building_id, ou com cursor/limite/fields, retorna páginas por cursor:
+    {'contratos': [...], 'proximo_cursor': str|None}, ordenadas por (building_id, numero_contrato).
+    """
     try:
         building_id = request.args.get('building_id', type=int)
+        cursor = request.args.get('cursor')
+        limite = request.args.get('limite', type=int)
+        fields_param = request.args.get('fields', '')
         sync = SiengeSupabaseSync()
         
-        if building_id:
+        if building_id and not (cursor or limite or fields_param):
             contratos = sync.get_contratos_por_empreendimento(building_id)
-        else:
-            result = sync.supabase.table('sienge_contratos').select('*').execute()
-            contratos = result.data if result.data else []
+            if contratos is None:
+                contratos = []
+            print(f"[API] Contratos encontrados para building_id={building_id}: {len(contratos)}")
+            return jsonify(contratos), 200
         
-        if contratos is None:
-            contratos = []
+        # Projeção de colunas (apenas nomes simples de coluna)
+        campos = [f.strip() for f in fields_param.split(',') if f.strip()]
+        invalidos = [f for f in campos if not re.fullmatch(r'[a-z_][a-z0-9_]*', f)]
+        if invalidos:
+            return jsonify({'erro': f"Campos inválidos: {', '.join(invalidos)}"}), 400
         
-        print(f"[API] Contratos encontrados para building_id={building_id}: {len(contratos)}")
-        return jsonify(contratos), 200
+        limite = min(max(limite or 200, 1), 1000)
+        
+        try:
+            pagina = sync.get_contratos_pagina(building_id=building_id, cursor=cursor, limite=limite, campos=campos)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        
+        print(f"[API] Página de contratos (building_id={building_id}): {len(pagina['contratos'])} registros")
+        return jsonify({
+            'contratos': pagina['contratos'],
+            'proximo_cursor': pagina['proximo_cursor'],
+            'limite': limite
+        }), 200
     except Exception as e:
         print(f"[API] Erro ao listar contratos: {str(e)}")
         return jsonify({'erro': str(e)}), 500
@@ -286,144 +510,64 @@ def get_contrato_info():
         
         sync = SiengeSupabaseSync()
         
-        # 1. Buscar contrato
-        contrato = sync.get_contrato_por_numero(numero_contrato, building_id)
-        if not contrato:
+        # Uma consulta em comissoes_enriquecidas; contrato sem comissão cai nas tabelas de origem em paralelo
+        linhas = sync.get_contratos_enriquecidos([(numero_contrato, building_id)])
+        linha = linhas.get((str(numero_contrato), str(building_id)))
+        if not linha:
             return jsonify({'erro': 'Contrato não encontrado'}), 404
         
-        # 2. Buscar corretor do contrato (campo pode estar no proprio contrato)
-        corretor_principal = contrato.get('corretor') or contrato.get('broker_nome') or contrato.get('broker_name')
-        valor_comissao = None
-        status_parcela = None
-        
-        # 3. Buscar comissao da tabela sienge_comissoes
-        try:
-            comissao_result = sync.supabase.table('sienge_comissoes')\
-                .select('*')\
-                .eq('numero_contrato', numero_contrato)\
-                .eq('building_id', building_id)\
-                .limit(1)\
-                .execute()
-            
-            if comissao_result.data:
-                comissao = comissao_result.data[0]
-                # Tentar diferentes nomes de colunas para corretor (se nao veio do contrato)
-                if not corretor_principal:
-                    corretor_principal = comissao.get('broker_nome') or comissao.get('broker_name') or comissao.get('corretor')
-                # Valor da comissao
-                valor_comissao = comissao.get('commission_value') or comissao.get('valor_comissao') or comissao.get('value')
-                status_parcela = comissao.get('installment_status') or comissao.get('status') or comissao.get('status_parcela')
-                print(f"[API] Comissao encontrada: corretor={corretor_principal}, valor={valor_comissao}")
-        except Exception as e:
-            print(f"[API] Erro ao buscar comissao (ignorando): {str(e)}")
-        
-        # 4. Se ainda nao tem corretor, tentar buscar pelo brokers do contrato
-        if not corretor_principal:
-            brokers = contrato.get('brokers') or contrato.get('corretores')
-            if brokers and isinstance(brokers, list) and len(brokers) > 0:
-                # Pegar o primeiro corretor principal
-                for b in brokers:
-                    if isinstance(b, dict):
-                        if b.get('main') or b.get('principal'):
-                            corretor_principal = b.get('name') or b.get('nome')
-                            break
-                # Se nao achou principal, pegar o primeiro
-                if not corretor_principal and isinstance(brokers[0], dict):
-                    corretor_principal = brokers[0].get('name') or brokers[0].get('nome')
-            elif brokers and isinstance(brokers, str):
-                try:
-                    import json
-                    parsed = json.loads(brokers)
-                    if isinstance(parsed, list) and len(parsed) > 0:
-                        for b in parsed:
-                            if b.get('main') or b.get('principal'):
-                                corretor_principal = b.get('name') or b.get('nome')
-                                break
-                        if not corretor_principal:
-                            corretor_principal = parsed[0].get('name') or parsed[0].get('nome')
-                except:
-                    pass
-        
-        print(f"[API] Dados finais: corretor={corretor_principal}, comissao={valor_comissao}")
-        
-        # 5. Buscar ITBI
-        valor_itbi = sync.get_itbi_por_contrato(numero_contrato, building_id) or 0
-        
-        # 6. Buscar valor pago
-        valor_pago = sync.get_valor_pago_por_contrato(numero_contrato, building_id) or 0
-        
-        # Traduzir status
-        status_parcela_traduzido = traduzir_status(status_parcela) if status_parcela else None
+        return jsonify(info_contrato(linha, building_id)), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+
+@app.route('/api/contrato-info/bulk', methods=['POST'])
+@login_required
+def get_contrato_info_bulk():
+    """
+    Dados de vários contratos em uma chamada.
+    Corpo: {"contratos": [{"numero_contrato": "...", "building_id": "..."}, ...]} (ou pares [numero, building_id])
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        itens = data.get('contratos') or []
+        
+        pares = []
+        for item in itens:
+            if isinstance(item, dict):
+                par = (item.get('numero_contrato'), item.get('building_id'))
+            elif isinstance(item, (list, tuple)) and len(item) == 2:
+                par = tuple(item)
+            else:
+                return jsonify({'erro': 'Cada contrato deve ter numero_contrato e building_id'}), 400
+            if not par[0] or not par[1]:
+                return jsonify({'erro': 'Cada contrato deve ter numero_contrato e building_id'}), 400
+            pares.append((str(par[0]), str(par[1])))
         
-        # 7. Calcular gatilho
-        regra_gatilho = '10% + ITBI'
-        valor_a_vista_calc = float(contrato.get('valor_a_vista') or contrato.get('valor_total') or 0)
-        valor_itbi_calc = float(valor_itbi or 0)
-        valor_pago_calc = float(valor_pago or 0)
+        if not pares:
+            return jsonify({'erro': 'Nenhum contrato informado'}), 400
+        if len(pares) > 500:
+            return jsonify({'erro': 'Máximo de 500 contratos por chamada'}), 400
         
-        # Buscar regra específica (usando a mesma consulta anterior se possível)
-        try:
-            gatilho_result = sync.supabase.table('sienge_comissoes')\
-                .select('*')\
-                .eq('numero_contrato', numero_contrato)\
-                .eq('building_id', building_id)\
-                .limit(1)\
-                .execute()
-            
-            if gatilho_result.data:
-                regra = gatilho_result.data[0].get('regra_gatilho')
-                if regra:
-                    regra_gatilho = regra
-        except Exception as e:
-            print(f"[API] Erro ao buscar regra gatilho (ignorando): {str(e)}")
-        
-        valor_gatilho = calcular_valor_gatilho(valor_a_vista_calc, valor_itbi_calc, regra_gatilho)
-        atingiu_gatilho = valor_pago_calc >= valor_gatilho if valor_gatilho > 0 else False
-        
-        # Mapeamento de building_id para nome do empreendimento
-        EMPREENDIMENTOS = {
-            '2003': 'Montecarlo',
-            '2004': 'Ilha dos Açores',
-            '2005': 'Aurora',
-            '2007': 'Parque Lorena I',
-            '2009': 'Parque Lorena II',
-            '2010': 'Erico Verissimo',
-            '2011': 'Algarve',
-            '2014': 'Morada da Coxilha',
-            2003: 'Montecarlo',
-            2004: 'Ilha dos Açores',
-            2005: 'Aurora',
-            2007: 'Parque Lorena I',
-            2009: 'Parque Lorena II',
-            2010: 'Erico Verissimo',
-            2011: 'Algarve',
-            2014: 'Morada da Coxilha'
-        }
-        empreendimento_nome = EMPREENDIMENTOS.get(building_id, f'Empreendimento {building_id}')
-        
-        # Montar resposta
-        info = {
-            'numero_contrato': contrato.get('numero_contrato'),
-            'nome_cliente': contrato.get('nome_cliente'),
-            'data_contrato': contrato.get('data_contrato'),
-            'valor_total': contrato.get('valor_total'),
-            'valor_a_vista': contrato.get('valor_a_vista'),
-            'corretor_principal': corretor_principal,
-            'valor_comissao': valor_comissao,
-            'status_parcela': status_parcela_traduzido,
-            'valor_itbi': valor_itbi,
-            'valor_pago': valor_pago,
-            'building_id': building_id,
-            'empreendimento_nome': empreendimento_nome,
-            'company_id': contrato.get('company_id'),
-            'regra_gatilho': regra_gatilho,
-            'valor_gatilho': valor_gatilho,
-            'atingiu_gatilho': atingiu_gatilho
-        }
+        sync = SiengeSupabaseSync()
+        linhas = sync.get_contratos_enriquecidos(pares)
+        
+        contratos = []
+        nao_encontrados = []
+        for numero_contrato, building_id in dict.fromkeys(pares):
+            linha = linhas.get((numero_contrato, building_id))
+            if linha:
+                contratos.append(info_contrato(linha, building_id))
+            else:
+                nao_encontrados.append({'numero_contrato': numero_contrato, 'building_id': building_id})
         
-        return jsonify(info), 200
+        return jsonify({
+            'sucesso': True,
+            'contratos': contratos,
+            'nao_encontrados': nao_encontrados
+        }), 200
     except Exception as e:
-        return jsonify({'erro': str(e)}), 500
+        return jsonify({'sucesso': False, 'erro': str(e)}), 500
 
 
 @app.route('/api/buscar-por-lote', methods=['GET'])
@@ -435,7 +579,14 @@ def buscar_por_lote():
             return jsonify([]), 200
         
         sync = SiengeSupabaseSync()
-        contratos = sync.buscar_contratos_por_lote(numero_lote)
+        
+        # Busca no índice em memória do worker; se ele não puder ser montado, consulta o Supabase
+        try:
+            indice_contratos.garantir_atualizado(sync.supabase)
+            contratos = indice_contratos.buscar(numero_lote)
+        except Exception as e:
+            print(f"[API] Índice de busca indisponível, consultando Supabase: {str(e)}")
+            contratos = sync.buscar_contratos_por_lote(numero_lote)
         
         if contratos is None:
             contratos = []
@@ -479,32 +630,17 @@ def buscar_corretor_por_documento():
         if not documento:
             return jsonify({'sucesso': False, 'erro': 'Documento não informado'}), 400
         
-        # Limpar documento (remover pontos, traços, barras)
-        documento_limpo = documento.replace('.', '').replace('-', '').replace('/', '').strip()
+        documento_limpo = normalizar_documento(documento)
         
         if len(documento_limpo) < 11:
             return jsonify({'sucesso': False, 'erro': 'Documento incompleto'}), 400
         
-        sync = SiengeSupabaseSync()
-        
         print(f"[API] Buscando corretor por documento: {documento_limpo}")
         
-        # Buscar todos os corretores - usando apenas colunas que existem
-        result = sync.supabase.table('sienge_corretores')\
-            .select('*')\
-            .execute()
-        
-        corretor = None
-        if result.data:
-            for c in result.data:
-                # Limpar CPF/CNPJ do banco para comparação
-                cpf_banco = (c.get('cpf') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                cnpj_banco = (c.get('cnpj') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                
-                if cpf_banco == documento_limpo or cnpj_banco == documento_limpo:
-                    corretor = c
-                    print(f"[API] Corretor encontrado: {corretor.get('nome')}")
-                    break
+        # Busca indexada pelo documento normalizado
+        corretor = auth_manager.buscar_corretor_por_documento(documento_limpo)
+        if corretor:
+            print(f"[API] Corretor encontrado: {corretor.get('nome')}")
         
         if corretor:
             return jsonify({
@@ -566,6 +702,7 @@ def sincronizar():
         
         sync = SiengeSupabaseSync()
         resultado = sync.sync_all(building_id=building_id)
+        atualizar_indice_busca(sync.supabase)
         return jsonify({'sucesso': True, 'resultado': resultado}), 200
     except Exception as e:
         import traceback
@@ -602,8 +739,8 @@ def limpar_cancelados():
         }
         
         # 1. Deletar comissões canceladas (pagas devem permanecer com status Aprovada)
-        result = sync.supabase.table('sienge_comissoes').select('id, installment_status').execute()
-        canceladas = [c for c in (result.data or []) if 'CANCEL' in (c.get('installment_status') or '').upper()]
+        status_comissoes = list(ler_tabela(sync.supabase, 'sienge_comissoes', 'id, installment_status'))
+        canceladas = [c for c in status_comissoes if 'CANCEL' in (c.get('installment_status') or '').upper()]
         
         resultado['canceladas_antes'] = len(canceladas)
         
@@ -615,7 +752,7 @@ def limpar_cancelados():
                 pass
         
         # Atualizar comissões pagas para status Aprovada
-        pagas = [c for c in (result.data or []) 
+        pagas = [c for c in status_comissoes
                  if 'PAID' in (c.get('installment_status') or '').upper() 
                  or 'PAGO' in (c.get('installment_status') or '').upper()]
         
@@ -628,9 +765,8 @@ def limpar_cancelados():
                 pass
         
         # 2. Remover duplicatas
-        result2 = sync.supabase.table('sienge_comissoes').select('*').execute()
         grupos = {}
-        for c in (result2.data or []):
+        for c in ler_tabela(sync.supabase, 'sienge_comissoes'):
             chave = f"{c.get('numero_contrato')}_{c.get('unit_name')}_{c.get('building_id')}"
             if chave not in grupos:
                 grupos[chave] = []
@@ -650,9 +786,13 @@ def limpar_cancelados():
                 except:
                     pass
         
+        # Remoções e status chegam ao modelo de leitura e ao índice de busca em segundo plano
+        reconstruir_modelo_leitura()
+        
         return jsonify({
             'sucesso': True,
-            'mensagem': f"Limpeza concluída! Removidas {resultado['canceladas_deletadas']} canceladas e {resultado['duplicatas_deletadas']} duplicatas.",
+            'mensagem': f"Limpeza concluída! Removidas {resultado['canceladas_deletadas']} canceladas e {resultado['duplicatas_deletadas']} duplicatas. "
+                        f"Relatórios atualizados em segundo plano.",
             'resultado': resultado
         }), 200
         
@@ -714,6 +854,7 @@ def atualizar_perfil_usuario(user_id):
             .update({'perfil': novo_perfil})\
             .eq('id', user_id)\
             .execute()
+        auth_manager.invalidar_usuario(user_id)
         
         return jsonify({'sucesso': True}), 200
     except Exception as e:
@@ -801,6 +942,8 @@ def atualizar_email_corretor(sienge_id):
             .update({'email': novo_email})\
             .eq('sienge_id', sienge_id)\
             .execute()
+        # O CorretorUser em cache no user_loader guarda o e-mail
+        auth_manager.invalidar_usuario(sienge_id, is_corretor=True)
         
         return jsonify({'sucesso': True}), 200
     except Exception as e:
@@ -893,6 +1036,9 @@ def atualizar_regra_gatilho(regra_id):
             .execute()
         
         if result.data:
+            # Reavaliar o gatilho e copiar a regra nas comissões enriquecidas
+            sync.avaliar_gatilhos([('eq', 'regra_gatilho_id', regra_id)])
+            sync.atualizar_comissoes_enriquecidas([('eq', 'regra_gatilho_id', regra_id)])
             return jsonify({'status': 'sucesso', 'regra': result.data[0]}), 200
         return jsonify({'status': 'erro', 'mensagem': 'Regra não encontrada'}), 404
     except Exception as e:
@@ -917,6 +1063,7 @@ def excluir_regra_gatilho(regra_id):
 
 @app.route('/api/relatorio-comissoes', methods=['GET'])
 @login_required
+@com_etag('comissoes')
 def relatorio_comissoes():
     """Relatório completo de comissões com regras aplicadas - Para Gestor e Direção"""
     # Verificar se o usuário tem perfil Gestor, Direção ou é admin
@@ -927,169 +1074,29 @@ def relatorio_comissoes():
     if not is_gestor_ou_direcao and not is_admin:
         return jsonify({'erro': 'Apenas gestores e direção podem acessar o relatório'}), 403
     
+    # Parâmetros de filtro (suportam múltiplos valores separados por vírgula)
+    try:
+        filtros = filtros_relatorio(request.args)
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 400
+    
     try:
         sync = SiengeSupabaseSync()
+        print(f"[API Relatório] Filtros - {filtros}")
         
-        # Parâmetros de filtro (agora suportam múltiplos valores separados por vírgula)
-        empreendimento_param = request.args.get('empreendimento_id', '')
-        corretor_param = request.args.get('corretor_id', '')
-        regra_param = request.args.get('regra_id', '')
-        auditoria_param = request.args.get('auditoria', '')
-        data_inicio = request.args.get('data_inicio', '')
-        data_fim = request.args.get('data_fim', '')
+        # ?format=ndjson: linhas enviadas conforme são lidas, resumo no último registro
+        if request.args.get('format') == 'ndjson':
+            return Response(stream_with_context(relatorio_ndjson(sync, filtros)),
+                            mimetype='application/x-ndjson')
         
-        # Converter para listas (split por vírgula)
-        empreendimento_list = [s.strip() for s in empreendimento_param.split(',') if s.strip()]
-        corretor_list = [s.strip() for s in corretor_param.split(',') if s.strip()]
-        regra_list = [s.strip() for s in regra_param.split(',') if s.strip()]
-        auditoria_list = [s.strip() for s in auditoria_param.split(',') if s.strip()]
-        
-        print(f"[API Relatório] Filtros - empreendimentos: {empreendimento_list}, corretores: {corretor_list}, regras: {regra_list}, auditorias: {auditoria_list}, data: {data_inicio} a {data_fim}")
-        
-        # Buscar todas as comissões
-        query = sync.supabase.table('sienge_comissoes').select('*')
-        
-        # Filtrar apenas cancelados (pagas devem aparecer)
-        result = query.execute()
-        comissoes = [c for c in (result.data or []) 
-                     if 'cancel' not in (c.get('installment_status') or '').lower()]
-        
-        # Aplicar filtros (multi-select)
-        if empreendimento_list:
-            comissoes = [c for c in comissoes if str(c.get('building_id')) in empreendimento_list]
-        
-        if corretor_list:
-            comissoes = [c for c in comissoes if str(c.get('broker_id')) in corretor_list]
-        
-        if auditoria_list:
-            def match_auditoria(comissao):
-                auditoria_valor = comissao.get('auditoria_aprovada')
-                for a in auditoria_list:
-                    if a == 'sim' and auditoria_valor == True:
-                        return True
-                    elif a == 'nao' and auditoria_valor == False:
-                        return True
-                    elif a == 'pendente' and auditoria_valor is None:
-                        return True
-                return False
-            comissoes = [c for c in comissoes if match_auditoria(c)]
-        
-        # Filtrar por regra (multi-select)
-        if regra_list:
-            comissoes = [c for c in comissoes if str(c.get('regra_gatilho_id')) in regra_list]
-        
-        # Buscar regras de gatilho para associar
-        regras_result = sync.supabase.table('regras_gatilho').select('*').execute()
-        regras_dict = {r['id']: r for r in (regras_result.data or [])}
-        
-        # Buscar contratos para pegar dados do cliente, lote e data_contrato
-        contratos_result = sync.supabase.table('sienge_contratos').select('*').execute()
-        contratos_dict = {c['numero_contrato']: c for c in (contratos_result.data or [])}
-        
-        # Filtrar por período de data do contrato
-        if data_inicio or data_fim:
-            def filtrar_por_data_relatorio(comissao):
-                numero_contrato = comissao.get('numero_contrato')
-                contrato = contratos_dict.get(numero_contrato, {})
-                data_contrato = contrato.get('data_contrato')
-                if not data_contrato:
-                    return False
-                
-                try:
-                    if 'T' in str(data_contrato):
-                        data_str = str(data_contrato).split('T')[0]
-                    else:
-                        data_str = str(data_contrato)[:10]
-                    
-                    if data_inicio and data_str < data_inicio:
-                        return False
-                    if data_fim and data_str > data_fim:
-                        return False
-                    return True
-                except:
-                    return False
-            
-            comissoes = [c for c in comissoes if filtrar_por_data_relatorio(c)]
-            print(f"[API Relatório] Após filtro de data: {len(comissoes)} comissões")
-        
-        # Buscar empreendimentos (usando o método do sync)
-        empreendimentos_lista = sync.get_empreendimentos()
-        empreendimentos_dict = {str(e['id']): e for e in empreendimentos_lista}
-        
-        # Montar relatório
-        relatorio = []
-        corretores_unicos = set()
-        total_comissoes = 0
-        auditorias_aprovadas = 0
-        
-        for comissao in comissoes:
-            numero_contrato = comissao.get('numero_contrato')
-            contrato = contratos_dict.get(numero_contrato, {})
-            
-            # Dados do empreendimento
-            building_id = comissao.get('building_id') or contrato.get('building_id')
-            empreendimento = empreendimentos_dict.get(building_id, {})
-            
-            # Regra aplicada
-            regra_id_aplicada = comissao.get('regra_gatilho_id')
-            regra = regras_dict.get(regra_id_aplicada, {})
-            
-            # Formatar regra para exibição
-            regra_nome = regra.get('nome', 'Não definida')
-            tipo_regra = regra.get('tipo_regra', 'gatilho')
-            
-            if tipo_regra == 'faturamento':
-                regra_descricao = f"Fat. Mín. R$ {regra.get('faturamento_minimo', 0):,.0f} → {regra.get('percentual', 0)}%"
-                if regra.get('percentual_auditoria'):
-                    regra_descricao += f" (+{regra.get('percentual_auditoria')}% auditoria)"
-            else:
-                regra_descricao = f"{regra.get('percentual', 0)}%"
-                if regra.get('inclui_itbi'):
-                    regra_descricao += " + ITBI"
-            
-            # Valor da comissão
-            valor_comissao = float(comissao.get('valor_comissao') or comissao.get('commission_value') or 0)
-            total_comissoes += valor_comissao
-            
-            # Auditoria
-            auditoria_status = comissao.get('auditoria_aprovada')
-            if auditoria_status == True:
-                auditorias_aprovadas += 1
-            
-            # Corretor
-            corretor_nome = comissao.get('broker_nome') or comissao.get('broker_name') or 'Não informado'
-            corretores_unicos.add(corretor_nome)
-            
-            relatorio.append({
-                'numero_contrato': numero_contrato,
-                'lote': contrato.get('numero_lote') or comissao.get('unit_name') or f"Contrato {numero_contrato}",
-                'cliente': contrato.get('nome_cliente') or comissao.get('customer_name') or 'Não informado',
-                'empreendimento': empreendimento.get('nome') or comissao.get('building_name') or 'Não informado',
-                'empreendimento_id': building_id,
-                'corretor': corretor_nome,
-                'corretor_id': comissao.get('broker_id'),
-                'regra_id': regra_id_aplicada,
-                'regra_nome': regra_nome,
-                'regra_descricao': regra_descricao,
-                'tipo_regra': tipo_regra,
-                'auditoria_aprovada': auditoria_status,
-                'valor_comissao': valor_comissao,
-                'status_aprovacao': comissao.get('status_aprovacao', 'Pendente'),
-                'data_contrato': contrato.get('data_contrato')
-            })
-        
-        # Ordenar por empreendimento e lote
-        relatorio.sort(key=lambda x: (x.get('empreendimento', ''), x.get('lote', '')))
+        # Uma consulta no modelo de leitura: filtros, cancelados e ordenação no Supabase
+        resumo = {}
+        relatorio = list(linhas_relatorio(sync, filtros, resumo))
         
         return jsonify({
             'sucesso': True,
             'dados': relatorio,
-            'resumo': {
-                'total_vendas': len(relatorio),
-                'total_comissoes': total_comissoes,
-                'total_corretores': len(corretores_unicos),
-                'auditorias_aprovadas': auditorias_aprovadas
-            }
+            'resumo': resumo
         }), 200
         
     except Exception as e:
@@ -1099,6 +1106,83 @@ def relatorio_comissoes():
         return jsonify({'sucesso': False, 'erro': str(e)}), 500
 
 
+@app.route('/api/relatorio-comissoes/export', methods=['GET'])
+@login_required
+def exportar_relatorio_comissoes():
+    """Exporta o relatório de comissões (mesmos filtros) em CSV ou XLSX, em streaming"""
+    perfil = getattr(current_user, 'perfil', None)
+    is_gestor_ou_direcao = perfil in ['Gestor', 'Direção']
+    is_admin = hasattr(current_user, 'is_admin') and current_user.is_admin
+    
+    if not is_gestor_ou_direcao and not is_admin:
+        return jsonify({'erro': 'Apenas gestores e direção podem exportar o relatório'}), 403
+    
+    formato = request.args.get('format', 'csv').lower()
+    if formato not in MIMETYPES_EXPORTACAO:
+        return jsonify({'erro': 'Formato inválido. Use csv ou xlsx'}), 400
+    
+    try:
+        filtros = filtros_relatorio(request.args)
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 400
+    
+    try:
+        sync = SiengeSupabaseSync()
+        print(f"[API Relatório] Exportação {formato} - {filtros}")
+        
+        linhas = linhas_relatorio(sync, filtros, {})
+        gerador = gerar_xlsx(linhas) if formato == 'xlsx' else gerar_csv(linhas)
+        nome_arquivo = f"relatorio_comissoes_{datetime.now().strftime('%Y%m%d_%H%M')}.{formato}"
+        
+        return Response(
+            stream_with_context(gerador),
+            mimetype=MIMETYPES_EXPORTACAO[formato],
+            headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}"'}
+        )
+    except Exception as e:
+        print(f"[ERRO RELATÓRIO] Exportação: {str(e)}")
+        return jsonify({'sucesso': False, 'erro': str(e)}), 500
+
+
+@app.route('/api/comissoes/agregado', methods=['GET'])
+@login_required
+@com_etag('comissoes')
+def agregar_comissoes_relatorio():
+    """
+    Totais de comissões agrupados no servidor, com os filtros do relatório.
+    Ex.: ?group_by=building,month&metric=sum,count
+    group_by: building, broker, regra, month, year, status_aprovacao, status_parcela, auditoria
+    metric: count, sum, avg, min, max (sobre valor_comissao; padrão sum,count)
+    """
+    perfil = getattr(current_user, 'perfil', None)
+    is_gestor_ou_direcao = perfil in ['Gestor', 'Direção']
+    is_admin = hasattr(current_user, 'is_admin') and current_user.is_admin
+    
+    if not is_gestor_ou_direcao and not is_admin:
+        return jsonify({'erro': 'Apenas gestores e direção podem acessar o relatório'}), 403
+    
+    try:
+        dimensoes, metricas = validar_parametros_agregacao(request.args.get('group_by', ''), request.args.get('metric', ''))
+        filtros = filtros_relatorio(request.args)
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 400
+    
+    try:
+        sync = SiengeSupabaseSync()
+        resultado = agregar_comissoes(sync, dimensoes, metricas, filtros)
+        
+        return jsonify({
+            'sucesso': True,
+            'group_by': dimensoes,
+            'metric': metricas,
+            'grupos': resultado['grupos'],
+            'total': resultado['total']
+        }), 200
+    except Exception as e:
+        print(f"[ERRO RELATÓRIO] Agregação: {str(e)}")
+        return jsonify({'sucesso': False, 'erro': str(e)}), 500
+
+
 @app.route('/api/relatorio-comissoes/corretores', methods=['GET'])
 @login_required
 def listar_corretores_relatorio():
@@ -1113,16 +1197,8 @@ def listar_corretores_relatorio():
     
     try:
         sync = SiengeSupabaseSync()
-        result = sync.supabase.table('sienge_comissoes').select('broker_id, broker_nome').execute()
-        
-        corretores = {}
-        for c in (result.data or []):
-            broker_id = c.get('broker_id')
-            broker_nome = c.get('broker_nome')
-            if broker_id and broker_nome and broker_id not in corretores:
-                corretores[broker_id] = broker_nome
-        
-        lista = [{'id': k, 'nome': v} for k, v in corretores.items()]
+        facetas = sync.get_facetas_comissoes()
+        lista = [{'id': f['valor'], 'nome': f['nome']} for f in facetas['corretor'] if f.get('nome')]
         lista.sort(key=lambda x: x['nome'])
         
         return jsonify(lista), 200
@@ -1132,23 +1208,51 @@ def listar_corretores_relatorio():
 
 # ==================== API - COMISSÕES E APROVAÇÃO ====================
 
+@app.route('/api/comissoes/facetas', methods=['GET'])
+@login_required
+@com_etag('comissoes')
+def listar_facetas_comissoes():
+    """
+    Valores dos filtros de comissões com contagem (status da parcela, status de aprovação,
+    corretor, empreendimento e regra), respeitando os filtros já aplicados
+    """
+    try:
+        sync = SiengeSupabaseSync()
+        
+        # Mesmos parâmetros da listagem e do relatório (múltiplos valores separados por vírgula)
+        def lista_param(nome):
+            return [s.strip() for s in request.args.get(nome, '').split(',') if s.strip()]
+        
+        facetas = sync.get_facetas_comissoes(
+            status_parcela=lista_param('status_parcela'),
+            status_aprovacao=lista_param('status_aprovacao'),
+            corretores=lista_param('corretor_id'),
+            empreendimentos=lista_param('empreendimento_id'),
+            regras=lista_param('regra_id'),
+            gatilho=[g.lower() == 'true' for g in lista_param('gatilho_atingido')],
+            data_inicio=data_filtro(request.args, 'data_inicio'),
+            data_fim=data_filtro(request.args, 'data_fim')
+        )
+        
+        return jsonify({'sucesso': True, 'facetas': facetas}), 200
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 400
+    except Exception as e:
+        print(f"[API] Erro ao calcular facetas (função pode não existir): {str(e)}")
+        return jsonify({'sucesso': False, 'erro': str(e)}), 500
+
+
 @app.route('/api/comissoes/status-parcela', methods=['GET'])
 @login_required
 def listar_status_parcela():
     """Lista todos os status de parcela únicos no banco"""
     try:
         sync = SiengeSupabaseSync()
-        result = sync.supabase.table('sienge_comissoes').select('installment_status').execute()
-        
-        status_unicos = set()
-        for c in (result.data or []):
-            st = c.get('installment_status')
-            if st:
-                status_unicos.add(st)
+        facetas = sync.get_facetas_comissoes()
         
         return jsonify({
             'sucesso': True,
-            'status': sorted(list(status_unicos))
+            'status': [f['valor'] for f in facetas['status_parcela']]
         }), 200
     except Exception as e:
         return jsonify({'sucesso': False, 'erro': str(e)}), 500
@@ -1156,6 +1260,7 @@ def listar_status_parcela():
 
 @app.route('/api/comissoes/listar', methods=['GET'])
 @login_required
+@com_etag('comissoes')
 def listar_todas_comissoes():
     try:
         sync = SiengeSupabaseSync()
@@ -1164,147 +1269,48 @@ def listar_todas_comissoes():
         status_parcela_param = request.args.get('status_parcela', '')
         status_aprovacao_param = request.args.get('status_aprovacao', '')
         gatilho_atingido_param = request.args.get('gatilho_atingido', '')
-        data_inicio = request.args.get('data_inicio', '')
-        data_fim = request.args.get('data_fim', '')
+        data_inicio = data_filtro(request.args, 'data_inicio')
+        data_fim = data_filtro(request.args, 'data_fim')
+        
+        # Paginação (range no Supabase)
+        pagina = max(request.args.get('pagina', 1, type=int) or 1, 1)
+        por_pagina = request.args.get('por_pagina', 100, type=int) or 100
+        por_pagina = min(max(por_pagina, 1), 500)
         
         # Converter para listas (split por vírgula)
         status_parcela_list = [s.strip() for s in status_parcela_param.split(',') if s.strip()]
         status_aprovacao_list = [s.strip() for s in status_aprovacao_param.split(',') if s.strip()]
         gatilho_list = [s.strip() for s in gatilho_atingido_param.split(',') if s.strip()]
         
-        print(f"[API] Filtros recebidos - status_parcela: {status_parcela_list}, status_aprovacao: {status_aprovacao_list}, gatilho: {gatilho_list}, data_inicio: {data_inicio}, data_fim: {data_fim}")
-        
-        # Buscar todas as comissões
-        query = sync.supabase.table('sienge_comissoes').select('*')
-        
-        result = query.execute()
-        comissoes = result.data if result.data else []
-        
-        # FILTRAR CANCELADOS - Remover comissões com installment_status CANCELLED (pagas devem aparecer)
-        comissoes = [c for c in comissoes 
-                     if 'CANCEL' not in (c.get('installment_status') or '').upper()]
-        
-        # Log dos status unicos para debug
-        status_unicos = set()
-        for c in comissoes:
-            st = c.get('installment_status')
-            if st:
-                status_unicos.add(st)
-        print(f"[API] Status de parcela encontrados: {sorted(status_unicos)}")
-        
-        # DEBUG: Verificar valores de comissão e todos os campos disponíveis
-        if comissoes:
-            exemplo = comissoes[0]
-            print(f"[DEBUG] Exemplo comissão - valor_comissao: {exemplo.get('valor_comissao')}, commission_value: {exemplo.get('commission_value')}")
-            print(f"[DEBUG] Campos com valor: installment_percentage={exemplo.get('installment_percentage')}, contract_percentage_paid={exemplo.get('contract_percentage_paid')}")
-        
-        # Aplicar filtros em Python (mais flexível)
-        # Mapeamento de status PT-BR para valores em inglês
-        mapa_status_parcela = {
-            'pago': ['paidout', 'paid out', 'paid', 'pago'],
-            'pendente': ['pending', 'pendente'],
-            'vencido': ['overdue', 'vencido'],
-            'aberto': ['open', 'aberto'],
-            'parcial': ['partial', 'parcial'],
-            'cancelado': ['cancelled', 'canceled', 'cancelado'],
-            'aguardando autorização': ['awaiting authorization', 'awaiting_authorization', 'aguardando autorização'],
-            'liberado': ['released', 'liberado']
-        }
+        print(f"[API] Filtros recebidos - status_parcela: {status_parcela_list}, status_aprovacao: {status_aprovacao_list}, gatilho: {gatilho_list}, data_inicio: {data_inicio}, data_fim: {data_fim}, pagina: {pagina}")
         
-        # Filtro de status da parcela (multi-select)
-        if status_parcela_list:
-            def match_status_parcela(comissao):
-                status_comissao = (comissao.get('installment_status') or '').lower()
-                for status in status_parcela_list:
-                    status_lower = status.lower()
-                    valores_busca = mapa_status_parcela.get(status_lower, [status_lower])
-                    if any(v in status_comissao for v in valores_busca):
-                        return True
-                return False
-            comissoes = [c for c in comissoes if match_status_parcela(c)]
-        
-        # Filtro de status de aprovação (multi-select)
-        if status_aprovacao_list:
-            comissoes = [c for c in comissoes if c.get('status_aprovacao') in status_aprovacao_list]
-        
-        # Filtro de gatilho atingido (multi-select)
-        if gatilho_list:
-            gatilho_bools = [g.lower() == 'true' for g in gatilho_list]
-            comissoes = [c for c in comissoes if c.get('atingiu_gatilho') in gatilho_bools]
-        
-        # Ordenar por data
-        comissoes.sort(key=lambda x: x.get('commission_date') or '', reverse=True)
-        
-        # Buscar todos os valores pagos de uma vez só (otimizado)
-        try:
-            valores_pagos_result = sync.supabase.table('sienge_valor_pago').select('numero_contrato, building_id, valor_pago').execute()
-            # Criar dicionário para lookup rápido: chave = "numero_contrato|building_id"
-            valores_pagos_map = {}
-            if valores_pagos_result.data:
-                for vp in valores_pagos_result.data:
-                    chave = f"{vp.get('numero_contrato')}|{vp.get('building_id')}"
-                    valores_pagos_map[chave] = vp.get('valor_pago', 0)
-            
-            # Adicionar valor_pago a cada comissão usando o dicionário
-            for c in comissoes:
-                chave = f"{c.get('numero_contrato')}|{c.get('building_id')}"
-                c['valor_pago'] = valores_pagos_map.get(chave, 0)
-        except Exception as e:
-            print(f"Erro ao buscar valores pagos: {e}")
-            for c in comissoes:
-                c['valor_pago'] = 0
+        filtros = {
+            'status_parcela': status_parcela_list,
+            'status_aprovacao': status_aprovacao_list,
+            'gatilho': [g.lower() == 'true' for g in gatilho_list],
+            'data_inicio': data_inicio,
+            'data_fim': data_fim
+        }
         
-        # Buscar data_contrato da tabela sienge_contratos
-        try:
-            contratos_result = sync.supabase.table('sienge_contratos').select('numero_contrato, building_id, data_contrato').execute()
-            # Criar dicionário para lookup rápido
-            data_contrato_map = {}
-            if contratos_result.data:
-                for ct in contratos_result.data:
-                    chave = f"{ct.get('numero_contrato')}|{ct.get('building_id')}"
-                    data_contrato_map[chave] = ct.get('data_contrato')
-            
-            # Adicionar data_contrato a cada comissão
-            for c in comissoes:
-                chave = f"{c.get('numero_contrato')}|{c.get('building_id')}"
-                c['data_contrato'] = data_contrato_map.get(chave)
-        except Exception as e:
-            print(f"Erro ao buscar data_contrato: {e}")
-            for c in comissoes:
-                c['data_contrato'] = None
-        
-        # Filtro de período de data do contrato
-        if data_inicio or data_fim:
-            def filtrar_por_data(comissao):
-                data_contrato = comissao.get('data_contrato')
-                if not data_contrato:
-                    return False
-                
-                # Converter para formato comparável (YYYY-MM-DD)
-                try:
-                    # data_contrato pode vir em diferentes formatos
-                    if 'T' in str(data_contrato):
-                        data_str = str(data_contrato).split('T')[0]
-                    else:
-                        data_str = str(data_contrato)[:10]
-                    
-                    if data_inicio and data_str < data_inicio:
-                        return False
-                    if data_fim and data_str > data_fim:
-                        return False
-                    return True
-                except:
-                    return False
-            
-            comissoes = [c for c in comissoes if filtrar_por_data(c)]
-            print(f"[API] Após filtro de data: {len(comissoes)} comissões")
+        # Filtros como máscaras no snapshot em memória; sem ele (ou enquanto se atualiza), no Supabase
+        snapshot = snapshot_comissoes.pronto(sync.supabase)
+        if snapshot:
+            resultado = snapshot.paginar(sync.supabase, pagina=pagina, por_pagina=por_pagina, **filtros)
+        else:
+            resultado = sync.listar_comissoes_paginado(pagina=pagina, por_pagina=por_pagina, **filtros)
         
+        total = resultado['total']
         return jsonify({
             'sucesso': True,
-            'comissoes': comissoes,
-            'total': len(comissoes)
+            'comissoes': resultado['comissoes'],
+            'total': total,
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total_paginas': (total + por_pagina - 1) // por_pagina
         }), 200
         
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'sucesso': False, 'erro': str(e)}), 500
 
@@ -1413,6 +1419,27 @@ def listar_comissoes_pendentes_aprovacao():
         return jsonify({'sucesso': False, 'erro': str(e)}), 500
 
 
+@app.route('/api/dashboard/kpis', methods=['GET'])
+@login_required
+@com_etag('comissoes')
+def kpis_dashboard():
+    """Totais de comissões do dashboard da direção (lidos de kpis_comissoes)"""
+    perfil = getattr(current_user, 'perfil', None)
+    is_admin = hasattr(current_user, 'is_admin') and current_user.is_admin
+    
+    if perfil not in ['Gestor', 'Direção'] and not is_admin:
+        return jsonify({'erro': 'Apenas gestores e direção podem acessar os indicadores'}), 403
+    
+    try:
+        sync = SiengeSupabaseSync()
+        kpis = sync.get_kpis_comissoes()
+        
+        return jsonify({'sucesso': True, **kpis}), 200
+        
+    except Exception as e:
+        return jsonify({'sucesso': False, 'erro': str(e)}), 500
+
+
 # ==================== API - REVERTER COMISSÕES ====================
 
 @app.route('/api/comissoes/reverter-status', methods=['GET', 'POST'])
@@ -1426,12 +1453,10 @@ def reverter_status_comissoes():
         sync = SiengeSupabaseSync()
         
         # Buscar comissões que não estão pendentes
-        result = sync.supabase.table('sienge_comissoes')\
-            .select('id, status_aprovacao, broker_nome')\
-            .neq('status_aprovacao', 'Pendente')\
-            .execute()
-        
-        comissoes_para_reverter = result.data if result.data else []
+        comissoes_para_reverter = list(ler_tabela(
+            sync.supabase, 'sienge_comissoes', 'id, status_aprovacao, broker_nome',
+            filtros=[('neq', 'status_aprovacao', 'Pendente')]
+        ))
         total = len(comissoes_para_reverter)
         revertidas = 0
         
@@ -1455,6 +1480,10 @@ def reverter_status_comissoes():
             except Exception as e:
                 print(f"[REVERTER] Erro ao reverter comissão {c['id']}: {str(e)}")
         
+        ids_revertidos = [c['id'] for c in comissoes_para_reverter]
+        for i in range(0, len(ids_revertidos), 200):
+            sync.atualizar_comissoes_enriquecidas([('in_', 'id', ids_revertidos[i:i + 200])])
+        
         return jsonify({
             'sucesso': True,
             'mensagem': f'{revertidas} comissões revertidas para status Pendente',
@@ -1552,6 +1581,7 @@ def sincronizacao_diaria():
         print(f"[{datetime.now()}] Iniciando sincronização automática...")
         sync = SiengeSupabaseSync()
         resultado = sync.sync_all()
+        atualizar_indice_busca(sync.supabase)
         print(f"[{datetime.now()}] Sincronização concluída: {resultado}")
     except Exception as e:
         print(f"[{datetime.now()}] Erro na sincronização: {str(e)}")
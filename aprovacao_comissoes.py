@@ -10,6 +10,9 @@ from datetime import datetime
 from typing import List, Dict, Optional
 import os
 from dotenv import load_dotenv
+from leitura_paginada import ler_tabela
+from versao_dados import marcar_versao
+from email_outbox import enfileirar_email
 
 load_dotenv()
 
@@ -68,22 +71,24 @@ class AprovacaoComissoes:
         """
         try:
             observacoes = observacoes or {}
-            # 1. Validar que as comissões existem e estão pendentes
+            # 1. Validar que as comissões existem e estão pendentes (uma leitura por bloco de ids)
             comissoes = []
             valor_total = 0
             
-            for comissao_id in comissoes_ids:
-                response = self.supabase.table('sienge_comissoes')\
-                    .select('*')\
-                    .eq('id', comissao_id)\
-                    .execute()
-                
-                if response.data and len(response.data) > 0:
-                    comissao = response.data[0]
-                    # Só enviar se ainda não foi enviada para aprovação
-                    if comissao.get('status_aprovacao') in [self.STATUS_PENDENTE, None, '']:
-                        comissoes.append(comissao)
-                        valor_total += float(comissao.get('valor_comissao') or comissao.get('commission_value') or 0)
+            ids_pedidos = list(dict.fromkeys(_id_inteiro(comissao_id) for comissao_id in comissoes_ids))
+            encontradas = {}
+            for i in range(0, len(ids_pedidos), 200):
+                for comissao in ler_tabela(self.supabase, 'sienge_comissoes',
+                                           filtros=[('in_', 'id', ids_pedidos[i:i + 200])]):
+                    encontradas[comissao['id']] = comissao
+            
+            # Mantém a ordem em que as comissões foram selecionadas
+            for comissao_id in ids_pedidos:
+                comissao = encontradas.get(comissao_id)
+                # Só enviar se ainda não foi enviada para aprovação
+                if comissao and comissao.get('status_aprovacao') in [self.STATUS_PENDENTE, None, '']:
+                    comissoes.append(comissao)
+                    valor_total += float(comissao.get('valor_comissao') or comissao.get('commission_value') or 0)
             
             if not comissoes:
                 return {
@@ -110,7 +115,9 @@ class AprovacaoComissoes:
             except Exception as e:
                 print(f"Lote de aprovação não criado (usando timestamp): {str(e)}")
             
-            # 3. Atualizar status das comissões
+            # 3. Atualizar status das comissões: um update por observação distinta
+            # (sem observação, que é o caso comum, todas vão num único update)
+            ids_por_observacao: Dict[Optional[str], List[int]] = {}
             for comissao in comissoes:
                 # Pegar observação específica desta comissão
                 observacao_comissao = observacoes.get(str(comissao['id']), observacoes.get(comissao['id']))
@@ -118,48 +125,59 @@ class AprovacaoComissoes:
                 # Adicionar observação ao objeto comissão para o e-mail
                 if observacao_comissao:
                     comissao['observacoes_corretor'] = observacao_comissao
-                
-                # Atualizar status - tentar com todos os campos, se falhar tentar só com status
-                try:
+                ids_por_observacao.setdefault(observacao_comissao or None, []).append(comissao['id'])
+            
+            data_envio = datetime.now().isoformat()
+            ids_enviados = [comissao['id'] for comissao in comissoes]
+            
+            # Atualizar status - tentar com todos os campos, se falhar tentar só com status
+            try:
+                for observacao_comissao, ids in ids_por_observacao.items():
                     update_data = {
                         'status_aprovacao': self.STATUS_PENDENTE_APROVACAO,
-                        'data_envio_aprovacao': datetime.now().isoformat(),
+                        'data_envio_aprovacao': data_envio,
                         'enviado_por': usuario_id
                     }
                     if observacao_comissao:
                         update_data['observacoes_corretor'] = observacao_comissao
                     
-                    self.supabase.table('sienge_comissoes').update(update_data).eq('id', comissao['id']).execute()
-                except Exception as e:
-                    print(f"Erro com campos extras, tentando apenas status: {str(e)}")
-                    try:
+                    for i in range(0, len(ids), 200):
+                        self.supabase.table('sienge_comissoes').update(update_data).in_('id', ids[i:i + 200]).execute()
+                    self._espelhar_modelo_leitura(ids, update_data)
+            except Exception as e:
+                print(f"Erro com campos extras, tentando apenas status: {str(e)}")
+                try:
+                    for i in range(0, len(ids_enviados), 200):
                         self.supabase.table('sienge_comissoes').update({
                             'status_aprovacao': self.STATUS_PENDENTE_APROVACAO
-                        }).eq('id', comissao['id']).execute()
-                    except Exception as e2:
-                        print(f"Erro ao atualizar status: {str(e2)}")
-                
-                # Tentar registrar no histórico (opcional)
+                        }).in_('id', ids_enviados[i:i + 200]).execute()
+                    self._espelhar_modelo_leitura(ids_enviados, {
+                        'status_aprovacao': self.STATUS_PENDENTE_APROVACAO
+                    })
+                except Exception as e2:
+                    print(f"Erro ao atualizar status: {str(e2)}")
+            
+            # Tentar registrar no histórico (opcional) - um insert para o lote inteiro
+            try:
+                self.supabase.table('historico_aprovacoes').insert([{
+                    'comissao_id': comissao['id'],
+                    'status_anterior': comissao.get('status_aprovacao', self.STATUS_PENDENTE),
+                    'status_novo': self.STATUS_PENDENTE_APROVACAO,
+                    'acao': 'Enviado para aprovação',
+                    'realizado_por': usuario_id
+                } for comissao in comissoes]).execute()
+            except Exception as e:
+                print(f"Histórico não registrado (tabela pode não existir): {str(e)}")
+            
+            # Tentar vincular ao lote (opcional)
+            if lote_id:
                 try:
-                    self.supabase.table('historico_aprovacoes').insert({
-                        'comissao_id': comissao['id'],
-                        'status_anterior': comissao.get('status_aprovacao', self.STATUS_PENDENTE),
-                        'status_novo': self.STATUS_PENDENTE_APROVACAO,
-                        'acao': 'Enviado para aprovação',
-                        'realizado_por': usuario_id
-                    }).execute()
+                    self.supabase.table('comissoes_lotes').insert([{
+                        'comissao_id': comissao_id,
+                        'lote_id': lote_id
+                    } for comissao_id in ids_enviados]).execute()
                 except Exception as e:
-                    print(f"Histórico não registrado (tabela pode não existir): {str(e)}")
-                
-                # Tentar vincular ao lote (opcional)
-                if lote_id:
-                    try:
-                        self.supabase.table('comissoes_lotes').insert({
-                            'comissao_id': comissao['id'],
-                            'lote_id': lote_id
-                        }).execute()
-                    except Exception as e:
-                        print(f"Vínculo ao lote não registrado: {str(e)}")
+                    print(f"Vínculo ao lote não registrado: {str(e)}")
             
             # 4. Enviar E-MAIL ÚNICO consolidado
             email_enviado = self._enviar_email_aprovacao_direcao(comissoes, lote_id or 0, valor_total)
@@ -196,53 +214,29 @@ class AprovacaoComissoes:
         observacoes: Dict com {comissao_id: texto_observacao}
         """
         try:
-            comissoes_aprovadas = []
             observacoes = observacoes or {}
             
+            # Observação específica de cada comissão
+            observacao_por_id = {}
             for comissao_id in comissoes_ids:
-                # Validar que está pendente de aprovação
-                response = self.supabase.table('sienge_comissoes')\
-                    .select('*')\
-                    .eq('id', comissao_id)\
-                    .execute()
-                
-                if response.data and len(response.data) > 0:
-                    comissao = response.data[0]
-                    
-                    # Pegar observação específica desta comissão
-                    observacao_comissao = observacoes.get(str(comissao_id), observacoes.get(comissao_id))
-                    
-                    # Atualizar status
-                    self.supabase.table('sienge_comissoes').update({
-                        'status_aprovacao': self.STATUS_APROVADA,
-                        'data_aprovacao': datetime.now().isoformat(),
-                        'aprovado_por': usuario_id,
-                        'observacoes_direcao': observacao_comissao
-                    }).eq('id', comissao_id).execute()
-                    
-                    # Adicionar observação ao objeto comissão para o e-mail
-                    if observacao_comissao:
-                        comissao['observacoes_direcao'] = observacao_comissao
-                    
-                    # Registrar no histórico (opcional)
-                    try:
-                        self.supabase.table('historico_aprovacoes').insert({
-                            'comissao_id': comissao_id,
-                            'status_anterior': comissao.get('status_aprovacao', self.STATUS_PENDENTE_APROVACAO),
-                            'status_novo': self.STATUS_APROVADA,
-                            'acao': 'Aprovado pela direção',
-                            'realizado_por': usuario_id,
-                            'observacoes': observacao_comissao
-                        }).execute()
-                    except Exception as e:
-                        print(f"Histórico não registrado: {str(e)}")
-                    
-                    comissoes_aprovadas.append(comissao)
+                observacao_por_id[_id_inteiro(comissao_id)] = observacoes.get(str(comissao_id), observacoes.get(comissao_id))
+            
+            # Só passam as que ainda estão pendentes de aprovação
+            resultado = self.transicionar_status(
+                comissoes_ids, self.STATUS_PENDENTE_APROVACAO, self.STATUS_APROVADA, usuario_id,
+                acao='Aprovado pela direção',
+                dados={'data_aprovacao': datetime.now().isoformat(), 'aprovado_por': usuario_id},
+                dados_por_comissao={cid: {'observacoes_direcao': obs} for cid, obs in observacao_por_id.items()},
+                observacoes_historico=observacao_por_id
+            )
+            comissoes_aprovadas = resultado['movidas']
             
             if not comissoes_aprovadas:
                 return {
                     'sucesso': False,
-                    'mensagem': 'Nenhuma comissão válida para aprovar'
+                    'mensagem': 'Nenhuma comissão válida para aprovar' + _aviso_transicao(resultado),
+                    'ja_alteradas': resultado['ja_alteradas'],
+                    'falhas': resultado['falhas']
                 }
             
             # Enviar notificação para o financeiro
@@ -250,8 +244,10 @@ class AprovacaoComissoes:
             
             return {
                 'sucesso': True,
-                'mensagem': f'{len(comissoes_aprovadas)} comissões aprovadas',
+                'mensagem': f'{len(comissoes_aprovadas)} comissões aprovadas' + _aviso_transicao(resultado),
                 'total_comissoes': len(comissoes_aprovadas),
+                'ja_alteradas': resultado['ja_alteradas'],
+                'falhas': resultado['falhas'],
                 'email_enviado': email_enviado
             }
             
@@ -268,21 +264,11 @@ class AprovacaoComissoes:
         observacoes: Dict com {comissao_id: texto_observacao}
         """
         try:
-            count = 0
             observacoes = observacoes or {}
             
+            dados_por_comissao = {}
+            texto_por_id = {}
             for comissao_id in comissoes_ids:
-                # Buscar status atual
-                response = self.supabase.table('sienge_comissoes')\
-                    .select('status_aprovacao')\
-                    .eq('id', comissao_id)\
-                    .limit(1)\
-                    .execute()
-                
-                status_anterior = self.STATUS_PENDENTE_APROVACAO
-                if response.data:
-                    status_anterior = response.data[0].get('status_aprovacao', self.STATUS_PENDENTE_APROVACAO)
-                
                 # Pegar observação específica desta comissão
                 observacao_comissao = observacoes.get(str(comissao_id), observacoes.get(comissao_id))
                 
@@ -291,33 +277,35 @@ class AprovacaoComissoes:
                 if observacao_comissao:
                     texto_completo = f"{motivo}\n\nObservações da Direção: {observacao_comissao}"
                 
-                # Atualizar status
-                self.supabase.table('sienge_comissoes').update({
-                    'status_aprovacao': self.STATUS_REJEITADA,
-                    'data_aprovacao': datetime.now().isoformat(),
-                    'aprovado_por': usuario_id,
+                texto_por_id[_id_inteiro(comissao_id)] = texto_completo
+                dados_por_comissao[_id_inteiro(comissao_id)] = {
                     'observacoes': texto_completo,
                     'observacoes_direcao': observacao_comissao
-                }).eq('id', comissao_id).execute()
-                
-                # Registrar no histórico (opcional)
-                try:
-                    self.supabase.table('historico_aprovacoes').insert({
-                        'comissao_id': comissao_id,
-                        'status_anterior': status_anterior,
-                        'status_novo': self.STATUS_REJEITADA,
-                        'acao': 'Rejeitado pela direção',
-                        'realizado_por': usuario_id,
-                        'observacoes': texto_completo
-                    }).execute()
-                except Exception as e:
-                    print(f"Histórico não registrado: {str(e)}")
-                
-                count += 1
+                }
+            
+            # Só passam as que ainda estão pendentes de aprovação
+            resultado = self.transicionar_status(
+                comissoes_ids, self.STATUS_PENDENTE_APROVACAO, self.STATUS_REJEITADA, usuario_id,
+                acao='Rejeitado pela direção',
+                dados={'data_aprovacao': datetime.now().isoformat(), 'aprovado_por': usuario_id},
+                dados_por_comissao=dados_por_comissao,
+                observacoes_historico=texto_por_id
+            )
+            count = len(resultado['movidas'])
+            
+            if not count:
+                return {
+                    'sucesso': False,
+                    'mensagem': 'Nenhuma comissão pendente de aprovação para rejeitar' + _aviso_transicao(resultado),
+                    'ja_alteradas': resultado['ja_alteradas'],
+                    'falhas': resultado['falhas']
+                }
             
             return {
                 'sucesso': True,
-                'mensagem': f'{count} comissões rejeitadas'
+                'mensagem': f'{count} comissões rejeitadas' + _aviso_transicao(resultado),
+                'ja_alteradas': resultado['ja_alteradas'],
+                'falhas': resultado['falhas']
             }
             
         except Exception as e:
@@ -327,6 +315,112 @@ class AprovacaoComissoes:
                 'mensagem': f'Erro: {str(e)}'
             }
     
+    def transicionar_status(self, comissoes_ids: List[int], status_esperado: str, status_novo: str, usuario_id: int,
+                            acao: str, dados: Optional[Dict] = None, dados_por_comissao: Optional[Dict] = None,
+                            observacoes_historico: Optional[Dict] = None) -> Dict:
+        """
+        Move comissões de status_esperado para status_novo em lote, com update condicional:
+        o filtro status_aprovacao = status_esperado vai no próprio UPDATE, então só mudam as
+        linhas que ainda estão no estado esperado e dois aprovadores não aplicam a mesma ação
+        duas vezes. Comissões com os mesmos dados_por_comissao vão no mesmo update (por bloco
+        de 200 ids); o histórico das que mudaram é gravado num único insert.
+        
+        Um bloco que falha não interrompe os demais: as comissões já movidas sempre
+        recebem histórico e espelho no modelo de leitura, e os ids do bloco voltam em
+        'falhas' (o status delas não foi confirmado).
+        
+        dados: colunas gravadas em todas; dados_por_comissao: {id: colunas desta comissão}
+        observacoes_historico: {id: texto} para a coluna observacoes do histórico
+        Retorna {'movidas': [linhas atualizadas], 'ja_alteradas': [{'id', 'status_aprovacao'}],
+                 'nao_encontradas': [ids], 'falhas': [ids]}
+        """
+        dados = dados or {}
+        dados_por_comissao = dados_por_comissao or {}
+        observacoes_historico = observacoes_historico or {}
+        ids = list(dict.fromkeys(_id_inteiro(comissao_id) for comissao_id in comissoes_ids))
+        
+        grupos: Dict[tuple, List[int]] = {}
+        for comissao_id in ids:
+            extras = dados_por_comissao.get(comissao_id) or {}
+            grupos.setdefault(tuple(sorted(extras.items())), []).append(comissao_id)
+        
+        movidas = []
+        falhas = []
+        for extras, ids_grupo in grupos.items():
+            update_data = {**dados, **dict(extras), 'status_aprovacao': status_novo}
+            movidas_grupo = []
+            for i in range(0, len(ids_grupo), 200):
+                bloco = ids_grupo[i:i + 200]
+                try:
+                    response = self.supabase.table('sienge_comissoes')\
+                        .update(update_data)\
+                        .in_('id', bloco)\
+                        .eq('status_aprovacao', status_esperado)\
+                        .execute()
+                except Exception as e:
+                    print(f"Erro ao alterar status de {len(bloco)} comissões para '{status_novo}': {str(e)}")
+                    falhas.extend(bloco)
+                    continue
+                movidas_grupo.extend(response.data or [])
+            
+            if movidas_grupo:
+                self._espelhar_modelo_leitura([c['id'] for c in movidas_grupo], update_data)
+            movidas.extend(movidas_grupo)
+        
+        # Registrar no histórico (opcional) - um insert para todas as que mudaram
+        if movidas:
+            try:
+                self.supabase.table('historico_aprovacoes').insert([{
+                    'comissao_id': comissao['id'],
+                    'status_anterior': status_esperado,
+                    'status_novo': status_novo,
+                    'acao': acao,
+                    'realizado_por': usuario_id,
+                    'observacoes': observacoes_historico.get(comissao['id'])
+                } for comissao in movidas]).execute()
+            except Exception as e:
+                print(f"Histórico não registrado: {str(e)}")
+        
+        # As que não mudaram: já estavam em outro status ou não existem
+        ids_processados = {comissao['id'] for comissao in movidas}.union(falhas)
+        restantes = [comissao_id for comissao_id in ids if comissao_id not in ids_processados]
+        status_atual = {}
+        try:
+            for i in range(0, len(restantes), 200):
+                for comissao in ler_tabela(self.supabase, 'sienge_comissoes', 'id, status_aprovacao',
+                                           filtros=[('in_', 'id', restantes[i:i + 200])]):
+                    status_atual[comissao['id']] = comissao.get('status_aprovacao')
+        except Exception as e:
+            # Sem a conferência, o motivo de não terem mudado fica desconhecido
+            print(f"Erro ao conferir status das comissões não alteradas: {str(e)}")
+            falhas.extend(restantes)
+            restantes = []
+        
+        return {
+            'movidas': movidas,
+            'ja_alteradas': [{'id': comissao_id, 'status_aprovacao': status_atual[comissao_id]}
+                             for comissao_id in restantes if comissao_id in status_atual],
+            'nao_encontradas': [comissao_id for comissao_id in restantes if comissao_id not in status_atual],
+            'falhas': falhas
+        }
+    
+    def _espelhar_modelo_leitura(self, comissoes_ids: List[int], dados: Dict):
+        """
+        Aplica em comissoes_enriquecidas a mesma atualização de status feita em sienge_comissoes,
+        sem esperar a próxima sincronização (as colunas de aprovação têm o mesmo nome)
+        """
+        try:
+            # atualizado_em para a recarga incremental dos snapshots em memória
+            # (com o trigger de criar_versao_dados.sql, o banco grava o próprio NOW())
+            self.supabase.table('comissoes_enriquecidas')\
+                .update({**dados, 'atualizado_em': datetime.now().isoformat()})\
+                .in_('id', comissoes_ids)\
+                .execute()
+        except Exception as e:
+            print(f"Modelo de leitura não atualizado (tabela pode não existir): {str(e)}")
+            return
+        marcar_versao(self.supabase, 'comissoes')
+    
     def _enviar_email_aprovacao_direcao(self, comissoes: List[Dict], lote_id: int, valor_total: float) -> bool:
         """
         Envia E-MAIL ÚNICO consolidado para a direção
@@ -344,21 +438,8 @@ class AprovacaoComissoes:
             # Criar mensagem HTML
             html = self._criar_email_html_direcao(comissoes, lote_id, valor_total)
             
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f'[APROVAÇÃO] Lote #{lote_id} - {len(comissoes)} comissões - R$ {valor_total:,.2f}'
-            msg['From'] = self.email_from
-            msg['To'] = ', '.join(emails_direcao)
-            
-            msg.attach(MIMEText(html, 'html'))
-            
-            # Enviar e-mail
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            print(f"E-mail de aprovação enviado para {emails_direcao}")
-            return True
+            assunto = f'[APROVAÇÃO] Lote #{lote_id} - {len(comissoes)} comissões - R$ {valor_total:,.2f}'
+            return self._enviar_email('direcao', emails_direcao, assunto, html, referencia=f'lote:{lote_id}')
             
         except Exception as e:
             print(f"Erro ao enviar e-mail: {str(e)}")
@@ -383,26 +464,42 @@ class AprovacaoComissoes:
             # Criar mensagem HTML
             html = self._criar_email_html_financeiro(comissoes, valor_total)
             
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f'[APROVADO] {len(comissoes)} comissões aprovadas - R$ {valor_total:,.2f}'
-            msg['From'] = self.email_from
-            msg['To'] = ', '.join(emails_financeiro)
-            
-            msg.attach(MIMEText(html, 'html'))
-            
-            # Enviar e-mail
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            print(f"E-mail de aprovação enviado para financeiro")
-            return True
+            assunto = f'[APROVADO] {len(comissoes)} comissões aprovadas - R$ {valor_total:,.2f}'
+            return self._enviar_email('financeiro', emails_financeiro, assunto, html)
             
         except Exception as e:
             print(f"Erro ao enviar e-mail para financeiro: {str(e)}")
             return False
     
+    def _enviar_email(self, tipo: str, destinatarios: List[str], assunto: str, html: str,
+                      referencia: Optional[str] = None) -> bool:
+        """
+        Coloca o e-mail na fila email_outbox (enviado em segundo plano, sem segurar a
+        requisição). Sem a tabela, envia direto por SMTP como antes.
+        """
+        try:
+            email_id = enfileirar_email(self.supabase, tipo, destinatarios, assunto, html, referencia)
+            print(f"E-mail para {tipo} na fila de envio (#{email_id})")
+            return True
+        except Exception as e:
+            print(f"Fila de e-mails indisponível, enviando direto (tabela pode não existir): {str(e)}")
+        
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = assunto
+        msg['From'] = self.email_from
+        msg['To'] = ', '.join(destinatarios)
+        
+        msg.attach(MIMEText(html, 'html'))
+        
+        # Enviar e-mail
+        with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
+            server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+            server.send_message(msg)
+        
+        print(f"E-mail de aprovação enviado para {destinatarios}")
+        return True
+    
     def _criar_email_html_direcao(self, comissoes: List[Dict], lote_id: int, valor_total: float) -> str:
         """Cria HTML do e-mail para direção"""
         linhas_tabela = ""
@@ -541,19 +638,16 @@ class AprovacaoComissoes:
     def listar_comissoes_por_status(self, status: Optional[str] = None, gatilho_atingido: Optional[bool] = None) -> List[Dict]:
         """Lista comissões com filtros opcionais (exclui canceladas)"""
         try:
-            query = self.supabase.table('sienge_comissoes').select('*')
+            filtros = []
             
             if status:
-                query = query.eq('status_aprovacao', status)
+                filtros.append(('eq', 'status_aprovacao', status))
             
             if gatilho_atingido is not None:
-                query = query.eq('atingiu_gatilho', gatilho_atingido)
-            
-            response = query.execute()
+                filtros.append(('eq', 'atingiu_gatilho', gatilho_atingido))
             
             # Filtrar comissões canceladas (pagas devem aparecer com status Aprovada)
-            comissoes = response.data if response.data else []
-            comissoes = [c for c in comissoes 
+            comissoes = [c for c in ler_tabela(self.supabase, 'sienge_comissoes', filtros=filtros)
                          if 'CANCEL' not in (c.get('installment_status') or '').upper()]
             
             # Ordenar manualmente por data
@@ -564,3 +658,22 @@ class AprovacaoComissoes:
         except Exception as e:
             print(f"Erro ao listar comissões: {str(e)}")
             return []
+
+
+def _id_inteiro(comissao_id):
+    """Id vindo do front (às vezes texto) como inteiro, para casar com o id do banco"""
+    try:
+        return int(comissao_id)
+    except (TypeError, ValueError):
+        return comissao_id
+
+
+def _aviso_transicao(resultado: Dict) -> str:
+    """Complemento da mensagem quando parte das comissões já tinha mudado de status ou deu erro"""
+    avisos = []
+    if resultado['ja_alteradas']:
+        avisos.append(f"{len(resultado['ja_alteradas'])} já tinham sido alteradas por outro usuário")
+    if resultado['falhas']:
+        ids = ', '.join(str(comissao_id) for comissao_id in resultado['falhas'])
+        avisos.append(f"{len(resultado['falhas'])} não puderam ser alteradas por erro (ids: {ids})")
+    return f" ({'; '.join(avisos)})" if avisos else ''
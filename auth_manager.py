@@ -4,16 +4,53 @@ Gerencia autenticação de usuários (gestores e corretores) com Flask-Login
 """
 
 import os
+import re
+import hmac
+import atexit
 import hashlib
+import threading
+import time
 import bcrypt
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from flask_login import UserMixin
 from supabase import create_client
 from dotenv import load_dotenv
+from leitura_paginada import ler_tabela
+from documentos import normalizar_documento
+from versao_dados import marcar_versao, obter_versao
 
 load_dotenv()
 
+# Segundos em que o usuário carregado pelo user_loader é reaproveitado no worker
+TTL_USUARIO = 30
+MAX_USUARIOS_CACHE = 1000
+
+# Chave em versao_dados: alterações de usuário invalidam o cache dos outros workers
+CHAVE_VERSAO_USUARIOS = 'usuarios'
+
+# Segundos entre as gravações em lote de ultimo_login (buffer em memória no worker)
+INTERVALO_GRAVACAO_LOGIN = 60
+
+# Coluna de id das tabelas que têm ultimo_login
+COLUNAS_ID_LOGIN = {'usuarios': 'id', 'sienge_corretores': 'sienge_id'}
+
+# Custo do bcrypt (log2 das iterações) das senhas novas e regravadas no login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+# Verificações bcrypt simultâneas por worker e quantas podem aguardar na fila;
+# além disso o login é recusado na hora (LoginOcupadoError) em vez de enfileirar
+BCRYPT_THREADS = int(os.getenv('BCRYPT_THREADS', str(min(4, os.cpu_count() or 1))))
+BCRYPT_FILA_MAX = int(os.getenv('BCRYPT_FILA_MAX', str(BCRYPT_THREADS * 4)))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix='bcrypt')
+_bcrypt_vagas = threading.BoundedSemaphore(BCRYPT_THREADS + BCRYPT_FILA_MAX)
+
+
+class LoginOcupadoError(Exception):
+    """Pool de verificação de senhas e fila cheios: o login deve ser tentado de novo em instantes"""
+
 
 class Usuario(UserMixin):
     """Classe de usuário para Flask-Login"""
@@ -52,29 +89,111 @@ class AuthManager:
             os.getenv('SUPABASE_URL'),
             os.getenv('SUPABASE_KEY')
         )
+        # Falso se usuarios ainda não tiver a coluna username_normalizado
+        self._usa_username_normalizado = True
+        # get_id() -> (Usuario/CorretorUser ou None, instante da leitura)
+        self._usuarios_cache: Dict[str, tuple] = {}
+        self._usuarios_versao = None
+        self._usuarios_lock = threading.Lock()
+        # tabela -> {id: instante do último login}, gravado por gravar_ultimos_logins
+        self._ultimos_logins: Dict[str, Dict] = {}
+        self._ultimos_logins_lock = threading.Lock()
+        self._gravador_logins: Optional[threading.Thread] = None
+        atexit.register(self.gravar_ultimos_logins)
     
     def _hash_senha(self, senha: str) -> str:
-        """Gera hash bcrypt da senha"""
-        return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """Gera hash bcrypt da senha (custo BCRYPT_ROUNDS, no pool do bcrypt)"""
+        return executar_bcrypt(_gerar_hash_bcrypt, senha).result()
     
     def _verificar_senha(self, senha: str, hash_armazenado: str) -> bool:
-        """Verifica senha contra hash (bcrypt ou SHA256)"""
+        """
+        Verifica senha contra hash (bcrypt ou SHA256).
+        O bcrypt roda no pool limitado; LoginOcupadoError se ele estiver saturado.
+        """
         if not hash_armazenado or not senha:
             return False
         
         # Bcrypt hash começa com $2b$ ou $2a$
         if hash_armazenado.startswith('$2b$') or hash_armazenado.startswith('$2a$'):
-            try:
-                return bcrypt.checkpw(senha.encode('utf-8'), hash_armazenado.encode('utf-8'))
-            except Exception:
-                return False
+            return executar_bcrypt(_conferir_bcrypt, senha, hash_armazenado).result()
         
         # SHA256 hash (64 caracteres hex)
         if len(hash_armazenado) == 64:
-            return hashlib.sha256(senha.encode()).hexdigest() == hash_armazenado
+            return hmac.compare_digest(hashlib.sha256(senha.encode()).hexdigest(), hash_armazenado)
         
         # Texto plano (não recomendado)
-        return hash_armazenado == senha
+        return hmac.compare_digest(hash_armazenado.encode('utf-8'), senha.encode('utf-8'))
+    
+    def registrar_ultimo_login(self, tabela: str, valor_id):
+        """Guarda o instante do login para a próxima gravação em lote (sem ida ao banco)"""
+        with self._ultimos_logins_lock:
+            self._ultimos_logins.setdefault(tabela, {})[valor_id] = datetime.now().isoformat()
+            if self._gravador_logins is None:
+                self._gravador_logins = threading.Thread(target=self._gravar_periodicamente,
+                                                         name='ultimo-login', daemon=True)
+                self._gravador_logins.start()
+    
+    def gravar_ultimos_logins(self) -> int:
+        """
+        Grava ultimo_login dos logins acumulados: um update().in_ por tabela e minuto
+        (cada id recebe o instante mais recente do seu minuto). O update só alcança
+        linhas com ultimo_login nulo ou mais antigo, para um worker atrasado não
+        voltar o valor gravado por outro. Em caso de erro os logins voltam para o
+        buffer. Retorna quantos registros foram enviados.
+        """
+        with self._ultimos_logins_lock:
+            pendentes, self._ultimos_logins = self._ultimos_logins, {}
+        
+        gravados = 0
+        for tabela, logins in pendentes.items():
+            por_minuto: Dict[str, list] = {}
+            for valor_id, instante in logins.items():
+                por_minuto.setdefault(instante[:16], []).append(valor_id)
+            
+            for ids in por_minuto.values():
+                instante = max(logins[valor_id] for valor_id in ids)
+                try:
+                    for i in range(0, len(ids), 200):
+                        self.supabase.table(tabela)\
+                            .update({'ultimo_login': instante})\
+                            .in_(COLUNAS_ID_LOGIN[tabela], ids[i:i + 200])\
+                            .or_(f'ultimo_login.is.null,ultimo_login.lt."{instante}"')\
+                            .execute()
+                    gravados += len(ids)
+                except Exception as e:
+                    print(f"[AUTH] Erro ao gravar ultimo_login em {tabela}: {str(e)}")
+                    with self._ultimos_logins_lock:
+                        buffer = self._ultimos_logins.setdefault(tabela, {})
+                        for valor_id in ids:
+                            # Login mais novo chegou durante a gravação: ele prevalece
+                            buffer.setdefault(valor_id, logins[valor_id])
+        return gravados
+    
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(INTERVALO_GRAVACAO_LOGIN)
+            try:
+                self.gravar_ultimos_logins()
+            except Exception as e:
+                print(f"[AUTH] Erro na gravação periódica de ultimo_login: {str(e)}")
+    
+    def _regravar_hash(self, tabela: str, coluna_id: str, valor_id, coluna_hash: str, senha: str, hash_armazenado: str):
+        """
+        Após um login correto, troca hash SHA256, texto plano ou bcrypt com custo
+        diferente de BCRYPT_ROUNDS por um bcrypt novo, na mesma coluna.
+        Falhas (inclusive pool cheio) só adiam a troca para o próximo login.
+        """
+        if not precisa_rehash(hash_armazenado):
+            return
+        try:
+            novo_hash = self._hash_senha(senha)
+            self.supabase.table(tabela)\
+                .update({coluna_hash: novo_hash})\
+                .eq(coluna_id, valor_id)\
+                .execute()
+            print(f"[AUTH] Hash de senha atualizado para bcrypt ({tabela} {valor_id})")
+        except Exception as e:
+            print(f"[AUTH] Hash de senha não atualizado ({tabela} {valor_id}): {str(e)}")
     
     def autenticar(self, username: str, senha: str) -> Optional[Usuario]:
         """Autentica um usuário gestor.
@@ -82,67 +201,30 @@ class AuthManager:
         Aceita senha em texto plano ou hash SHA256 na coluna 'senha_hash' ou 'senha'.
         """
         try:
-            # Normalizar username
-            username_normalizado = username.strip().lower()
-            
-            # Buscar todos os usuários e filtrar case-insensitive
-            resultado = self.supabase.table('usuarios')\
-                .select('*')\
-                .execute()
-            
-            print(f"[DEBUG] Buscando usuario: '{username_normalizado}'")
-            print(f"[DEBUG] Total usuarios encontrados: {len(resultado.data) if resultado.data else 0}")
-            
-            if not resultado.data:
-                print("[DEBUG] Nenhum usuario na tabela")
-                return None
-            
-            # Mostrar todos os usernames disponíveis
-            for u in resultado.data:
-                print(f"[DEBUG] Usuario na tabela: '{u.get('username')}' | colunas: {list(u.keys())}")
-            
-            # Encontrar usuário com username case-insensitive
-            usuario_data = None
-            for u in resultado.data:
-                u_username = (u.get('username') or '').strip().lower()
-                if u_username == username_normalizado:
-                    usuario_data = u
-                    break
+            usuario_data = self.buscar_usuario_por_username(username)
             
             if not usuario_data:
-                print(f"[DEBUG] Usuario '{username_normalizado}' nao encontrado")
                 return None
             
-            print(f"[DEBUG] Usuario encontrado: {usuario_data}")
-            
             # Ignorar se tiver coluna ativo e estiver inativo
             if usuario_data.get('ativo') is False:
-                print("[DEBUG] Usuario inativo")
                 return None
             
             # Aceita 'password_hash', 'senha_hash' ou 'senha'
-            hash_armazenado = usuario_data.get('password_hash') or usuario_data.get('senha_hash') or usuario_data.get('senha')
-            print(f"[DEBUG] Hash armazenado: '{hash_armazenado}'")
+            coluna_hash = next((c for c in ('password_hash', 'senha_hash', 'senha') if usuario_data.get(c)), None)
             
-            if not hash_armazenado:
-                print("[DEBUG] Nenhuma senha encontrada no registro")
+            if not coluna_hash:
                 return None
+            hash_armazenado = usuario_data[coluna_hash]
             
             # Verificar senha (bcrypt, SHA256 ou texto plano)
-            senha_correta = self._verificar_senha(senha, hash_armazenado)
-            print(f"[DEBUG] Senha correta: {senha_correta}")
-            
-            if not senha_correta:
+            if not self._verificar_senha(senha, hash_armazenado):
                 return None
             
-            # Atualizar último login (opcional)
-            try:
-                self.supabase.table('usuarios')\
-                    .update({'ultimo_login': datetime.now().isoformat()})\
-                    .eq('id', usuario_data['id'])\
-                    .execute()
-            except Exception:
-                pass
+            self._regravar_hash('usuarios', 'id', usuario_data['id'], coluna_hash, senha, hash_armazenado)
+            
+            # Último login: gravado em lote, fora do caminho do login
+            self.registrar_ultimo_login('usuarios', usuario_data['id'])
             
             # Criar objeto usuário
             return Usuario(
@@ -152,35 +234,56 @@ class AuthManager:
                 is_admin=usuario_data.get('is_admin', False),
                 perfil=usuario_data.get('perfil', 'Gestor')
             )
+        except LoginOcupadoError:
+            raise
         except Exception as e:
             print(f"Erro ao autenticar: {str(e)}")
             import traceback
             traceback.print_exc()
             return None
     
+    def buscar_usuario_por_username(self, username: str) -> Optional[dict]:
+        """
+        Registro de usuarios pelo username, sem diferenciar maiúsculas nem espaços nas pontas.
+        Usa a coluna indexada username_normalizado (uma linha por login, qualquer que
+        seja o tamanho da tabela). Só se a coluna não existir, busca por ilike no
+        username e compara sem os espaços das pontas.
+        """
+        username_normalizado = (username or '').strip().lower()
+        if not username_normalizado:
+            return None
+        
+        if self._usa_username_normalizado:
+            try:
+                resultado = self.supabase.table('usuarios')\
+                    .select('*')\
+                    .eq('username_normalizado', username_normalizado)\
+                    .limit(1)\
+                    .execute()
+                return resultado.data[0] if resultado.data else None
+            except Exception as e:
+                # Falha de rede ou timeout sobe: só a coluna ausente muda o caminho de vez
+                if not _coluna_inexistente(e):
+                    raise
+                print("[AUTH] Coluna username_normalizado não existe (execute adicionar_username_normalizado.sql), usando ilike")
+                self._usa_username_normalizado = False
+        
+        # '%' e '_' do username valem literalmente; os '%' das pontas aceitam espaços
+        # gravados antes/depois do username, conferidos abaixo como no login antigo
+        padrao = re.sub(r'([%_\\])', r'\\\1', username_normalizado)
+        for usuario in ler_tabela(self.supabase, 'usuarios', filtros=[('ilike', 'username', f'%{padrao}%')]):
+            if (usuario.get('username') or '').strip().lower() == username_normalizado:
+                return usuario
+        return None
+    
     def autenticar_corretor(self, cpf: str, senha: str) -> Optional[CorretorUser]:
         """Autentica um corretor usando a tabela sienge_corretores"""
         try:
-            # Limpar documento (remover pontos, traços e barras)
-            doc_limpo = cpf.replace('.', '').replace('-', '').replace('/', '').strip()
+            doc_limpo = normalizar_documento(cpf)
             
             print(f"[AUTH] Tentando autenticar corretor com documento: {doc_limpo}")
             
-            # Buscar todos os corretores e filtrar em Python (mais confiável)
-            resultado = self.supabase.table('sienge_corretores')\
-                .select('*')\
-                .execute()
-            
-            corretor_data = None
-            if resultado.data:
-                for c in resultado.data:
-                    # Limpar CPF/CNPJ do banco para comparação
-                    cpf_banco = (c.get('cpf') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                    cnpj_banco = (c.get('cnpj') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                    
-                    if cpf_banco == doc_limpo or cnpj_banco == doc_limpo:
-                        corretor_data = c
-                        break
+            corretor_data = self.buscar_corretor_por_documento(doc_limpo)
             
             if not corretor_data:
                 print(f"[AUTH] Corretor não encontrado com documento: {doc_limpo}")
@@ -194,23 +297,20 @@ class AuthManager:
                 return None
             
             # Verificar se tem senha cadastrada
-            hash_armazenado = corretor_data.get('senha_hash') or corretor_data.get('password_hash')
-            if not hash_armazenado:
+            coluna_hash = next((c for c in ('senha_hash', 'password_hash') if corretor_data.get(c)), None)
+            if not coluna_hash:
                 print(f"[AUTH] Corretor não tem senha cadastrada")
                 return None
+            hash_armazenado = corretor_data[coluna_hash]
             
             if not self._verificar_senha(senha, hash_armazenado):
                 print(f"[AUTH] Senha incorreta")
                 return None
             
-            # Atualizar último login
-            try:
-                self.supabase.table('sienge_corretores')\
-                    .update({'ultimo_login': datetime.now().isoformat()})\
-                    .eq('sienge_id', corretor_data['sienge_id'])\
-                    .execute()
-            except Exception:
-                pass
+            self._regravar_hash('sienge_corretores', 'sienge_id', corretor_data['sienge_id'], coluna_hash, senha, hash_armazenado)
+            
+            # Último login: gravado em lote, fora do caminho do login
+            self.registrar_ultimo_login('sienge_corretores', corretor_data['sienge_id'])
             
             return CorretorUser(
                 id=corretor_data['sienge_id'],
@@ -219,68 +319,123 @@ class AuthManager:
                 email=corretor_data.get('email', ''),
                 sienge_id=corretor_data.get('sienge_id')
             )
+        except LoginOcupadoError:
+            raise
         except Exception as e:
             print(f"Erro ao autenticar corretor: {str(e)}")
             import traceback
             traceback.print_exc()
             return None
     
+    def buscar_corretor_por_documento(self, documento: str) -> Optional[dict]:
+        """
+        Busca o registro de sienge_corretores pelo CPF/CNPJ (com ou sem pontuação),
+        numa consulta à coluna gerada e indexada documentos (CPF e CNPJ).
+        """
+        doc = normalizar_documento(documento)
+        if not doc:
+            return None
+        
+        try:
+            resultado = self.supabase.table('sienge_corretores')\
+                .select('*')\
+                .contains('documentos', [doc])\
+                .limit(1)\
+                .execute()
+        except Exception as e:
+            if _coluna_inexistente(e):
+                print("[AUTH] Coluna documentos não existe (execute adicionar_documento_corretores.sql)")
+            raise
+        return resultado.data[0] if resultado.data else None
+    
     def buscar_usuario_por_id(self, user_id: str) -> Optional[Usuario]:
-        """Busca usuário pelo ID (para Flask-Login)"""
+        """
+        Busca usuário pelo ID (para Flask-Login).
+        O resultado fica em cache no worker por TTL_USUARIO segundos, então a maioria
+        das requisições autenticadas não consulta o Supabase; alterações de senha,
+        perfil e desativação chamam invalidar_usuario.
+        """
+        chave = str(user_id)
+        agora = time.monotonic()
+        versao = obter_versao(self.supabase, CHAVE_VERSAO_USUARIOS)
+        with self._usuarios_lock:
+            # Usuário alterado em outro worker: descarta o cache inteiro
+            if versao != self._usuarios_versao:
+                self._usuarios_cache.clear()
+                self._usuarios_versao = versao
+            em_cache = self._usuarios_cache.get(chave)
+        if em_cache and agora - em_cache[1] < TTL_USUARIO:
+            return em_cache[0]
+        
         try:
-            # Verificar se é corretor
-            if str(user_id).startswith('corretor_'):
-                corretor_id = int(user_id.replace('corretor_', ''))
-                resultado = self.supabase.table('sienge_corretores')\
-                    .select('*')\
-                    .eq('sienge_id', corretor_id)\
-                    .execute()
-                
-                if resultado.data:
-                    corretor_data = resultado.data[0]
-                    # Verificar se está ativo (pode não ter o campo, então default True)
-                    if corretor_data.get('ativo') is False:
-                        return None
-                    return CorretorUser(
-                        id=corretor_data['sienge_id'],
-                        cpf=corretor_data.get('cpf') or corretor_data.get('cnpj') or '',
-                        nome=corretor_data.get('nome', ''),
-                        email=corretor_data.get('email', ''),
-                        sienge_id=corretor_data.get('sienge_id')
-                    )
-                return None
-            
-            # Buscar usuário gestor
-            resultado = self.supabase.table('usuarios')\
+            usuario = self._ler_usuario_por_id(chave)
+        except Exception as e:
+            print(f"Erro ao buscar usuário: {str(e)}")
+            return None
+        
+        with self._usuarios_lock:
+            if len(self._usuarios_cache) >= MAX_USUARIOS_CACHE:
+                self._usuarios_cache = {k: v for k, v in self._usuarios_cache.items() if agora - v[1] < TTL_USUARIO}
+            self._usuarios_cache[chave] = (usuario, agora)
+        return usuario
+    
+    def invalidar_usuario(self, user_id, is_corretor: bool = False):
+        """
+        Remove o usuário do cache do user_loader: neste worker na hora, nos demais
+        na próxima leitura da versão 'usuarios' (até TTL_VERSAO segundos)
+        """
+        chave = f"corretor_{user_id}" if is_corretor else str(user_id)
+        with self._usuarios_lock:
+            self._usuarios_cache.pop(chave, None)
+        marcar_versao(self.supabase, CHAVE_VERSAO_USUARIOS)
+    
+    def _ler_usuario_por_id(self, user_id: str) -> Optional[Usuario]:
+        """Lê o usuário gestor ou corretor ('corretor_<sienge_id>') do Supabase"""
+        # Verificar se é corretor
+        if str(user_id).startswith('corretor_'):
+            corretor_id = int(user_id.replace('corretor_', ''))
+            resultado = self.supabase.table('sienge_corretores')\
                 .select('*')\
-                .eq('id', int(user_id))\
-                .eq('ativo', True)\
+                .eq('sienge_id', corretor_id)\
                 .execute()
             
             if resultado.data:
-                usuario_data = resultado.data[0]
-                return Usuario(
-                    id=usuario_data['id'],
-                    username=usuario_data['username'],
-                    nome_completo=usuario_data['nome_completo'],
-                    is_admin=usuario_data.get('is_admin', False),
-                    perfil=usuario_data.get('perfil', 'Gestor')
+                corretor_data = resultado.data[0]
+                # Verificar se está ativo (pode não ter o campo, então default True)
+                if corretor_data.get('ativo') is False:
+                    return None
+                return CorretorUser(
+                    id=corretor_data['sienge_id'],
+                    cpf=corretor_data.get('cpf') or corretor_data.get('cnpj') or '',
+                    nome=corretor_data.get('nome', ''),
+                    email=corretor_data.get('email', ''),
+                    sienge_id=corretor_data.get('sienge_id')
                 )
             return None
-        except Exception as e:
-            print(f"Erro ao buscar usuário: {str(e)}")
-            return None
+        
+        # Buscar usuário gestor
+        resultado = self.supabase.table('usuarios')\
+            .select('*')\
+            .eq('id', int(user_id))\
+            .eq('ativo', True)\
+            .execute()
+        
+        if resultado.data:
+            usuario_data = resultado.data[0]
+            return Usuario(
+                id=usuario_data['id'],
+                username=usuario_data['username'],
+                nome_completo=usuario_data['nome_completo'],
+                is_admin=usuario_data.get('is_admin', False),
+                perfil=usuario_data.get('perfil', 'Gestor')
+            )
+        return None
     
     def criar_usuario(self, username: str, senha: str, nome_completo: str, is_admin: bool = False, perfil: str = 'Gestor') -> dict:
         """Cria um novo usuário gestor"""
         try:
             # Verificar se username já existe
-            existente = self.supabase.table('usuarios')\
-                .select('id')\
-                .eq('username', username)\
-                .execute()
-            
-            if existente.data:
+            if self.buscar_usuario_por_username(username):
                 return {'sucesso': False, 'erro': 'Username já existe'}
             
             # Criar usuário
@@ -303,7 +458,7 @@ class AuthManager:
     def criar_corretor(self, cpf: str, senha: str, nome: str, email: str = None, sienge_id: int = None) -> dict:
         """Cadastra senha para um corretor existente na tabela sienge_corretores"""
         try:
-            doc_limpo = cpf.replace('.', '').replace('-', '').replace('/', '').strip()
+            doc_limpo = normalizar_documento(cpf)
             
             print(f"[AUTH] Criando acesso para corretor: {nome}, documento: {doc_limpo}, sienge_id: {sienge_id}")
             
@@ -320,18 +475,7 @@ class AuthManager:
             
             # Se não encontrou por sienge_id, buscar por CPF/CNPJ
             if not corretor:
-                existente = self.supabase.table('sienge_corretores')\
-                    .select('*')\
-                    .execute()
-                
-                if existente.data:
-                    for c in existente.data:
-                        cpf_banco = (c.get('cpf') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                        cnpj_banco = (c.get('cnpj') or '').replace('.', '').replace('-', '').replace('/', '').strip()
-                        
-                        if cpf_banco == doc_limpo or cnpj_banco == doc_limpo:
-                            corretor = c
-                            break
+                corretor = self.buscar_corretor_por_documento(doc_limpo)
             
             if not corretor:
                 return {'sucesso': False, 'erro': 'Corretor não encontrado no sistema SIENGE. Verifique o CPF/CNPJ.'}
@@ -368,6 +512,8 @@ class AuthManager:
     def listar_usuarios(self) -> list:
         """Lista todos os usuários ativos"""
         try:
+            # Logins ainda no buffer deste worker aparecem na listagem
+            self.gravar_ultimos_logins()
             resultado = self.supabase.table('usuarios')\
                 .select('id, username, nome_completo, is_admin, perfil, criado_em, ultimo_login')\
                 .eq('ativo', True)\
@@ -381,6 +527,7 @@ class AuthManager:
     def listar_corretores_usuarios(self) -> list:
         """Lista todos os corretores que têm acesso ao sistema (com senha cadastrada)"""
         try:
+            self.gravar_ultimos_logins()
             # Buscar corretores que têm senha_hash (ou seja, cadastraram acesso)
             resultado = self.supabase.table('sienge_corretores')\
                 .select('sienge_id, cpf, cnpj, nome, email, telefone, ativo, ultimo_login, cadastro_login_em')\
@@ -419,6 +566,8 @@ class AuthManager:
                     .eq('id', user_id)\
                     .execute()
             
+            self.invalidar_usuario(user_id, is_corretor)
+            
             return {'sucesso': True}
         except Exception as e:
             return {'sucesso': False, 'erro': str(e)}
@@ -438,11 +587,55 @@ class AuthManager:
                     .eq('id', user_id)\
                     .execute()
             
+            self.invalidar_usuario(user_id, is_corretor)
+            
             return {'sucesso': True}
         except Exception as e:
             return {'sucesso': False, 'erro': str(e)}
 
 
+def executar_bcrypt(funcao, *args) -> Future:
+    """
+    Agenda funcao(*args) no pool do bcrypt. Com BCRYPT_THREADS verificações em
+    andamento e BCRYPT_FILA_MAX aguardando, recusa na hora com LoginOcupadoError.
+    """
+    if not _bcrypt_vagas.acquire(blocking=False):
+        raise LoginOcupadoError('Muitos logins simultâneos, tente novamente em instantes')
+    try:
+        futuro = _bcrypt_executor.submit(funcao, *args)
+    except Exception:
+        _bcrypt_vagas.release()
+        raise
+    futuro.add_done_callback(lambda _: _bcrypt_vagas.release())
+    return futuro
+
+
+def precisa_rehash(hash_armazenado: str) -> bool:
+    """Verdadeiro para SHA256/texto plano e para bcrypt com custo diferente de BCRYPT_ROUNDS"""
+    if not (hash_armazenado.startswith('$2b$') or hash_armazenado.startswith('$2a$')):
+        return True
+    try:
+        return int(hash_armazenado[4:6]) != BCRYPT_ROUNDS
+    except ValueError:
+        return True
+
+
+def _gerar_hash_bcrypt(senha: str) -> str:
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def _conferir_bcrypt(senha: str, hash_armazenado: str) -> bool:
+    try:
+        return bcrypt.checkpw(senha.encode('utf-8'), hash_armazenado.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def _coluna_inexistente(erro: Exception) -> bool:
+    """Erro do PostgREST de coluna que não existe (script de migração ainda não executado)"""
+    return getattr(erro, 'code', None) in ('42703', 'PGRST204')
+
+
 def traduzir_status(status: str) -> str:
     """Traduz status do Sienge para português"""
     if not status:
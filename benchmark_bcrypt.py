@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da verificação de senhas bcrypt
+1) Tempo de um bcrypt.checkpw por custo (BCRYPT_ROUNDS), para escolher o valor do .env
+2) Rajada de logins simultâneos contra o pool limitado de auth_manager:
+   quantos são atendidos, quantos são recusados na hora e a latência dos atendidos
+
+Uso: python benchmark_bcrypt.py [logins_simultaneos] [custo ...]
+"""
+
+import sys
+import time
+import threading
+
+import bcrypt
+
+from auth_manager import BCRYPT_FILA_MAX, BCRYPT_ROUNDS, BCRYPT_THREADS, LoginOcupadoError, executar_bcrypt
+
+SENHA = 'senha-de-teste-123'
+
+
+def medir_custo(rounds: int, repeticoes: int = 3) -> float:
+    """Melhor tempo (em segundos) de um checkpw com o custo informado"""
+    hash_senha = bcrypt.hashpw(SENHA.encode('utf-8'), bcrypt.gensalt(rounds=rounds))
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        bcrypt.checkpw(SENHA.encode('utf-8'), hash_senha)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def rajada(logins: int) -> dict:
+    """Dispara logins simultâneos (uma thread por requisição, como os workers do servidor)"""
+    hash_senha = bcrypt.hashpw(SENHA.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+    latencias = []
+    recusados = [0]
+    lock = threading.Lock()
+    largada = threading.Event()
+
+    def login():
+        largada.wait()
+        inicio = time.perf_counter()
+        try:
+            executar_bcrypt(bcrypt.checkpw, SENHA.encode('utf-8'), hash_senha).result()
+        except LoginOcupadoError:
+            with lock:
+                recusados[0] += 1
+            return
+        with lock:
+            latencias.append(time.perf_counter() - inicio)
+
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+    for t in threads:
+        t.start()
+    inicio = time.perf_counter()
+    largada.set()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'atendidos': len(latencias),
+        'recusados': recusados[0],
+        'p50': latencias[len(latencias) // 2] if latencias else 0,
+        'p95': latencias[int(len(latencias) * 0.95) - 1] if latencias else 0,
+        'total': total,
+    }
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    custos = [int(c) for c in sys.argv[2:]] or [10, 11, 12, 13]
+
+    print("=" * 60)
+    print("BENCHMARK BCRYPT - custo por verificação")
+    print("=" * 60)
+    print(f"{'custo':>6} {'checkpw (ms)':>14} {'logins/s por núcleo':>22}")
+    for rounds in custos:
+        tempo = medir_custo(rounds)
+        marca = '  <- BCRYPT_ROUNDS' if rounds == BCRYPT_ROUNDS else ''
+        print(f"{rounds:>6} {tempo * 1000:>14.1f} {1 / tempo:>22.1f}{marca}")
+
+    print()
+    print("=" * 60)
+    print(f"RAJADA DE {logins} LOGINS - pool de {BCRYPT_THREADS} threads, fila de {BCRYPT_FILA_MAX}, "
+          f"custo {BCRYPT_ROUNDS}")
+    print("=" * 60)
+    resultado = rajada(logins)
+    print(f"  Atendidos: {resultado['atendidos']}")
+    print(f"  Recusados na hora: {resultado['recusados']}")
+    print(f"  Latência p50: {resultado['p50'] * 1000:.0f} ms | p95: {resultado['p95'] * 1000:.0f} ms")
+    print(f"  Tempo total: {resultado['total']:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do snapshot colunar de comissões
+Compara o filtro do relatório feito com compreensões de lista sobre dicts
+(como as rotas faziam) com as máscaras numpy de colunar.SnapshotComissoes,
+em 10 mil, 100 mil e 1 milhão de comissões sintéticas.
+
+Uso: python benchmark_colunar.py [quantidade ...]
+"""
+
+import sys
+import time
+import random
+from datetime import date, timedelta
+
+from colunar import SnapshotComissoes, disponivel
+
+EMPREENDIMENTOS = ['2003', '2004', '2005', '2007', '2014', '2104']
+STATUS_PARCELA = ['Pending', 'Paid', 'Awaiting authorization', 'Partially paid']
+STATUS_APROVACAO = ['Pendente', 'Pendente de Aprovação', 'Aprovada', 'Rejeitada']
+
+# Filtro típico do relatório: 2 empreendimentos, 1 regra, auditoria aprovada/pendente, um ano
+FILTROS = {
+    'empreendimentos': ['2003', '2014'],
+    'regras': ['2'],
+    'auditorias': ['sim', 'pendente'],
+    'data_inicio': '2024-01-01',
+    'data_fim': '2024-12-31',
+}
+
+
+def gerar_comissoes(quantidade: int):
+    """Linhas sintéticas só com as colunas usadas nos filtros"""
+    aleatorio = random.Random(42)
+    inicio = date(2023, 1, 1)
+    linhas = []
+    for i in range(quantidade):
+        data_contrato = inicio + timedelta(days=aleatorio.randint(0, 900))
+        linhas.append({
+            'id': i + 1,
+            'building_id': aleatorio.choice(EMPREENDIMENTOS),
+            'broker_id': aleatorio.randint(1, 300),
+            'regra_gatilho_id': aleatorio.randint(1, 4),
+            'installment_status': aleatorio.choice(STATUS_PARCELA),
+            'status_aprovacao': aleatorio.choice(STATUS_APROVACAO),
+            'auditoria_aprovada': aleatorio.choice([True, False, None]),
+            'atingiu_gatilho': aleatorio.random() < 0.5,
+            'data_contrato': data_contrato.isoformat(),
+            'commission_date': f'{data_contrato.isoformat()}T10:00:00+00:00',
+            'valor_comissao': round(aleatorio.uniform(500, 50000), 2),
+            'empreendimento_nome': 'Residencial',
+            'lote': f'Q{aleatorio.randint(1, 40)} L{aleatorio.randint(1, 60)}',
+        })
+    return linhas
+
+
+def filtrar_lista(linhas, empreendimentos, regras, auditorias, data_inicio, data_fim):
+    """Filtro com compreensões de lista, no formato usado antes nas rotas"""
+    resultado = [c for c in linhas if str(c.get('building_id')) in empreendimentos]
+    resultado = [c for c in resultado if str(c.get('regra_gatilho_id')) in regras]
+
+    filtradas = []
+    for c in resultado:
+        auditoria = c.get('auditoria_aprovada')
+        if ('sim' in auditorias and auditoria == True) or ('nao' in auditorias and auditoria == False) \
+                or ('pendente' in auditorias and auditoria is None):
+            filtradas.append(c)
+
+    return [c for c in filtradas
+            if c.get('data_contrato') and data_inicio <= str(c.get('data_contrato'))[:10] <= data_fim]
+
+
+def medir(funcao, repeticoes: int = 5) -> float:
+    """Melhor tempo (em segundos) de funcao()"""
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def main():
+    quantidades = [int(q) for q in sys.argv[1:]] or [10000, 100000, 1000000]
+
+    if not disponivel():
+        print("numpy não instalado (pip install numpy)")
+        return
+
+    print("=" * 72)
+    print("BENCHMARK SNAPSHOT COLUNAR - filtro do relatório")
+    print("=" * 72)
+    print(f"{'linhas':>10} {'montagem':>12} {'lista (ms)':>12} {'máscara (ms)':>14} {'ganho':>8} {'resultado':>10}")
+
+    for quantidade in quantidades:
+        linhas = gerar_comissoes(quantidade)
+
+        snapshot = SnapshotComissoes()
+        inicio = time.perf_counter()
+        snapshot.carregar(linhas)
+        montagem = time.perf_counter() - inicio
+
+        esperado = filtrar_lista(linhas, **FILTROS)
+        obtido = int(snapshot.filtrar(**FILTROS).sum())
+        if obtido != len(esperado):
+            print(f"  Divergência em {quantidade}: lista={len(esperado)} máscara={obtido}")
+
+        tempo_lista = medir(lambda: filtrar_lista(linhas, **FILTROS))
+        tempo_mascara = medir(lambda: snapshot.filtrar(**FILTROS))
+
+        print(f"{quantidade:>10} {montagem * 1000:>10.0f}ms {tempo_lista * 1000:>12.1f} "
+              f"{tempo_mascara * 1000:>14.2f} {tempo_lista / tempo_mascara:>7.0f}x {obtido:>10}")
+
+
+if __name__ == '__main__':
+    main()
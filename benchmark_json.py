@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da serialização JSON das respostas da API
+Compara o DefaultJSONProvider do Flask (json da stdlib) com o JsonProviderRapido (orjson)
+num payload sintético de 50 mil comissões no formato de comissoes_enriquecidas.
+
+Uso: python benchmark_json.py [quantidade] [repeticoes]
+"""
+
+import json
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import JsonProviderRapido, orjson
+
+
+def gerar_comissoes(quantidade: int):
+    """Comissões sintéticas com strings, números, Decimals, datas e nulos"""
+    aleatorio = random.Random(42)
+    status = ['Pending', 'Paid', 'Awaiting authorization', 'Partially paid']
+    aprovacao = ['Pendente', 'Pendente de Aprovação', 'Aprovada', 'Rejeitada', None]
+    inicio = datetime(2023, 1, 1)
+
+    comissoes = []
+    for i in range(quantidade):
+        data_comissao = inicio + timedelta(days=aleatorio.randint(0, 900), minutes=aleatorio.randint(0, 1440))
+        comissoes.append({
+            'id': i + 1,
+            'sienge_id': 100000 + i,
+            'numero_contrato': str(aleatorio.randint(1, 5000)),
+            'building_id': str(aleatorio.choice([2003, 2004, 2005, 2007, 2014, 2104])),
+            'broker_id': aleatorio.randint(1, 300),
+            'broker_nome': f'Corretor Número {aleatorio.randint(1, 300)} da Silva',
+            'customer_name': f'Cliente {i} de Souza',
+            'commission_value': round(aleatorio.uniform(500, 50000), 2),
+            'valor_comissao': Decimal(f'{aleatorio.uniform(500, 50000):.2f}'),
+            'installment_status': aleatorio.choice(status),
+            'commission_date': data_comissao,
+            'status_aprovacao': aleatorio.choice(aprovacao),
+            'auditoria_aprovada': aleatorio.choice([True, False, None]),
+            'valor_gatilho': Decimal(f'{aleatorio.uniform(10000, 90000):.2f}'),
+            'atingiu_gatilho': aleatorio.random() < 0.5,
+            'data_contrato': data_comissao.date() - timedelta(days=30),
+            'valor_total': round(aleatorio.uniform(80000, 900000), 2),
+            'valor_pago': round(aleatorio.uniform(0, 400000), 2),
+            'valor_itbi': round(aleatorio.uniform(0, 20000), 2),
+            'lote': f'Q{aleatorio.randint(1, 40)} L{aleatorio.randint(1, 60)}',
+            'empreendimento_nome': 'Residencial Exemplo Comissões',
+            'regra_nome': '10% + ITBI',
+            'observacoes': None
+        })
+    return comissoes
+
+
+def medir(provider, app, dados, repeticoes: int) -> float:
+    """Melhor tempo (em segundos) de provider.response(dados), como no jsonify"""
+    melhor = None
+    with app.app_context():
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resposta = provider.response({'sucesso': True, 'comissoes': dados, 'total': len(dados)})
+            resposta.get_data()
+            decorrido = time.perf_counter() - inicio
+            melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    app = Flask(__name__)
+    dados = gerar_comissoes(quantidade)
+
+    print("=" * 60)
+    print(f"BENCHMARK JSON - {quantidade} comissões, melhor de {repeticoes}")
+    print("=" * 60)
+
+    padrao = DefaultJSONProvider(app)
+    rapido = JsonProviderRapido(app)
+
+    tempo_padrao = medir(padrao, app, dados, repeticoes)
+    print(f"  DefaultJSONProvider (stdlib): {tempo_padrao * 1000:8.1f} ms")
+
+    if orjson is None:
+        print("  orjson não instalado: JsonProviderRapido usa a stdlib (pip install orjson)")
+        return
+
+    tempo_rapido = medir(rapido, app, dados, repeticoes)
+    print(f"  JsonProviderRapido (orjson):  {tempo_rapido * 1000:8.1f} ms")
+    print(f"  Ganho: {tempo_padrao / tempo_rapido:.1f}x")
+
+    with app.app_context():
+        corpo = rapido.response(dados).get_data()
+        iguais = json.loads(corpo) == json.loads(padrao.response(dados).get_data())
+    print(f"  Tamanho do corpo: {len(corpo) / 1024 / 1024:.1f} MB")
+    print(f"  Mesmo JSON que o DefaultJSONProvider: {'sim' if iguais else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+"""
+Snapshot Colunar - Sistema de Comissões Young
+Cópia em memória (por worker) das comissões de comissoes_enriquecidas em colunas numpy.
+
+Cada coluna usada nos filtros do relatório e da listagem (empreendimento,
+corretor, regra, status, auditoria, gatilho, datas e valor) vira um array
+tipado; textos repetidos viram códigos inteiros. Um filtro passa a ser uma
+máscara booleana vetorizada em vez de uma compreensão de lista por requisição.
+O snapshot guarda só as colunas e os ids: as linhas de uma página (ou do
+relatório) são buscadas por id no Supabase, em blocos.
+
+O snapshot é montado uma vez e, quando a versão 'comissoes' de versao_dados
+muda, só as linhas alteradas desde a última carga (atualizado_em, carimbado
+pelo banco, com a margem de versao_dados.inicio_releitura) são relidas; as
+apagadas vêm de registros_removidos. A atualização roda numa thread e troca
+as colunas de uma vez; enquanto isso pronto() devolve None e as rotas
+consultam o Supabase. Sem numpy instalado, disponivel() é falso e as rotas
+também consultam o Supabase.
+
+Comparação de tempos: python benchmark_colunar.py
+"""
+
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from leitura_paginada import ler_tabela
+from sync_sienge_supabase import TABELA_COMISSOES_ENRIQUECIDAS, valores_status_parcela
+from versao_dados import ids_removidos, inicio_releitura, marca_mais_recente, obter_versao
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: sem ele o snapshot fica desligado
+    np = None
+
+CHAVE_VERSAO = 'comissoes'
+
+# Colunas de comissoes_enriquecidas lidas para montar o snapshot
+COLUNAS_SNAPSHOT = ('id, building_id, empreendimento_nome, lote, broker_id, broker_nome, regra_gatilho_id, '
+                    'regra_nome, installment_status, status_aprovacao, auditoria_aprovada, atingiu_gatilho, '
+                    'data_contrato, commission_date, valor_comissao, cancelada, atualizado_em')
+
+# Ids por consulta ao buscar as linhas de uma página ou do relatório (in_ na URL)
+TAMANHO_BLOCO_IDS = 500
+
+# Código dos valores de auditoria_aprovada (e de atingiu_gatilho: 1, 0 e -1 para nulo)
+AUDITORIA_CODIGOS = {'sim': 1, 'nao': 0, 'pendente': -1}
+
+# Colunas com textos codificados por _Categorias
+CATEGORIAS = ('building', 'empreendimento', 'lote', 'status_parcela', 'status_aprovacao')
+
+# Coluna de cada dimensão de agregação (month e year vêm de data_contrato)
+DIMENSOES_COLUNAS = {
+    'building': 'building',
+    'broker': 'broker',
+    'regra': 'regra',
+    'status_aprovacao': 'status_aprovacao',
+    'status_parcela': 'status_parcela',
+    'auditoria': 'auditoria',
+}
+
+
+def disponivel() -> bool:
+    return np is not None
+
+
+class _Categorias:
+    """Textos repetidos (building_id, status...) como códigos inteiros"""
+
+    def __init__(self):
+        self.codigos: Dict[str, int] = {}
+        self.valores: List[str] = []
+
+    def codificar(self, valores) -> 'np.ndarray':
+        codigos = np.empty(len(valores), dtype=np.int32)
+        for i, valor in enumerate(valores):
+            codigo = self.codigos.get(valor)
+            if codigo is None:
+                codigo = self.codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            codigos[i] = codigo
+        return codigos
+
+    def codigos_de(self, valores) -> List[int]:
+        return [self.codigos[v] for v in valores if v in self.codigos]
+
+    def copia(self) -> '_Categorias':
+        nova = _Categorias()
+        nova.codigos = dict(self.codigos)
+        nova.valores = list(self.valores)
+        return nova
+
+    def postos(self) -> 'np.ndarray':
+        """Posição de cada código na ordem alfabética dos valores (nulos por último)"""
+        ordem = sorted(range(len(self.valores)), key=lambda c: (self.valores[c] is None, self.valores[c] or ''))
+        postos = np.empty(len(ordem), dtype=np.int64)
+        postos[ordem] = np.arange(len(ordem))
+        return postos
+
+
+class SnapshotComissoes:
+    """Comissões não canceladas em colunas, com as ordens do relatório e da listagem"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Uma atualização por vez; as rotas seguem no Supabase enquanto ela roda
+        self._atualizacao = threading.Lock()
+        self.versao = None
+        self.construido = False
+        self.ultima_atualizacao = None
+        self.colunas: Dict[str, 'np.ndarray'] = {}
+        self.categorias: Dict[str, _Categorias] = {}
+        self.nomes: Dict[str, Dict] = {}
+        self._ordem_relatorio = None
+        self._ordem_listagem = None
+
+    def pronto(self, supabase) -> Optional['SnapshotComissoes']:
+        """
+        O snapshot, se estiver na versão atual das comissões; senão dispara a atualização
+        em segundo plano e retorna None (assim como sem numpy), e a rota consulta o Supabase
+        """
+        if not disponivel():
+            return None
+        if self.construido and obter_versao(supabase, CHAVE_VERSAO) == self.versao:
+            return self
+        self.atualizar_em_segundo_plano(supabase)
+        return None
+
+    def atualizar_em_segundo_plano(self, supabase):
+        """Dispara a atualização numa thread, se nenhuma estiver em andamento, e retorna na hora"""
+        if not self._atualizacao.acquire(blocking=False):
+            return
+
+        def executar():
+            try:
+                self._atualizar(supabase)
+            except Exception as e:
+                print(f"[Snapshot] Erro ao carregar comissões: {str(e)}")
+            finally:
+                self._atualizacao.release()
+
+        threading.Thread(target=executar, daemon=True).start()
+
+    def atualizar(self, supabase, completo: bool = False):
+        """
+        Na primeira vez (ou com completo=True) lê todas as comissões não canceladas;
+        depois, só as alteradas (atualizado_em) e as apagadas (registros_removidos) desde a última carga.
+        """
+        with self._atualizacao:
+            self._atualizar(supabase, completo)
+
+    def _atualizar(self, supabase, completo: bool = False):
+        # Versão lida antes dos dados: uma alteração no meio força nova atualização
+        versao = obter_versao(supabase, CHAVE_VERSAO, ttl=0)
+        if not completo and self.construido and versao is not None and versao == self.versao:
+            return  # outra atualização já chegou a esta versão
+
+        marca = self.ultima_atualizacao
+        removidas = None
+        if not completo and self.construido and marca:
+            alteradas = list(ler_tabela(supabase, TABELA_COMISSOES_ENRIQUECIDAS, COLUNAS_SNAPSHOT,
+                                        filtros=[('gte', 'atualizado_em', inicio_releitura(marca))]))
+            removidas = ids_removidos(supabase, TABELA_COMISSOES_ENRIQUECIDAS, marca)
+
+        if removidas is None:
+            marca = None
+            alteradas = list(ler_tabela(supabase, TABELA_COMISSOES_ENRIQUECIDAS, COLUNAS_SNAPSHOT,
+                                        filtros=[('eq', 'cancelada', False)]))
+        else:
+            # O id é o de sienge_comissoes: uma comissão apagada pode voltar com o mesmo id,
+            # então vale o que existe agora para os ids que aparecem nas duas leituras
+            ambas = sorted({l['id'] for l in alteradas} & set(removidas))
+            existentes = set()
+            for i in range(0, len(ambas), TAMANHO_BLOCO_IDS):
+                existentes.update(r['id'] for r in ler_tabela(supabase, TABELA_COMISSOES_ENRIQUECIDAS, 'id',
+                                                               filtros=[('in_', 'id', ambas[i:i + TAMANHO_BLOCO_IDS])]))
+            apagadas = set(ambas) - existentes
+            removidas = [i for i in removidas if i not in existentes]
+            alteradas = [l for l in alteradas if l['id'] not in apagadas]
+
+        for linha in alteradas:
+            marca = marca_mais_recente(marca, linha.get('atualizado_em'))
+
+        estado = self._montar(alteradas, removidas)
+        with self._lock:
+            self._trocar(estado)
+            self.ultima_atualizacao = marca
+            self.versao = versao
+            self.construido = True
+        print(f"[Snapshot] Comissões: {len(estado['colunas']['id'])} em memória "
+              f"({len(alteradas)} relidas), versão {versao}")
+
+    def carregar(self, linhas):
+        """Monta as colunas a partir das linhas de comissoes_enriquecidas (substitui o conteúdo)"""
+        estado = self._montar(list(linhas))
+        with self._lock:
+            self._trocar(estado)
+
+    def _montar(self, linhas: List[Dict], removidas: Optional[List[int]] = None) -> Dict:
+        """
+        Colunas, categorias, nomes e ordens de um novo estado. Com removidas (atualização
+        incremental), parte do estado atual sem as linhas relidas e as removidas; o estado
+        atual não é alterado, para as requisições em andamento.
+        """
+        incremental = removidas is not None and bool(self.colunas)
+        with self._lock:
+            atuais, categorias_atuais, nomes_atuais = self.colunas, self.categorias, self.nomes
+
+        if incremental:
+            categorias = {nome: categorias_atuais[nome].copia() for nome in CATEGORIAS}
+            nomes = {dimensao: dict(valores) for dimensao, valores in nomes_atuais.items()}
+        else:
+            categorias = {nome: _Categorias() for nome in CATEGORIAS}
+            nomes = {'building': {}, 'broker': {}, 'regra': {}}
+
+        novas = [l for l in linhas if l.get('id') is not None and not l.get('cancelada')]
+        colunas = _colunas(novas, categorias)
+        if incremental:
+            descartar = {l['id'] for l in linhas if l.get('id') is not None} | set(removidas)
+            manter = ~np.isin(atuais['id'], np.fromiter(descartar, dtype=np.int64, count=len(descartar)))
+            colunas = {nome: np.concatenate([atuais[nome][manter], coluna]) for nome, coluna in colunas.items()}
+
+        # Nomes exibidos nas agregações (empreendimento, corretor e regra)
+        for l in novas:
+            for dimensao, chave, nome in (('building', str(l.get('building_id') or ''), l.get('empreendimento_nome')),
+                                          ('broker', l.get('broker_id'), l.get('broker_nome')),
+                                          ('regra', l.get('regra_gatilho_id'), l.get('regra_nome'))):
+                if nome is not None or chave not in nomes[dimensao]:
+                    nomes[dimensao][chave] = nome
+
+        # Ordem do relatório: empreendimento, lote (nulos por último), depois id
+        ordem_relatorio = np.lexsort((
+            colunas['id'],
+            categorias['lote'].postos()[colunas['lote']],
+            categorias['empreendimento'].postos()[colunas['empreendimento']]
+        ))
+
+        # Ordem da listagem: commission_date desc (nulos por último), depois id
+        datas = colunas['commission_date'].astype(np.int64)
+        chave = np.where(np.isnat(colunas['commission_date']), np.iinfo(np.int64).max, -datas)
+        ordem_listagem = np.lexsort((colunas['id'], chave))
+
+        return {'colunas': colunas, 'categorias': categorias, 'nomes': nomes,
+                'ordem_relatorio': ordem_relatorio, 'ordem_listagem': ordem_listagem}
+
+    def _trocar(self, estado: Dict):
+        self.colunas = estado['colunas']
+        self.categorias = estado['categorias']
+        self.nomes = estado['nomes']
+        self._ordem_relatorio = estado['ordem_relatorio']
+        self._ordem_listagem = estado['ordem_listagem']
+
+    def filtrar(self, **filtros) -> 'np.ndarray':
+        """Máscara booleana das linhas que passam nos filtros (mesma semântica das consultas no Supabase)"""
+        with self._lock:
+            colunas, categorias = self.colunas, self.categorias
+        return _mascara(colunas, categorias, **filtros)
+
+    def linhas_relatorio(self, supabase, **filtros) -> Iterator[Dict]:
+        """Linhas que passam nos filtros, na ordem do relatório (empreendimento, lote, id), lidas por id"""
+        with self._lock:
+            colunas, categorias, ordem = self.colunas, self.categorias, self._ordem_relatorio
+        mascara = _mascara(colunas, categorias, **filtros)
+        yield from _linhas_por_id(supabase, colunas['id'][ordem[mascara[ordem]]].tolist())
+
+    def paginar(self, supabase, pagina: int = 1, por_pagina: int = 100, **filtros) -> Dict:
+        """Página da listagem (commission_date desc, id), lida por id, e o total de linhas filtradas"""
+        with self._lock:
+            colunas, categorias, ordem = self.colunas, self.categorias, self._ordem_listagem
+        mascara = _mascara(colunas, categorias, **filtros)
+        ordem = ordem[mascara[ordem]]
+        inicio = (pagina - 1) * por_pagina
+        return {
+            'comissoes': list(_linhas_por_id(supabase, colunas['id'][ordem[inicio:inicio + por_pagina]].tolist())),
+            'total': int(len(ordem))
+        }
+
+    def agregar(self, dimensoes: List[str], metricas: List[str], **filtros) -> Dict:
+        """
+        Agrega valor_comissao das linhas filtradas por uma ou mais dimensões
+        (building, broker, regra, month, year, status_aprovacao, status_parcela, auditoria).
+        Retorna {'grupos': [...], 'total': {...}} no formato de agregacao.agregar_linhas.
+        """
+        with self._lock:
+            colunas, categorias, nomes = self.colunas, self.categorias, self.nomes
+        mascara = _mascara(colunas, categorias, **filtros)
+
+        valores = colunas['valor'][mascara]
+        if dimensoes:
+            chaves = np.stack([_chave_dimensao(colunas, d)[mascara] for d in dimensoes], axis=1)
+            unicas, inverso = np.unique(chaves, axis=0, return_inverse=True)
+            inverso = inverso.reshape(-1)
+        else:
+            unicas = np.zeros((1 if len(valores) else 0, 0), dtype=np.int64)
+            inverso = np.zeros(len(valores), dtype=np.int64)
+
+        calculadas = _metricas_por_grupo(valores, inverso, len(unicas), metricas)
+
+        grupos = []
+        for g, chave in enumerate(unicas):
+            grupo = {}
+            for dimensao, codigo in zip(dimensoes, chave.tolist()):
+                grupo.update(_valor_dimensao(dimensao, codigo, categorias, nomes))
+            grupo.update({m: calculadas[m][g] for m in metricas})
+            grupos.append(grupo)
+
+        total = _metricas_por_grupo(valores, np.zeros(len(valores), dtype=np.int64), 1, metricas)
+        return {'grupos': grupos, 'total': {m: total[m][0] for m in metricas}}
+
+
+def _colunas(linhas: List[Dict], categorias: Dict[str, _Categorias]) -> Dict[str, 'np.ndarray']:
+    """Colunas das linhas de comissoes_enriquecidas (textos codificados nas categorias informadas)"""
+    return {
+        'id': np.fromiter((l['id'] for l in linhas), dtype=np.int64, count=len(linhas)),
+        'building': categorias['building'].codificar([str(l.get('building_id') or '') for l in linhas]),
+        'empreendimento': categorias['empreendimento'].codificar([l.get('empreendimento_nome') for l in linhas]),
+        'lote': categorias['lote'].codificar([l.get('lote') for l in linhas]),
+        'broker': _inteiros(linhas, 'broker_id'),
+        'regra': _inteiros(linhas, 'regra_gatilho_id'),
+        'status_parcela': categorias['status_parcela'].codificar(
+            [l.get('installment_status') or '' for l in linhas]),
+        'status_aprovacao': categorias['status_aprovacao'].codificar(
+            [l.get('status_aprovacao') or '' for l in linhas]),
+        'auditoria': _booleanos(linhas, 'auditoria_aprovada'),
+        'gatilho': _booleanos(linhas, 'atingiu_gatilho'),
+        'data_contrato': _datas(linhas, 'data_contrato', 'D'),
+        'commission_date': _datas(linhas, 'commission_date', 's'),
+        'valor': np.fromiter((float(l.get('valor_comissao') or 0) for l in linhas),
+                             dtype=np.float64, count=len(linhas)),
+    }
+
+
+def _mascara(colunas, categorias, empreendimentos: List[str] = None, corretores: List[str] = None,
+             regras: List[str] = None, auditorias: List[str] = None,
+             status_parcela: List[str] = None, status_aprovacao: List[str] = None,
+             gatilho: List[bool] = None, data_inicio: str = '', data_fim: str = '') -> 'np.ndarray':
+    mascara = np.ones(len(colunas['id']), dtype=bool)
+
+    if empreendimentos:
+        mascara &= np.isin(colunas['building'], categorias['building'].codigos_de(str(e) for e in empreendimentos))
+    if corretores:
+        mascara &= np.isin(colunas['broker'], [int(c) for c in corretores if str(c).isdigit()])
+    if regras:
+        mascara &= np.isin(colunas['regra'], [int(r) for r in regras if str(r).isdigit()])
+    if auditorias:
+        mascara &= np.isin(colunas['auditoria'], [AUDITORIA_CODIGOS[a] for a in auditorias if a in AUDITORIA_CODIGOS])
+    if status_parcela:
+        # Busca parcial (como o ilike): códigos dos status que contêm algum dos valores
+        padroes = valores_status_parcela(status_parcela)
+        codigos = [c for c, v in enumerate(categorias['status_parcela'].valores)
+                   if any(p in v.lower() for p in padroes)]
+        mascara &= np.isin(colunas['status_parcela'], codigos)
+    if status_aprovacao:
+        mascara &= np.isin(colunas['status_aprovacao'], categorias['status_aprovacao'].codigos_de(status_aprovacao))
+    if gatilho:
+        # Como o in_ do Supabase: atingiu_gatilho nulo (-1) não entra em nenhum dos dois
+        mascara &= np.isin(colunas['gatilho'], [int(bool(g)) for g in set(gatilho)])
+
+    # Período da data do contrato (data_fim inclusiva; sem data não entra)
+    if data_inicio:
+        mascara &= colunas['data_contrato'] >= np.datetime64(data_inicio, 'D')
+    if data_fim:
+        mascara &= colunas['data_contrato'] <= np.datetime64(data_fim, 'D')
+
+    return mascara
+
+
+def _linhas_por_id(supabase, ids: List[int]) -> Iterator[Dict]:
+    """Linhas completas de comissoes_enriquecidas na ordem dos ids (as apagadas ou canceladas desde a carga ficam de fora)"""
+    for i in range(0, len(ids), TAMANHO_BLOCO_IDS):
+        bloco = ids[i:i + TAMANHO_BLOCO_IDS]
+        por_id = {l['id']: l for l in ler_tabela(supabase, TABELA_COMISSOES_ENRIQUECIDAS,
+                                                 filtros=[('in_', 'id', bloco)])}
+        for comissao_id in bloco:
+            linha = por_id.get(comissao_id)
+            if linha and not linha.get('cancelada'):
+                yield linha
+
+
+def _chave_dimensao(colunas, dimensao: str) -> 'np.ndarray':
+    """Coluna int64 que identifica o grupo de cada linha na dimensão"""
+    if dimensao in ('month', 'year'):
+        periodo = colunas['data_contrato'].astype('datetime64[M]' if dimensao == 'month' else 'datetime64[Y]')
+        return periodo.astype(np.int64)
+    return colunas[DIMENSOES_COLUNAS[dimensao]].astype(np.int64)
+
+
+def _valor_dimensao(dimensao: str, codigo: int, categorias, nomes) -> Dict:
+    """Campos de saída de um código de grupo (com o nome para empreendimento, corretor e regra)"""
+    if dimensao in ('month', 'year'):
+        if codigo == np.iinfo(np.int64).min:
+            return {dimensao: None}
+        unidade = 'M' if dimensao == 'month' else 'Y'
+        return {dimensao: str(np.datetime64(codigo, unidade))}
+    if dimensao == 'auditoria':
+        return {dimensao: {1: 'sim', 0: 'nao'}.get(codigo, 'pendente')}
+    if dimensao == 'building':
+        valor = categorias['building'].valores[codigo] or None
+        return {'building': valor, 'building_nome': nomes['building'].get(valor or '')}
+    if dimensao in ('broker', 'regra'):
+        valor = codigo if codigo != -1 else None
+        return {dimensao: valor, f'{dimensao}_nome': nomes[dimensao].get(valor)}
+    return {dimensao: categorias[dimensao].valores[codigo] or None}
+
+
+def _metricas_por_grupo(valores, inverso, quantidade: int, metricas: List[str]) -> Dict[str, list]:
+    """count/sum/avg/min/max de valores por grupo (inverso = índice do grupo de cada linha)"""
+    contagem = np.bincount(inverso, minlength=quantidade)
+    soma = np.bincount(inverso, weights=valores, minlength=quantidade)
+    resultado = {}
+    for metrica in metricas:
+        if metrica == 'count':
+            resultado[metrica] = contagem.tolist()
+        elif metrica == 'sum':
+            resultado[metrica] = np.round(soma, 2).tolist()
+        elif metrica == 'avg':
+            resultado[metrica] = [round(s / c, 2) if c else None for s, c in zip(soma.tolist(), contagem.tolist())]
+        else:
+            extremo = np.full(quantidade, np.inf if metrica == 'min' else -np.inf)
+            (np.minimum if metrica == 'min' else np.maximum).at(extremo, inverso, valores)
+            resultado[metrica] = [round(v, 2) if np.isfinite(v) else None for v in extremo.tolist()]
+    return resultado
+
+
+def _inteiros(linhas, campo: str) -> 'np.ndarray':
+    """Coluna de ids inteiros (-1 quando nulo)"""
+    return np.fromiter(
+        (int(l[campo]) if l.get(campo) not in (None, '') else -1 for l in linhas),
+        dtype=np.int64, count=len(linhas)
+    )
+
+
+def _booleanos(linhas, campo: str) -> 'np.ndarray':
+    """Coluna int8 de um booleano que pode ser nulo: 1, 0 e -1 para nulo"""
+    return np.fromiter(
+        (-1 if l.get(campo) is None else int(bool(l.get(campo))) for l in linhas),
+        dtype=np.int8, count=len(linhas)
+    )
+
+
+def _datas(linhas, campo: str, unidade: str) -> 'np.ndarray':
+    """Coluna datetime64 a partir dos textos ISO do Supabase (NaT quando nulo)"""
+    tamanho = 10 if unidade == 'D' else 19
+    textos = [str(l.get(campo))[:tamanho] if l.get(campo) else 'NaT' for l in linhas]
+    return np.array(textos, dtype=f'datetime64[{unidade}]')
+
+
+# Um snapshot por worker
+snapshot_comissoes = SnapshotComissoes()
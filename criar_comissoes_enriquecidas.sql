@@ -0,0 +1,84 @@
+-- Script para criar o modelo de leitura comissoes_enriquecidas
+-- Execute este script no Supabase Dashboard (SQL Editor)
+--
+-- Uma linha por comissão, já com os dados do contrato, valor pago, ITBI, regra
+-- de gatilho e nome do empreendimento. A tabela é mantida pela sincronização
+-- (SiengeSupabaseSync.atualizar_comissoes_enriquecidas) e pelas ações de aprovação,
+-- para que relatório, listagem e contrato-info sejam uma única consulta indexada.
+
+CREATE TABLE IF NOT EXISTS comissoes_enriquecidas (
+    id BIGINT PRIMARY KEY,                      -- mesmo id de sienge_comissoes
+    sienge_id BIGINT,
+    numero_contrato TEXT,
+    building_id TEXT,
+    company_id BIGINT,
+
+    -- Comissão
+    broker_id BIGINT,
+    broker_nome TEXT,
+    customer_name TEXT,
+    enterprise_name TEXT,
+    unit_name TEXT,
+    commission_value DECIMAL(15,2),
+    valor_comissao DECIMAL(15,2),
+    installment_status TEXT,
+    commission_date TIMESTAMPTZ,
+    cancelada BOOLEAN DEFAULT FALSE,
+
+    -- Aprovação
+    status_aprovacao TEXT,
+    data_envio_aprovacao TIMESTAMPTZ,
+    enviado_por BIGINT,
+    data_aprovacao TIMESTAMPTZ,
+    aprovado_por BIGINT,
+    observacoes TEXT,
+    observacoes_corretor TEXT,
+    observacoes_direcao TEXT,
+    auditoria_aprovada BOOLEAN,
+
+    -- Gatilho
+    regra_gatilho_id BIGINT,
+    regra_gatilho TEXT,
+    valor_gatilho DECIMAL(15,2),
+    atingiu_gatilho BOOLEAN,
+    data_atingiu_gatilho TIMESTAMPTZ,
+
+    -- Contrato (contrato_id nulo = contrato não encontrado em sienge_contratos)
+    contrato_id BIGINT,
+    data_contrato DATE,
+    nome_cliente TEXT,
+    valor_total DECIMAL(15,2),
+    valor_a_vista DECIMAL(15,2),
+    corretor_principal TEXT,
+    lote TEXT,
+    cliente TEXT,
+    empreendimento_nome TEXT,
+
+    -- Valores do contrato
+    valor_pago DECIMAL(15,2) DEFAULT 0,
+    valor_itbi DECIMAL(15,2) DEFAULT 0,
+
+    -- Regra (regras_gatilho)
+    regra_nome TEXT,
+    tipo_regra VARCHAR(50),
+    regra_percentual DECIMAL(5,2),
+    regra_inclui_itbi BOOLEAN,
+    regra_faturamento_minimo DECIMAL(15,2),
+    regra_percentual_auditoria DECIMAL(5,2),
+
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Índices para os filtros e ordenações das rotas
+CREATE INDEX IF NOT EXISTS idx_ce_contrato ON comissoes_enriquecidas (numero_contrato, building_id);
+CREATE INDEX IF NOT EXISTS idx_ce_listagem ON comissoes_enriquecidas (cancelada, commission_date DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS idx_ce_relatorio ON comissoes_enriquecidas (cancelada, empreendimento_nome, lote, id);
+CREATE INDEX IF NOT EXISTS idx_ce_building ON comissoes_enriquecidas (building_id);
+CREATE INDEX IF NOT EXISTS idx_ce_broker ON comissoes_enriquecidas (broker_id);
+CREATE INDEX IF NOT EXISTS idx_ce_regra ON comissoes_enriquecidas (regra_gatilho_id);
+CREATE INDEX IF NOT EXISTS idx_ce_status_aprovacao ON comissoes_enriquecidas (status_aprovacao);
+CREATE INDEX IF NOT EXISTS idx_ce_data_contrato ON comissoes_enriquecidas (data_contrato);
+
+COMMENT ON TABLE comissoes_enriquecidas IS 'Modelo de leitura: sienge_comissoes + contrato, valor pago, ITBI, regra e empreendimento';
+
+-- Após criar a tabela, rode uma sincronização (ou /api/sincronizar) para preenchê-la
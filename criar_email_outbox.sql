@@ -0,0 +1,32 @@
+-- Script para criar a fila de e-mails (outbox)
+-- Execute este script no Supabase Dashboard (SQL Editor)
+--
+-- As ações de aprovação só gravam o e-mail aqui e respondem; o envio é feito
+-- em segundo plano (email_outbox.EnviadorEmails), com uma conexão SMTP
+-- reaproveitada, novas tentativas com espera crescente e o resultado de cada
+-- entrega registrado na própria linha.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    tipo TEXT,                                  -- 'direcao' ou 'financeiro'
+    referencia TEXT,                            -- ex.: 'lote:123'
+    destinatarios TEXT[] NOT NULL,
+    assunto TEXT NOT NULL,
+    html TEXT NOT NULL,
+
+    -- pendente -> enviando -> enviado | falhou
+    status TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    ultimo_erro TEXT,
+
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    enviado_em TIMESTAMPTZ
+);
+
+-- Busca do enviador: e-mails a enviar cuja vez já chegou
+CREATE INDEX IF NOT EXISTS idx_email_outbox_fila ON email_outbox (proxima_tentativa)
+    WHERE status IN ('pendente', 'enviando');
+
+COMMENT ON TABLE email_outbox IS 'Fila de e-mails de aprovação, enviada em segundo plano com novas tentativas';
+COMMENT ON COLUMN email_outbox.proxima_tentativa IS 'Quando pendente: próxima tentativa. Quando enviando: fim da reserva do worker (depois disso outro worker pode reenviar)';
@@ -0,0 +1,99 @@
+-- Script para criar a função de facetas dos filtros de comissões
+-- Execute este script no Supabase Dashboard (SQL Editor)
+--
+-- Uma chamada (supabase.rpc('facetas_comissoes', ...)) devolve, para os painéis
+-- de filtro, os valores distintos com a quantidade de comissões de:
+-- status da parcela, status de aprovação, corretor, empreendimento e regra.
+--
+-- As contagens respeitam os filtros já aplicados. Cada faceta ignora apenas o
+-- próprio filtro, para que os outros valores continuem selecionáveis.
+
+CREATE OR REPLACE FUNCTION facetas_comissoes(
+    p_status_parcela TEXT[] DEFAULT NULL,      -- padrões ILIKE (ex.: '%paid%')
+    p_status_aprovacao TEXT[] DEFAULT NULL,
+    p_corretores BIGINT[] DEFAULT NULL,
+    p_empreendimentos TEXT[] DEFAULT NULL,
+    p_regras BIGINT[] DEFAULT NULL,
+    p_gatilho BOOLEAN[] DEFAULT NULL,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL               -- inclusiva
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH base AS (
+        SELECT
+            installment_status,
+            status_aprovacao,
+            broker_id,
+            broker_nome,
+            building_id,
+            empreendimento_nome,
+            regra_gatilho_id,
+            regra_nome,
+            (p_status_parcela IS NULL OR installment_status ILIKE ANY (p_status_parcela)) AS f_parcela,
+            (p_status_aprovacao IS NULL OR status_aprovacao = ANY (p_status_aprovacao)) AS f_aprovacao,
+            (p_corretores IS NULL OR broker_id = ANY (p_corretores)) AS f_corretor,
+            (p_empreendimentos IS NULL OR building_id = ANY (p_empreendimentos)) AS f_empreendimento,
+            (p_regras IS NULL OR regra_gatilho_id = ANY (p_regras)) AS f_regra
+        FROM comissoes_enriquecidas
+        WHERE cancelada = FALSE
+          AND (p_gatilho IS NULL OR atingiu_gatilho = ANY (p_gatilho))
+          AND (p_data_inicio IS NULL OR data_contrato >= p_data_inicio)
+          AND (p_data_fim IS NULL OR data_contrato <= p_data_fim)
+    )
+    SELECT jsonb_build_object(
+        'total', (
+            SELECT COUNT(*) FROM base
+            WHERE f_parcela AND f_aprovacao AND f_corretor AND f_empreendimento AND f_regra
+        ),
+        'status_parcela', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('valor', valor, 'total', total) ORDER BY valor)
+            FROM (
+                SELECT installment_status AS valor, COUNT(*) AS total FROM base
+                WHERE installment_status IS NOT NULL
+                  AND f_aprovacao AND f_corretor AND f_empreendimento AND f_regra
+                GROUP BY installment_status
+            ) f
+        ), '[]'::jsonb),
+        'status_aprovacao', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('valor', valor, 'total', total) ORDER BY valor)
+            FROM (
+                SELECT status_aprovacao AS valor, COUNT(*) AS total FROM base
+                WHERE status_aprovacao IS NOT NULL
+                  AND f_parcela AND f_corretor AND f_empreendimento AND f_regra
+                GROUP BY status_aprovacao
+            ) f
+        ), '[]'::jsonb),
+        'corretor', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('valor', valor, 'nome', nome, 'total', total) ORDER BY nome)
+            FROM (
+                SELECT broker_id AS valor, MAX(broker_nome) AS nome, COUNT(*) AS total FROM base
+                WHERE broker_id IS NOT NULL
+                  AND f_parcela AND f_aprovacao AND f_empreendimento AND f_regra
+                GROUP BY broker_id
+            ) f
+        ), '[]'::jsonb),
+        'empreendimento', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('valor', valor, 'nome', nome, 'total', total) ORDER BY nome)
+            FROM (
+                SELECT building_id AS valor, MAX(empreendimento_nome) AS nome, COUNT(*) AS total FROM base
+                WHERE building_id IS NOT NULL
+                  AND f_parcela AND f_aprovacao AND f_corretor AND f_regra
+                GROUP BY building_id
+            ) f
+        ), '[]'::jsonb),
+        'regra', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('valor', valor, 'nome', nome, 'total', total) ORDER BY nome)
+            FROM (
+                SELECT regra_gatilho_id AS valor, MAX(regra_nome) AS nome, COUNT(*) AS total FROM base
+                WHERE regra_gatilho_id IS NOT NULL
+                  AND f_parcela AND f_aprovacao AND f_corretor AND f_empreendimento
+                GROUP BY regra_gatilho_id
+            ) f
+        ), '[]'::jsonb)
+    );
+$$;
+
+COMMENT ON FUNCTION facetas_comissoes IS 'Valores distintos e contagens dos filtros de comissões (sobre comissoes_enriquecidas)';
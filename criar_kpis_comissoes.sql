@@ -0,0 +1,125 @@
+-- Script para criar os totais (KPIs) do dashboard da direção
+-- Execute este script no Supabase Dashboard (SQL Editor)
+--
+-- kpis_comissoes guarda quantidade e valor das comissões não canceladas por
+-- status de aprovação × status da parcela × empreendimento × mês do contrato.
+-- Os totais são mantidos por gatilhos em comissoes_enriquecidas: cada gravação
+-- (sincronização em SiengeSupabaseSync.atualizar_comissoes_enriquecidas e ações
+-- de AprovacaoComissoes) soma as linhas novas e subtrai as antigas, só nas
+-- chaves afetadas. /api/dashboard/kpis lê apenas esta tabela.
+
+CREATE TABLE IF NOT EXISTS kpis_comissoes (
+    status_aprovacao TEXT NOT NULL DEFAULT '',
+    installment_status TEXT NOT NULL DEFAULT '',
+    building_id TEXT NOT NULL DEFAULT '',
+    mes TEXT NOT NULL DEFAULT '',               -- 'AAAA-MM' de data_contrato ('' sem data)
+    empreendimento_nome TEXT,
+    quantidade BIGINT NOT NULL DEFAULT 0,
+    valor_total DECIMAL(18,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (status_aprovacao, installment_status, building_id, mes)
+);
+
+COMMENT ON TABLE kpis_comissoes IS 'Totais de comissões por status, empreendimento e mês, mantidos por gatilho em comissoes_enriquecidas';
+
+-- Soma (sinal = 1) ou subtrai (sinal = -1) um conjunto de linhas de comissoes_enriquecidas
+CREATE OR REPLACE FUNCTION somar_kpis_comissoes(linhas JSONB, sinal INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO kpis_comissoes AS k
+        (status_aprovacao, installment_status, building_id, mes, empreendimento_nome, quantidade, valor_total, atualizado_em)
+    SELECT
+        COALESCE(l.status_aprovacao, ''),
+        COALESCE(l.installment_status, ''),
+        COALESCE(l.building_id, ''),
+        COALESCE(TO_CHAR(l.data_contrato, 'YYYY-MM'), ''),
+        MAX(l.empreendimento_nome),
+        sinal * COUNT(*),
+        sinal * COALESCE(SUM(l.valor_comissao), 0),
+        NOW()
+    FROM jsonb_populate_recordset(NULL::comissoes_enriquecidas, linhas) l
+    WHERE l.cancelada IS NOT TRUE
+    GROUP BY 1, 2, 3, 4
+    -- Mesma ordem de chaves em todas as transações, para não haver deadlock
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (status_aprovacao, installment_status, building_id, mes) DO UPDATE SET
+        quantidade = k.quantidade + EXCLUDED.quantidade,
+        valor_total = k.valor_total + EXCLUDED.valor_total,
+        empreendimento_nome = COALESCE(EXCLUDED.empreendimento_nome, k.empreendimento_nome),
+        atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$;
+
+-- Gatilho por comando (não por linha): o upsert de 500 comissões da sincronização
+-- vira um único INSERT ... ON CONFLICT agrupado em kpis_comissoes
+CREATE OR REPLACE FUNCTION atualizar_kpis_comissoes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM somar_kpis_comissoes((SELECT COALESCE(jsonb_agg(to_jsonb(a)), '[]') FROM antigas a), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM somar_kpis_comissoes((SELECT COALESCE(jsonb_agg(to_jsonb(n)), '[]') FROM novas n), 1);
+    END IF;
+
+    DELETE FROM kpis_comissoes WHERE quantidade = 0;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_kpis_comissoes_insert ON comissoes_enriquecidas;
+CREATE TRIGGER trg_kpis_comissoes_insert
+    AFTER INSERT ON comissoes_enriquecidas
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_kpis_comissoes();
+
+DROP TRIGGER IF EXISTS trg_kpis_comissoes_update ON comissoes_enriquecidas;
+CREATE TRIGGER trg_kpis_comissoes_update
+    AFTER UPDATE ON comissoes_enriquecidas
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_kpis_comissoes();
+
+DROP TRIGGER IF EXISTS trg_kpis_comissoes_delete ON comissoes_enriquecidas;
+CREATE TRIGGER trg_kpis_comissoes_delete
+    AFTER DELETE ON comissoes_enriquecidas
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_kpis_comissoes();
+
+-- Recalcula todos os totais a partir de comissoes_enriquecidas
+-- (carga inicial; também corrige a tabela se ela for alterada manualmente)
+CREATE OR REPLACE FUNCTION recalcular_kpis_comissoes()
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    total BIGINT;
+BEGIN
+    LOCK TABLE kpis_comissoes IN EXCLUSIVE MODE;
+    DELETE FROM kpis_comissoes;
+
+    INSERT INTO kpis_comissoes
+        (status_aprovacao, installment_status, building_id, mes, empreendimento_nome, quantidade, valor_total, atualizado_em)
+    SELECT
+        COALESCE(status_aprovacao, ''),
+        COALESCE(installment_status, ''),
+        COALESCE(building_id, ''),
+        COALESCE(TO_CHAR(data_contrato, 'YYYY-MM'), ''),
+        MAX(empreendimento_nome),
+        COUNT(*),
+        COALESCE(SUM(valor_comissao), 0),
+        NOW()
+    FROM comissoes_enriquecidas
+    WHERE cancelada IS NOT TRUE
+    GROUP BY 1, 2, 3, 4;
+
+    GET DIAGNOSTICS total = ROW_COUNT;
+    RETURN total;
+END;
+$$;
+
+-- Carga inicial
+SELECT recalcular_kpis_comissoes();
@@ -0,0 +1,84 @@
+-- Script para criar a tabela de versão dos dados
+-- Execute este script no Supabase Dashboard (SQL Editor)
+--
+-- Uma linha por assunto (ex.: 'contratos'). A sincronização e as ações que
+-- alteram dados gravam um novo carimbo; os caches em memória de cada worker
+-- (como o índice da busca por lote) se recarregam quando o carimbo muda.
+
+CREATE TABLE IF NOT EXISTS versao_dados (
+    chave TEXT PRIMARY KEY,
+    versao TEXT NOT NULL,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE versao_dados IS 'Carimbo de versão por assunto, usado para invalidar caches em memória';
+
+-- Índice para a busca incremental de contratos alterados desde a última carga
+CREATE INDEX IF NOT EXISTS idx_contratos_atualizado_em ON sienge_contratos (atualizado_em);
+
+-- atualizado_em carimbado pelo banco (NOW() da transação), e só quando a linha
+-- mudou de fato. Assim a marca da busca incremental não depende do relógio de
+-- quem grava e uma sincronização sem mudanças não faz os workers relerem tudo.
+CREATE OR REPLACE FUNCTION carimbar_atualizado_em()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (to_jsonb(NEW) - 'atualizado_em') IS NOT DISTINCT FROM (to_jsonb(OLD) - 'atualizado_em') THEN
+        NEW.atualizado_em := OLD.atualizado_em;
+    ELSE
+        NEW.atualizado_em := NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contratos_atualizado_em ON sienge_contratos;
+CREATE TRIGGER trg_contratos_atualizado_em
+    BEFORE INSERT OR UPDATE ON sienge_contratos
+    FOR EACH ROW EXECUTE FUNCTION carimbar_atualizado_em();
+
+-- Mesmo carimbo no modelo de leitura: o snapshot colunar das comissões
+-- (colunar.SnapshotComissoes) relê só as linhas com atualizado_em recente
+DROP TRIGGER IF EXISTS trg_comissoes_enriquecidas_atualizado_em ON comissoes_enriquecidas;
+CREATE TRIGGER trg_comissoes_enriquecidas_atualizado_em
+    BEFORE INSERT OR UPDATE ON comissoes_enriquecidas
+    FOR EACH ROW EXECUTE FUNCTION carimbar_atualizado_em();
+
+CREATE INDEX IF NOT EXISTS idx_ce_atualizado_em ON comissoes_enriquecidas (atualizado_em);
+
+-- Remoções registradas pelo banco: a busca incremental pega as linhas apagadas
+-- (contratos distratados na sincronização, comissões que saíram do modelo de
+-- leitura) sem reler todos os ids da tabela
+CREATE TABLE IF NOT EXISTS registros_removidos (
+    tabela TEXT NOT NULL,
+    registro_id BIGINT NOT NULL,
+    removido_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_registros_removidos ON registros_removidos (tabela, removido_em);
+
+COMMENT ON TABLE registros_removidos IS 'Ids apagados por tabela, para a atualização incremental dos caches em memória';
+
+-- Um INSERT por comando DELETE (não por linha); remoções com mais de 7 dias
+-- já foram vistas por qualquer worker ativo
+CREATE OR REPLACE FUNCTION registrar_remocoes()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO registros_removidos (tabela, registro_id)
+    SELECT TG_TABLE_NAME, id FROM removidas;
+    DELETE FROM registros_removidos WHERE tabela = TG_TABLE_NAME AND removido_em < NOW() - INTERVAL '7 days';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contratos_removidos ON sienge_contratos;
+CREATE TRIGGER trg_contratos_removidos
+    AFTER DELETE ON sienge_contratos
+    REFERENCING OLD TABLE AS removidas
+    FOR EACH STATEMENT EXECUTE FUNCTION registrar_remocoes();
+
+DROP TRIGGER IF EXISTS trg_comissoes_enriquecidas_removidas ON comissoes_enriquecidas;
+CREATE TRIGGER trg_comissoes_enriquecidas_removidas
+    AFTER DELETE ON comissoes_enriquecidas
+    REFERENCING OLD TABLE AS removidas
+    FOR EACH STATEMENT EXECUTE FUNCTION registrar_remocoes();
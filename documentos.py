@@ -0,0 +1,12 @@
+"""
+Documentos - Sistema de Comissões Young
+Normalização de CPF/CNPJ dos corretores, igual à coluna gerada sienge_corretores.documentos
+"""
+
+import re
+
+
+def normalizar_documento(documento) -> str:
+    """CPF/CNPJ só com letras e números, em maiúsculas (mesma regra da coluna documentos)"""
+    return re.sub(r'[^0-9A-Za-z]', '', str(documento or '')).upper()
+
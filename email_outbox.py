@@ -0,0 +1,241 @@
+"""
+Fila de E-mails - Sistema de Comissões Young
+Envio dos e-mails de aprovação em segundo plano, a partir da tabela email_outbox.
+
+enfileirar_email só grava a linha e acorda o enviador do worker: a requisição
+que aprova comissões não espera a conexão SMTP. O EnviadorEmails (uma thread
+por worker) reserva cada e-mail com um update condicional em tentativas, para
+dois workers não enviarem o mesmo, mantém uma conexão SMTP autenticada aberta
+enquanto houver e-mails e, se o envio falhar, agenda nova tentativa com espera
+crescente até MAX_TENTATIVAS.
+"""
+
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+load_dotenv()
+
+TABELA_OUTBOX = 'email_outbox'
+
+# Segundos entre buscas na fila (e-mails de outros workers e novas tentativas)
+INTERVALO_VERIFICACAO = 15
+# E-mails reservados por busca
+LOTE_FILA = 20
+
+# Um e-mail 'enviando' há mais que isso (worker caiu no meio) volta para a fila
+RESERVA_SEGUNDOS = 600
+
+# Novas tentativas: 30 s, 1 min, 2 min, 4 min... até ESPERA_MAXIMA
+MAX_TENTATIVAS = 6
+ESPERA_BASE = 30
+ESPERA_MAXIMA = 3600
+
+# Segundos sem envio até fechar a conexão SMTP
+OCIOSIDADE_SMTP = 120
+
+
+class EnviadorEmails:
+    """Thread que envia os e-mails pendentes de email_outbox"""
+
+    def __init__(self):
+        self.smtp_host = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+        self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
+        self.smtp_user = os.getenv('SMTP_USER', '')
+        self.smtp_password = os.getenv('SMTP_PASSWORD', '')
+        self.email_from = os.getenv('EMAIL_FROM', 'sistema@youngempreendimentos.com.br')
+
+        self._supabase = None
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._ultimo_uso_smtp = 0.0
+        self._acordar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configurado(self) -> bool:
+        return bool(self.smtp_user and self.smtp_password)
+
+    def iniciar(self):
+        """Inicia a thread de envio deste worker (uma vez; nada faz sem SMTP configurado)"""
+        if not self.configurado():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def acordar(self):
+        """Faz a thread buscar a fila agora, sem esperar INTERVALO_VERIFICACAO"""
+        self._acordar.set()
+
+    def processar_fila(self) -> int:
+        """Reserva e envia os e-mails cuja vez chegou; retorna quantos foram reservados"""
+        result = self._cliente().table(TABELA_OUTBOX)\
+            .select('*')\
+            .in_('status', ['pendente', 'enviando'])\
+            .lte('proxima_tentativa', _agora().isoformat())\
+            .order('proxima_tentativa')\
+            .limit(LOTE_FILA)\
+            .execute()
+
+        reservados = 0
+        for email in result.data or []:
+            if self._reservar(email):
+                reservados += 1
+                self._enviar(email)
+        return reservados
+
+    def _executar(self):
+        while True:
+            try:
+                # Fila com mais que um lote: continua sem esperar
+                while self.processar_fila() >= LOTE_FILA:
+                    pass
+            except Exception as e:
+                print(f"[E-mail] Erro ao processar a fila (tabela pode não existir): {str(e)}")
+            self._fechar_smtp_ocioso()
+            self._acordar.wait(INTERVALO_VERIFICACAO)
+            self._acordar.clear()
+
+    def _reservar(self, email: Dict) -> bool:
+        """
+        Marca o e-mail como 'enviando' só se tentativas ainda for a lida: se outro
+        worker reservou antes, o update não encontra a linha e o e-mail é pulado
+        """
+        tentativas = email.get('tentativas') or 0
+        result = self._cliente().table(TABELA_OUTBOX)\
+            .update({
+                'status': 'enviando',
+                'tentativas': tentativas + 1,
+                'proxima_tentativa': (_agora() + timedelta(seconds=RESERVA_SEGUNDOS)).isoformat()
+            })\
+            .eq('id', email['id'])\
+            .eq('tentativas', tentativas)\
+            .in_('status', ['pendente', 'enviando'])\
+            .execute()
+        if not result.data:
+            return False
+        email['tentativas'] = tentativas + 1
+        return True
+
+    def _enviar(self, email: Dict):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = email['assunto']
+        msg['From'] = self.email_from
+        msg['To'] = ', '.join(email.get('destinatarios') or [])
+        msg.attach(MIMEText(email['html'], 'html'))
+
+        try:
+            self._enviar_smtp(msg)
+        except Exception as e:
+            self._registrar_falha(email, e)
+            return
+
+        self._atualizar(email['id'], {
+            'status': 'enviado',
+            'enviado_em': _agora().isoformat(),
+            'ultimo_erro': None
+        })
+        print(f"[E-mail] #{email['id']} ({email.get('tipo')}) enviado para {email.get('destinatarios')}")
+
+    def _enviar_smtp(self, msg: MIMEMultipart):
+        """Envia pela conexão aberta; se o servidor a tiver fechado, reconecta uma vez"""
+        for tentativa in (1, 2):
+            smtp = self._conexao()
+            try:
+                smtp.send_message(msg)
+                self._ultimo_uso_smtp = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._fechar_smtp()
+                if tentativa == 2:
+                    raise
+
+    def _conexao(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+            try:
+                smtp.starttls()
+                smtp.login(self.smtp_user, self.smtp_password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self._ultimo_uso_smtp = time.monotonic()
+        return self._smtp
+
+    def _fechar_smtp_ocioso(self):
+        if self._smtp is not None and time.monotonic() - self._ultimo_uso_smtp > OCIOSIDADE_SMTP:
+            self._fechar_smtp()
+
+    def _fechar_smtp(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def _registrar_falha(self, email: Dict, erro: Exception):
+        tentativas = email['tentativas']
+        dados = {'ultimo_erro': str(erro)[:1000]}
+        if tentativas >= MAX_TENTATIVAS:
+            dados['status'] = 'falhou'
+            print(f"[E-mail] #{email['id']} falhou após {tentativas} tentativas: {str(erro)}")
+        else:
+            espera = min(ESPERA_BASE * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+            dados['status'] = 'pendente'
+            dados['proxima_tentativa'] = (_agora() + timedelta(seconds=espera)).isoformat()
+            print(f"[E-mail] #{email['id']} não enviado (tentativa {tentativas}), nova tentativa em {espera}s: {str(erro)}")
+        self._atualizar(email['id'], dados)
+
+    def _atualizar(self, email_id: int, dados: Dict):
+        try:
+            self._cliente().table(TABELA_OUTBOX).update(dados).eq('id', email_id).execute()
+        except Exception as e:
+            print(f"[E-mail] Erro ao registrar situação do e-mail #{email_id}: {str(e)}")
+
+    def _cliente(self):
+        # Cliente próprio da thread de envio
+        if self._supabase is None:
+            self._supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+        return self._supabase
+
+
+enviador_emails = EnviadorEmails()
+
+
+def enfileirar_email(supabase, tipo: str, destinatarios: List[str], assunto: str, html: str,
+                     referencia: Optional[str] = None) -> Optional[int]:
+    """
+    Grava o e-mail em email_outbox e acorda o enviador deste worker.
+    Retorna o id da linha; erros (ex.: tabela inexistente) sobem para quem chamou.
+    """
+    result = supabase.table(TABELA_OUTBOX).insert({
+        'tipo': tipo,
+        'referencia': referencia,
+        'destinatarios': destinatarios,
+        'assunto': assunto,
+        'html': html,
+        'status': 'pendente',
+        'tentativas': 0,
+        'proxima_tentativa': _agora().isoformat()
+    }).execute()
+
+    enviador_emails.iniciar()
+    enviador_emails.acordar()
+    return result.data[0]['id'] if result.data else None
+
+
+def _agora() -> datetime:
+    # Com fuso: as colunas são TIMESTAMPTZ e a comparação da fila não pode depender do fuso do servidor
+    return datetime.now(timezone.utc)
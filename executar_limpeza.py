@@ -8,6 +8,7 @@ import os
 from datetime import datetime
 from supabase import create_client
 from dotenv import load_dotenv
+from leitura_paginada import ler_tabela
 
 load_dotenv()
 
@@ -31,10 +32,8 @@ def executar_limpeza():
     
     # 1. DELETAR COMISSÕES CANCELADAS
     print("\n[1/3] Buscando comissões canceladas...")
-    result = supabase.table('sienge_comissoes').select('*').execute()
-    
     comissoes_canceladas = []
-    for c in (result.data or []):
+    for c in ler_tabela(supabase, 'sienge_comissoes', 'id, installment_status'):
         status = (c.get('installment_status') or '').upper()
         if 'CANCEL' in status:
             comissoes_canceladas.append(c)
@@ -53,11 +52,9 @@ def executar_limpeza():
     
     # 2. BUSCAR E LIMPAR DUPLICATAS
     print("\n[2/3] Buscando comissões duplicadas...")
-    result = supabase.table('sienge_comissoes').select('*').execute()
-    
     # Agrupar por numero_contrato + unit_name + building_id
     grupos = {}
-    for c in (result.data or []):
+    for c in ler_tabela(supabase, 'sienge_comissoes', 'id, numero_contrato, unit_name, building_id, installment_status'):
         chave = f"{c.get('numero_contrato')}_{c.get('unit_name')}_{c.get('building_id')}"
         if chave not in grupos:
             grupos[chave] = []
@@ -92,21 +89,15 @@ def executar_limpeza():
     # 3. VERIFICAR CONTRATOS ÓRFÃOS (sem comissões válidas)
     print("\n[3/3] Verificando contratos órfãos...")
     
-    # Buscar todos os contratos
-    result_contratos = supabase.table('sienge_contratos').select('id, numero_contrato, building_id').execute()
-    
-    # Buscar todas as comissões restantes
-    result_comissoes = supabase.table('sienge_comissoes').select('numero_contrato, building_id').execute()
-    
-    # Criar set de contratos com comissões
+    # Criar set de contratos com comissões restantes
     contratos_com_comissoes = set()
-    for c in (result_comissoes.data or []):
+    for c in ler_tabela(supabase, 'sienge_comissoes', 'id, numero_contrato, building_id'):
         chave = f"{c.get('numero_contrato')}_{c.get('building_id')}"
         contratos_com_comissoes.add(chave)
     
     # Identificar contratos órfãos
     contratos_orfaos = []
-    for c in (result_contratos.data or []):
+    for c in ler_tabela(supabase, 'sienge_contratos', 'id, numero_contrato, building_id'):
         chave = f"{c.get('numero_contrato')}_{c.get('building_id')}"
         if chave not in contratos_com_comissoes:
             contratos_orfaos.append(c)
@@ -0,0 +1,279 @@
+"""
+Exportação - Sistema de Comissões Young
+Exportação do relatório de comissões em CSV e XLSX, em streaming.
+
+Os dois formatos consomem um iterador de linhas do relatório e devolvem
+geradores de bytes: as linhas vão para a resposta conforme são lidas, sem
+montar o arquivo inteiro em memória. O XLSX é escrito direto no zip
+(strings inline, sem tabela de strings compartilhadas), então a memória
+usada não cresce com o número de linhas.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator
+from xml.sax.saxutils import escape
+
+# (campo da linha do relatório, título da coluna)
+COLUNAS_RELATORIO = [
+    ('numero_contrato', 'Contrato'),
+    ('lote', 'Lote'),
+    ('cliente', 'Cliente'),
+    ('empreendimento', 'Empreendimento'),
+    ('corretor', 'Corretor'),
+    ('regra_aplicada', 'Regra Aplicada'),
+    ('tipo_regra', 'Tipo Regra'),
+    ('auditoria', 'Auditoria'),
+    ('status_aprovacao', 'Status Aprovação'),
+    ('data_contrato', 'Data Contrato'),
+    ('valor_comissao', 'Valor Comissão'),
+]
+
+# Linhas acumuladas antes de entregar um bloco de bytes à resposta
+LINHAS_POR_BLOCO = 500
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Caracteres de controle não permitidos em XML
+_CARACTERES_INVALIDOS_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Início de texto que o Excel/LibreOffice interpreta como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# Primeira célula da linha acrescentada quando a leitura falha no meio da exportação
+AVISO_EXPORTACAO_INCOMPLETA = 'ERRO: exportação incompleta'
+
+
+def valores_exportacao(item: Dict) -> Dict:
+    """Valores de uma linha do relatório (linha_relatorio_comissao) como aparecem na planilha"""
+    auditoria = item.get('auditoria_aprovada')
+    valores = {
+        'numero_contrato': item.get('numero_contrato') or '',
+        'lote': item.get('lote') or '',
+        'cliente': item.get('cliente') or '',
+        'empreendimento': item.get('empreendimento') or '',
+        'corretor': item.get('corretor') or '',
+        'regra_aplicada': f"{item.get('regra_nome') or ''} - {item.get('regra_descricao') or ''}",
+        'tipo_regra': 'Faturamento' if item.get('tipo_regra') == 'faturamento' else 'Gatilho',
+        'auditoria': 'Aprovada' if auditoria is True else ('Reprovada' if auditoria is False else 'Pendente'),
+        'status_aprovacao': item.get('status_aprovacao') or '',
+        'data_contrato': _data(item.get('data_contrato')),
+        'valor_comissao': float(item.get('valor_comissao') or 0),
+    }
+    return valores
+
+
+def gerar_csv(linhas: Iterable[Dict]) -> Iterator[bytes]:
+    """
+    CSV no padrão do Excel em português: UTF-8 com BOM, separador ';'
+    e vírgula decimal nos valores
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\r\n')
+
+    buffer.write('\ufeff')
+    escritor.writerow([titulo for _, titulo in COLUNAS_RELATORIO])
+
+    try:
+        for n, item in enumerate(linhas, 1):
+            valores = valores_exportacao(item)
+            linha = []
+            for campo, _ in COLUNAS_RELATORIO:
+                valor = valores[campo]
+                if isinstance(valor, float):
+                    valor = f'{valor:.2f}'.replace('.', ',')
+                elif isinstance(valor, date):
+                    valor = valor.strftime('%d/%m/%Y')
+                else:
+                    valor = _texto_seguro(valor)
+                linha.append(valor)
+            escritor.writerow(linha)
+
+            if n % LINHAS_POR_BLOCO == 0:
+                yield _esvaziar(buffer).encode('utf-8')
+    except Exception as e:
+        # Os blocos anteriores já foram enviados: a última linha avisa que o arquivo está incompleto
+        print(f"[Exportação] Erro no CSV, arquivo incompleto: {str(e)}")
+        escritor.writerow([AVISO_EXPORTACAO_INCOMPLETA, _texto_seguro(str(e))])
+
+    yield _esvaziar(buffer).encode('utf-8')
+
+
+def gerar_xlsx(linhas: Iterable[Dict]) -> Iterator[bytes]:
+    """XLSX com uma planilha "Relatório", escrito no zip conforme as linhas chegam"""
+    saida = _SaidaStreaming()
+
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _PARTES_FIXAS_XLSX.items():
+            arquivo.writestr(nome, conteudo)
+        yield saida.esvaziar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+                b'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                b'<sheetData>'
+            )
+            cabecalho = ''.join(_celula_texto(titulo, estilo=1) for _, titulo in COLUNAS_RELATORIO)
+            planilha.write(f'<row>{cabecalho}</row>'.encode('utf-8'))
+
+            bloco = []
+            try:
+                for n, item in enumerate(linhas, 1):
+                    valores = valores_exportacao(item)
+                    bloco.append('<row>' + ''.join(_celula(valores[campo]) for campo, _ in COLUNAS_RELATORIO) + '</row>')
+                    if n % LINHAS_POR_BLOCO == 0:
+                        planilha.write(''.join(bloco).encode('utf-8'))
+                        bloco = []
+                        yield saida.esvaziar()
+            except Exception as e:
+                # Fecha a planilha normalmente, com uma última linha avisando que está incompleta
+                print(f"[Exportação] Erro no XLSX, arquivo incompleto: {str(e)}")
+                bloco.append('<row>' + _celula_texto(AVISO_EXPORTACAO_INCOMPLETA, estilo=1)
+                             + _celula_texto(str(e)) + '</row>')
+
+            planilha.write(''.join(bloco).encode('utf-8'))
+            planilha.write(b'</sheetData></worksheet>')
+
+    yield saida.esvaziar()
+
+
+def _celula(valor) -> str:
+    if isinstance(valor, float):
+        return f'<c s="2"><v>{valor!r}</v></c>'
+    if isinstance(valor, date):
+        return f'<c s="3"><v>{_serial_excel(valor)}</v></c>'
+    return _celula_texto(valor)
+
+
+def _celula_texto(valor, estilo: int = 0) -> str:
+    # Strings inline nunca são avaliadas como fórmula: o texto vai sem o apóstrofo do CSV
+    texto = escape(_CARACTERES_INVALIDOS_XML.sub('', str(valor)))
+    atributo_estilo = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{atributo_estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _texto_seguro(valor):
+    """Texto do CSV que começa como fórmula (=, +, -, @, tab, CR) ganha um apóstrofo e fica literal ao abrir"""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _serial_excel(valor: date) -> int:
+    """Data como número de série do Excel (dias desde 30/12/1899)"""
+    return (valor - date(1899, 12, 30)).days
+
+
+def _data(valor):
+    """data_contrato (texto ISO vindo do Supabase) como date; mantém o texto se não for data"""
+    if not valor:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return str(valor)
+
+
+def _esvaziar(buffer: io.StringIO) -> str:
+    conteudo = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return conteudo
+
+
+class _SaidaStreaming(io.RawIOBase):
+    """Destino do zip sem seek: acumula os bytes escritos até serem entregues à resposta"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def esvaziar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+_PARTES_FIXAS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Relatório" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos: 0 = padrão, 1 = cabeçalho em negrito, 2 = valor (#,##0.00), 3 = data (dd/mm/aaaa)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="2">'
+        '<numFmt numFmtId="164" formatCode="#,##0.00"/>'
+        '<numFmt numFmtId="165" formatCode="dd/mm/yyyy"/>'
+        '</numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
@@ -0,0 +1,80 @@
+"""
+Gatilho de Comissões - Sistema de Comissões Young
+Cálculo do valor do gatilho e avaliação das comissões contra a regra aplicada
+"""
+
+import re
+from typing import Dict, Optional
+
+# Regra usada quando a comissão não tem regra vinculada nem texto de regra
+REGRA_PADRAO = '10% + ITBI'
+
+
+def calcular_valor_gatilho(valor_a_vista: float, valor_itbi: float, regra: str) -> float:
+    """
+    Calcula o valor do gatilho baseado na regra de comissão.
+
+    Regras suportadas:
+    - '10% + ITBI': 10% do valor à vista + ITBI
+    - '10%': 10% do valor à vista
+    - '5%': 5% do valor à vista
+    - '6%': 6% do valor à vista
+    """
+    if not regra:
+        regra = REGRA_PADRAO
+
+    regra_lower = regra.lower().strip()
+
+    if '10%' in regra_lower and 'itbi' in regra_lower:
+        return (valor_a_vista * 0.10) + valor_itbi
+    elif '10%' in regra_lower:
+        return valor_a_vista * 0.10
+    elif '5%' in regra_lower:
+        return valor_a_vista * 0.05
+    elif '6%' in regra_lower:
+        return valor_a_vista * 0.06
+    else:
+        # Tentar extrair percentual da string
+        match = re.search(r'(\d+[,.]?\d*)\s*%', regra)
+        if match:
+            percentual = float(match.group(1).replace(',', '.')) / 100
+            if 'itbi' in regra_lower:
+                return (valor_a_vista * percentual) + valor_itbi
+            return valor_a_vista * percentual
+
+        # Padrão: 10% + ITBI
+        return (valor_a_vista * 0.10) + valor_itbi
+
+
+def calcular_valor_gatilho_regra(valor_a_vista: float, valor_itbi: float, regra: Dict) -> float:
+    """
+    Calcula o valor do gatilho de uma regra da tabela regras_gatilho.
+    Regras de faturamento usam o faturamento mínimo como valor a atingir.
+    """
+    if regra.get('tipo_regra') == 'faturamento':
+        return float(regra.get('faturamento_minimo') or 0)
+
+    valor = valor_a_vista * float(regra.get('percentual') or 0) / 100
+    if regra.get('inclui_itbi'):
+        valor += valor_itbi
+    return valor
+
+
+def avaliar_gatilho(valor_a_vista: float, valor_itbi: float, valor_pago: float,
+                    regra: Optional[Dict] = None, regra_texto: Optional[str] = None) -> Dict:
+    """
+    Avalia uma comissão contra a sua regra e retorna valor_gatilho e atingiu_gatilho.
+    Ordem da regra: registro de regras_gatilho (regra_gatilho_id), texto de regra_gatilho
+    na comissão e, por último, REGRA_PADRAO.
+    """
+    usa_regra = bool(regra) and (regra.get('percentual') is not None or regra.get('tipo_regra') == 'faturamento')
+    if usa_regra:
+        valor_gatilho = calcular_valor_gatilho_regra(valor_a_vista, valor_itbi, regra)
+    else:
+        valor_gatilho = calcular_valor_gatilho(valor_a_vista, valor_itbi, regra_texto or REGRA_PADRAO)
+
+    valor_gatilho = round(valor_gatilho, 2)
+    return {
+        'valor_gatilho': valor_gatilho,
+        'atingiu_gatilho': valor_pago >= valor_gatilho if valor_gatilho > 0 else False
+    }
@@ -1,6 +1,8 @@
 """
-Gera o hash SHA256 da senha para usar na tabela 'usuarios' do Supabase.
-O login do sistema compara a senha digitada com esse hash.
+Gera o hash bcrypt da senha para usar na tabela 'usuarios' do Supabase.
+O login do sistema compara a senha digitada com esse hash. O custo vem de
+BCRYPT_ROUNDS (.env), o mesmo usado pelo sistema; hashes SHA256 antigos
+continuam aceitos e são trocados por bcrypt no próximo login.
 
 Como usar:
   1. Execute: python gerar_hash_senha.py
@@ -10,12 +12,18 @@ Como usar:
      cole o hash na coluna 'senha_hash' (ou 'senha', se for o nome da sua coluna)
 """
 
-import hashlib
+import os
 import getpass
 
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
 
 def hash_senha(senha: str) -> str:
-    return hashlib.sha256(senha.encode()).hexdigest()
+    rounds = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
 
 
 if __name__ == '__main__':
@@ -30,7 +38,7 @@ if __name__ == '__main__':
         exit(1)
     h = hash_senha(senha)
     print()
-    print('Hash SHA256 (copie e cole na coluna senha_hash no Supabase):')
+    print('Hash bcrypt (copie e cole na coluna senha_hash no Supabase):')
     print()
     print(h)
     print()
@@ -0,0 +1,211 @@
+"""
+Índice de Busca - Sistema de Comissões Young
+Índice em memória (por worker) de n-gramas para a busca por lote / cliente / contrato.
+
+O índice é montado uma vez a partir de sienge_contratos e, quando a versão
+'contratos' de versao_dados muda (fim da sincronização), só os contratos
+alterados desde a última carga (atualizado_em, carimbado pelo banco) são
+relidos, e os apagados saem pela tabela registros_removidos. Essa atualização
+roda numa thread; a busca responde da memória, sem consultar o Supabase a cada
+tecla digitada.
+"""
+
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from leitura_paginada import ler_tabela
+from sync_sienge_supabase import extrair_lotes, nome_empreendimento
+from versao_dados import ids_removidos, inicio_releitura, marca_mais_recente, obter_versao
+
+CHAVE_VERSAO = 'contratos'
+
+# Campos do contrato devolvidos para o autocomplete
+CAMPOS_RESULTADO = ['id', 'sienge_id', 'numero_contrato', 'building_id', 'nome_cliente',
+                    'unidade', 'unidades', 'data_contrato']
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas e sem acentos, para comparar termos de busca"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(ch for ch in texto if not unicodedata.combining(ch)).lower().strip()
+
+
+def _ngramas(texto: str) -> Set[str]:
+    """Bigramas e trigramas do texto (bigramas atendem buscas de 2 caracteres)"""
+    return {texto[i:i + n] for n in (2, 3) for i in range(len(texto) - n + 1)}
+
+
+class IndiceContratos:
+    """Índice de n-gramas sobre lotes, nome do cliente e número dos contratos"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Uma atualização por vez; a busca continua no índice atual enquanto ela lê o banco
+        self._atualizacao = threading.Lock()
+        self.versao = None
+        self.construido = False
+        self.ultima_atualizacao = None
+        self.contratos: Dict[int, Dict] = {}
+        self.campos: Dict[int, tuple] = {}
+        self.ngramas: Dict[str, Set[int]] = defaultdict(set)
+
+    def garantir_atualizado(self, supabase):
+        """Monta o índice na primeira vez; depois, se a versão dos contratos mudou, atualiza em segundo plano"""
+        if not self.construido:
+            self.atualizar(supabase)
+        elif obter_versao(supabase, CHAVE_VERSAO) != self.versao:
+            self.atualizar_em_segundo_plano(supabase)
+
+    def atualizar_em_segundo_plano(self, supabase):
+        """Dispara a atualização numa thread, se nenhuma estiver em andamento, e retorna na hora"""
+        if not self._atualizacao.acquire(blocking=False):
+            return
+
+        def executar():
+            try:
+                self._atualizar(supabase)
+            except Exception as e:
+                print(f"[Índice] Erro ao atualizar índice de busca: {str(e)}")
+            finally:
+                self._atualizacao.release()
+
+        threading.Thread(target=executar, daemon=True).start()
+
+    def atualizar(self, supabase, completo: bool = False):
+        """
+        Atualiza o índice: na primeira vez (ou com completo=True) lê todos os contratos;
+        depois, só os alterados (atualizado_em) e os apagados (registros_removidos) desde a última carga.
+        """
+        with self._atualizacao:
+            self._atualizar(supabase, completo)
+
+    def _atualizar(self, supabase, completo: bool = False):
+        # Versão lida antes dos dados: uma sincronização no meio força nova atualização
+        versao = obter_versao(supabase, CHAVE_VERSAO, ttl=0)
+        if not completo and self.construido and versao is not None and versao == self.versao:
+            return  # outra atualização já chegou a esta versão
+
+        marca = self.ultima_atualizacao
+        removidos = None
+        if not completo and self.construido and marca:
+            alterados = list(ler_tabela(supabase, 'sienge_contratos',
+                                        filtros=[('gte', 'atualizado_em', inicio_releitura(marca))]))
+            removidos = ids_removidos(supabase, 'sienge_contratos', marca)
+
+        if removidos is None:
+            # Carga completa num índice novo, trocado de uma vez
+            novo = IndiceContratos()
+            alterados = list(ler_tabela(supabase, 'sienge_contratos'))
+            for contrato in alterados:
+                novo._adicionar(contrato)
+                novo.ultima_atualizacao = marca_mais_recente(novo.ultima_atualizacao, contrato.get('atualizado_em'))
+            with self._lock:
+                self.contratos, self.campos, self.ngramas = novo.contratos, novo.campos, novo.ngramas
+                self.ultima_atualizacao = novo.ultima_atualizacao
+        else:
+            with self._lock:
+                for contrato in alterados:
+                    self._remover(contrato['id'])
+                    self._adicionar(contrato)
+                    self.ultima_atualizacao = marca_mais_recente(self.ultima_atualizacao, contrato.get('atualizado_em'))
+                # Ids não são reaproveitados: a remoção é sempre posterior à alteração lida
+                for contrato_id in removidos:
+                    self._remover(contrato_id)
+
+        self.versao = versao
+        self.construido = True
+        print(f"[Índice] Contratos: {len(self.contratos)} indexados ({len(alterados)} relidos), versão {versao}")
+
+    def buscar(self, termo: str, limite: int = 50) -> List[Dict]:
+        """Contratos que contêm o termo no lote, no cliente ou no número, do mais para o menos relevante"""
+        termo = normalizar_texto(termo)
+        if len(termo) < 2:
+            return []
+
+        with self._lock:
+            if len(termo) == 2:
+                candidatos = set(self.ngramas.get(termo, ()))
+            else:
+                conjuntos = sorted((self.ngramas.get(g, set()) for g in _ngramas(termo) if len(g) == 3), key=len)
+                candidatos = set(conjuntos[0]).intersection(*conjuntos[1:]) if conjuntos else set()
+
+            pontuados = []
+            for contrato_id in candidatos:
+                contrato = self.contratos[contrato_id]
+                pontos = self._pontuar(contrato_id, termo)
+                if pontos is not None:
+                    pontuados.append((pontos, str(contrato.get('numero_contrato')), contrato_id))
+
+            pontuados.sort()
+            return [self._resultado(self.contratos[cid]) for _, _, cid in pontuados[:limite]]
+
+    def _pontuar(self, contrato_id: int, termo: str) -> Optional[int]:
+        """Menor é melhor: lote exato, prefixo de lote, contrato, cliente; None se não contém o termo"""
+        lotes, numero, cliente = self.campos[contrato_id]
+        pontos = []
+        for lote in lotes:
+            if lote == termo:
+                pontos.append(0)
+            elif lote.startswith(termo):
+                pontos.append(1)
+            elif termo in lote:
+                pontos.append(4)
+        if numero == termo:
+            pontos.append(2)
+        elif numero.startswith(termo):
+            pontos.append(3)
+        elif termo in numero:
+            pontos.append(5)
+        if any(palavra.startswith(termo) for palavra in cliente.split()):
+            pontos.append(6)
+        elif termo in cliente:
+            pontos.append(7)
+        return min(pontos) if pontos else None
+
+    def _adicionar(self, contrato: Dict):
+        # Contratos cancelados (sienge_contratos.cancelado) ficam fora do índice
+        if contrato.get('cancelado'):
+            return
+        contrato_id = contrato['id']
+        lotes = extrair_lotes(contrato.get('unidades'))
+        if contrato.get('unidade'):
+            lotes.append(str(contrato['unidade']))
+        campos = (
+            [normalizar_texto(lote) for lote in lotes if lote],
+            normalizar_texto(contrato.get('numero_contrato')),
+            normalizar_texto(contrato.get('nome_cliente'))
+        )
+
+        self.contratos[contrato_id] = {k: contrato.get(k) for k in CAMPOS_RESULTADO}
+        self.campos[contrato_id] = campos
+        for texto in campos[0] + [campos[1], campos[2]]:
+            for grama in _ngramas(texto):
+                self.ngramas[grama].add(contrato_id)
+
+    def _remover(self, contrato_id: int):
+        campos = self.campos.pop(contrato_id, None)
+        self.contratos.pop(contrato_id, None)
+        if not campos:
+            return
+        for texto in campos[0] + [campos[1], campos[2]]:
+            for grama in _ngramas(texto):
+                ids = self.ngramas.get(grama)
+                if ids:
+                    ids.discard(contrato_id)
+                    if not ids:
+                        del self.ngramas[grama]
+
+    @staticmethod
+    def _resultado(contrato: Dict) -> Dict:
+        """Formato esperado pelo autocomplete do frontend"""
+        resultado = dict(contrato)
+        if resultado.get('unidades') and not resultado.get('unidade'):
+            resultado['unidade'] = resultado.get('unidades')
+        resultado['sienge_empreendimentos'] = {'nome': nome_empreendimento(resultado.get('building_id'))}
+        return resultado
+
+
+# Um índice por worker
+indice_contratos = IndiceContratos()
@@ -0,0 +1,75 @@
+"""
+JSON Provider - Sistema de Comissões Young
+Serialização JSON rápida (orjson) para as respostas do Flask.
+
+A listagem e o relatório serializam dezenas de milhares de dicts por
+chamada; com orjson isso fica bem mais barato que o encoder da stdlib.
+Datas e Decimals passam pela mesma conversão do DefaultJSONProvider do Flask
+(datas no formato HTTP, ex. 'Wed, 01 Jan 2025 00:00:00 GMT', e Decimal como
+string), então o frontend recebe os mesmos valores com ou sem orjson. Sem
+orjson instalado, ou com algum valor que ele não aceita (ex.: inteiro com
+mais de 64 bits), cai no DefaultJSONProvider. A única diferença é que o
+orjson não escapa caracteres não ASCII (o JSON decodificado é o mesmo).
+
+Uso: app.json = JsonProviderRapido(app)
+Comparação de tempos: python benchmark_json.py
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o json da stdlib
+    orjson = None
+
+
+def converter_valor(o):
+    """Conversão dos tipos que o JSON não conhece: a do Flask (datas, Decimal, UUID, dataclasses) e conjuntos como lista"""
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    return DefaultJSONProvider.default(o)
+
+
+class JsonProviderRapido(DefaultJSONProvider):
+    """DefaultJSONProvider que serializa com orjson quando disponível"""
+
+    default = staticmethod(converter_valor)
+
+    def dumps(self, obj, **kwargs) -> str:
+        dados = self._dumps_orjson(obj, kwargs)
+        if dados is None:
+            return super().dumps(obj, **kwargs)
+        return dados.decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Igual ao do Flask, mas grava os bytes do orjson direto no corpo (sem str intermediária)"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+
+        dados = self._dumps_orjson(obj, {'indent': 2} if indentar else {})
+        if dados is None:
+            return super().response(obj)
+        return self._app.response_class(dados + b'\n', mimetype=self.mimetype)
+
+    def _dumps_orjson(self, obj, kwargs):
+        """Bytes serializados com orjson, ou None quando for preciso usar a stdlib"""
+        # Argumentos do json.dumps que o orjson não tem equivalente ficam com a stdlib
+        if orjson is None or set(kwargs) - {'indent', 'separators'} or kwargs.get('indent') not in (None, 2):
+            return None
+
+        # Datas vão para converter_valor (formato do Flask) em vez do ISO 8601 do orjson
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            opcoes |= orjson.OPT_INDENT_2
+
+        try:
+            return orjson.dumps(obj, default=converter_valor, option=opcoes)
+        except orjson.JSONEncodeError:
+            return None
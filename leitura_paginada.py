@@ -0,0 +1,74 @@
+"""
+Leitura Paginada - Sistema de Comissões Young
+Percorre tabelas do Supabase em faixas de tamanho fixo.
+
+O PostgREST corta cada resposta no limite max-rows do projeto, então um
+select('*').execute() sem paginação devolve a tabela truncada sem avisar.
+"""
+
+from typing import Dict, Iterator, List, Optional, Union
+
+# Mesmo valor do max-rows padrão do Supabase
+TAMANHO_PAGINA_PADRAO = 1000
+
+
+def ler_tabela(supabase, tabela: str, colunas: str = '*', filtros: Optional[List[tuple]] = None,
+               ordem: Union[str, List[str]] = 'id', tamanho_pagina: int = TAMANHO_PAGINA_PADRAO) -> Iterator[Dict]:
+    """
+    Itera sobre todas as linhas de uma tabela, buscando uma faixa por vez.
+
+    filtros: lista de tuplas (operador, *argumentos) do cliente Supabase, ex.:
+        [('eq', 'building_id', 2003), ('not_.is_', 'senha_hash', 'null')]
+    ordem: coluna (ou colunas) com ordenação estável entre as faixas. Com uma
+        coluna só (única e não nula, como id), a próxima faixa começa depois do
+        último valor lido (keyset); com várias, por deslocamento (OFFSET)
+    tamanho_pagina: não pode passar do max-rows do projeto, já que uma faixa
+        menor que ele marca o fim da tabela
+    """
+    ordens = [ordem] if isinstance(ordem, str) else list(ordem)
+    chave = ordens[0] if len(ordens) == 1 else None
+
+    # O keyset precisa do valor da coluna de ordem em cada linha
+    selecionadas = [c.strip() for c in colunas.split(',')]
+    incluir_chave = chave is not None and colunas.strip() != '*' and chave not in selecionadas
+    if incluir_chave:
+        colunas = f"{colunas}, {chave}"
+
+    ultimo = None
+    inicio = 0
+
+    while True:
+        query = supabase.table(tabela).select(colunas)
+
+        for operador, *args in (filtros or []):
+            alvo = query
+            for parte in operador.split('.'):
+                alvo = getattr(alvo, parte)
+            query = alvo(*args)
+
+        for coluna in ordens:
+            query = query.order(coluna)
+
+        if chave is not None:
+            if ultimo is not None:
+                query = query.gt(chave, ultimo)
+            query = query.limit(tamanho_pagina)
+        else:
+            query = query.range(inicio, inicio + tamanho_pagina - 1)
+
+        linhas = query.execute().data or []
+        if not linhas:
+            break
+
+        if chave is not None:
+            ultimo = linhas[-1][chave]
+        inicio += len(linhas)
+
+        if incluir_chave:
+            for linha in linhas:
+                linha.pop(chave, None)
+        yield from linhas
+
+        # Faixa incompleta: não há mais linhas, sem ida extra ao banco
+        if len(linhas) < tamanho_pagina:
+            break
@@ -0,0 +1,184 @@
+"""
+Limitador de Login - Sistema de Comissões Young
+Limita as tentativas de login com falha por IP e por usuário (username ou
+documento do corretor), antes de qualquer consulta ao banco ou bcrypt.
+
+Cada chave usa uma janela deslizante aproximada: as falhas da janela fixa
+atual somadas às da anterior, ponderadas pela parte dela que ainda cai nos
+últimos JANELA_SEGUNDOS. São dois inteiros por chave, sem lista de instantes.
+O caminho da verificação não usa lock (operações de dict e list são atômicas
+no CPython; um incremento perdido numa corrida só afrouxa o limite em uma
+tentativa) e as chaves expiradas são removidas a cada INTERVALO_LIMPEZA.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List
+
+from documentos import normalizar_documento
+
+# Janela (segundos) e falhas permitidas nela por IP e por usuário
+JANELA_SEGUNDOS = int(os.getenv('LOGIN_JANELA_SEGUNDOS', '300'))
+LIMITE_FALHAS_IP = int(os.getenv('LOGIN_LIMITE_FALHAS_IP', '30'))
+LIMITE_FALHAS_USUARIO = int(os.getenv('LOGIN_LIMITE_FALHAS_USUARIO', '5'))
+
+# Remoção das chaves expiradas
+INTERVALO_LIMPEZA = 60
+MAX_CHAVES = 100000
+# Chaves mantidas quando MAX_CHAVES é atingido
+ALVO_CHAVES = MAX_CHAVES // 2
+
+# Chaves com mais bloqueios mostradas nas métricas
+MAX_CHAVES_METRICAS = 10
+
+
+class LimitadorLogin:
+    """Contadores de falhas de login por IP e por usuário, em memória no worker"""
+
+    def __init__(self, janela: int = JANELA_SEGUNDOS, limite_ip: int = LIMITE_FALHAS_IP,
+                 limite_usuario: int = LIMITE_FALHAS_USUARIO):
+        self.janela = janela
+        self.limites = {'ip': limite_ip, 'usuario': limite_usuario}
+        # chave -> [índice da janela fixa, falhas nela, falhas na janela anterior]
+        self._contadores: Dict[str, List[int]] = {}
+        # chave -> tentativas bloqueadas (para as métricas; limpo junto com os contadores)
+        self._bloqueios: Dict[str, int] = {}
+        self._proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+        self._limpeza_lock = threading.Lock()
+        self.metricas = {
+            'verificadas': 0,
+            'bloqueadas': 0,
+            'bloqueadas_ip': 0,
+            'bloqueadas_usuario': 0,
+            'falhas': 0,
+            'sucessos': 0,
+            'chaves_removidas': 0,
+        }
+
+    def verificar(self, ip: str, tipo_login: str, usuario: str) -> int:
+        """
+        Segundos que o cliente deve esperar antes de tentar de novo (0 = pode tentar).
+        Tentativas bloqueadas não contam como falha, para o bloqueio não se estender sozinho.
+        """
+        agora = time.monotonic()
+        self._limpar_se_preciso(agora)
+        self.metricas['verificadas'] += 1
+
+        for tipo, chave in self._chaves(ip, tipo_login, usuario):
+            falhas = self._estimar(chave, agora)
+            if falhas >= self.limites[tipo]:
+                self.metricas['bloqueadas'] += 1
+                self.metricas[f'bloqueadas_{tipo}'] += 1
+                self._bloqueios[chave] = self._bloqueios.get(chave, 0) + 1
+                # Até o fim da janela atual, quando o peso da anterior já caiu
+                return max(1, math.ceil(self.janela - agora % self.janela))
+        return 0
+
+    def registrar_falha(self, ip: str, tipo_login: str, usuario: str):
+        agora = time.monotonic()
+        indice = int(agora // self.janela)
+        self.metricas['falhas'] += 1
+
+        for _, chave in self._chaves(ip, tipo_login, usuario):
+            contador = self._contadores.get(chave)
+            if contador is None:
+                self._contadores[chave] = [indice, 1, 0]
+                continue
+            self._avancar(contador, indice)
+            contador[1] += 1
+
+    def registrar_sucesso(self, ip: str, tipo_login: str, usuario: str):
+        """Login correto zera as falhas do usuário (as do IP continuam valendo)"""
+        self.metricas['sucessos'] += 1
+        for tipo, chave in self._chaves(ip, tipo_login, usuario):
+            if tipo == 'usuario':
+                self._contadores.pop(chave, None)
+
+    def obter_metricas(self) -> Dict:
+        """Contadores gerais, chaves em memória e as chaves com mais tentativas bloqueadas"""
+        mais_bloqueadas = sorted(self._bloqueios.items(), key=lambda item: item[1], reverse=True)
+        return {
+            **self.metricas,
+            'chaves_ativas': len(self._contadores),
+            'janela_segundos': self.janela,
+            'limite_falhas_ip': self.limites['ip'],
+            'limite_falhas_usuario': self.limites['usuario'],
+            'mais_bloqueadas': [{'chave': chave, 'bloqueios': total}
+                                for chave, total in mais_bloqueadas[:MAX_CHAVES_METRICAS]],
+        }
+
+    def _estimar(self, chave: str, agora: float) -> float:
+        """Falhas nos últimos `janela` segundos (janela deslizante aproximada)"""
+        contador = self._contadores.get(chave)
+        if contador is None:
+            return 0
+        indice = int(agora // self.janela)
+        self._avancar(contador, indice)
+        decorrido = (agora % self.janela) / self.janela
+        return contador[1] + contador[2] * (1 - decorrido)
+
+    @staticmethod
+    def _avancar(contador: List[int], indice: int):
+        """Leva o contador para a janela fixa `indice`"""
+        if contador[0] == indice:
+            return
+        contador[2] = contador[1] if contador[0] == indice - 1 else 0
+        contador[1] = 0
+        contador[0] = indice
+
+    def _chaves(self, ip: str, tipo_login: str, usuario: str) -> List[tuple]:
+        # Campo do formulário: qualquer outro valor não pode abrir uma cota nova de falhas
+        tipo_login = normalizar_tipo_login(tipo_login)
+        if tipo_login == 'corretor':
+            usuario_normalizado = normalizar_documento(usuario)
+        else:
+            usuario_normalizado = (usuario or '').strip().lower()
+
+        chaves = [('ip', f'ip:{ip or "-"}')]
+        if usuario_normalizado:
+            chaves.append(('usuario', f'{tipo_login}:{usuario_normalizado}'))
+        return chaves
+
+    def _limpar_se_preciso(self, agora: float):
+        """Remove as chaves sem falhas nas duas últimas janelas (no máximo a cada INTERVALO_LIMPEZA)"""
+        if agora < self._proxima_limpeza and len(self._contadores) < MAX_CHAVES:
+            return
+        if not self._limpeza_lock.acquire(blocking=False):
+            return
+        try:
+            self._proxima_limpeza = agora + INTERVALO_LIMPEZA
+            indice = int(agora // self.janela)
+            expiradas = [chave for chave, contador in list(self._contadores.items()) if contador[0] < indice - 1]
+            for chave in expiradas:
+                self._contadores.pop(chave, None)
+                self._bloqueios.pop(chave, None)
+            self.metricas['chaves_removidas'] += len(expiradas)
+
+            # Muitas chaves ativas (ataque com IPs/usuários variados): remove as de menos
+            # falhas até voltar a ALVO_CHAVES; chaves bloqueadas são as últimas a sair,
+            # para o ataque não zerar o bloqueio do usuário visado
+            excesso = len(self._contadores) - ALVO_CHAVES
+            if len(self._contadores) >= MAX_CHAVES and excesso > 0:
+                ordenadas = []
+                for chave in list(self._contadores):
+                    falhas = self._estimar(chave, agora)
+                    limite = self.limites['ip' if chave.startswith('ip:') else 'usuario']
+                    ordenadas.append((falhas >= limite, falhas, chave))
+                ordenadas.sort()
+                for _, _, chave in ordenadas[:excesso]:
+                    self._contadores.pop(chave, None)
+                    self._bloqueios.pop(chave, None)
+                self.metricas['chaves_removidas'] += excesso
+                print(f"[Login] Limitador com {len(ordenadas)} chaves ativas, {excesso} com menos falhas removidas")
+        finally:
+            self._limpeza_lock.release()
+
+
+def normalizar_tipo_login(tipo_login) -> str:
+    """'corretor' ou 'gestor', os dois caminhos de autenticação do login"""
+    return 'corretor' if str(tipo_login or '').strip().lower() == 'corretor' else 'gestor'
+
+
+limitador_login = LimitadorLogin()
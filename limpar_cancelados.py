@@ -8,6 +8,7 @@ import os
 from datetime import datetime
 from supabase import create_client
 from dotenv import load_dotenv
+from leitura_paginada import ler_tabela
 
 load_dotenv()
 
@@ -23,44 +24,15 @@ def conectar_supabase():
 def listar_contratos_cancelados(supabase):
     """
     Lista todos os contratos que devem ser removidos.
-    Um contrato é considerado cancelado se TODAS as suas comissões estão com status CANCELLED.
+    Um contrato é considerado cancelado se TODAS as suas comissões estão com status CANCELLED
+    (coluna sienge_contratos.cancelado, calculada na sincronização).
     """
     print("\n" + "="*60)
     print("BUSCANDO CONTRATOS CANCELADOS...")
     print("="*60)
     
     try:
-        # Buscar todas as comissões
-        result_comissoes = supabase.table('sienge_comissoes').select('numero_contrato, building_id, installment_status').execute()
-        
-        # Agrupar comissões por contrato
-        contratos_comissoes = {}
-        for c in (result_comissoes.data or []):
-            chave = f"{c.get('numero_contrato')}_{c.get('building_id')}"
-            if chave not in contratos_comissoes:
-                contratos_comissoes[chave] = {'statuses': [], 'numero_contrato': c.get('numero_contrato'), 'building_id': c.get('building_id')}
-            contratos_comissoes[chave]['statuses'].append(c.get('installment_status') or '')
-        
-        # Identificar contratos onde TODAS as comissões estão canceladas
-        contratos_cancelados_ids = []
-        for chave, dados in contratos_comissoes.items():
-            todos_cancelados = all('CANCEL' in s.upper() for s in dados['statuses'])
-            if todos_cancelados and dados['statuses']:
-                contratos_cancelados_ids.append({
-                    'numero_contrato': dados['numero_contrato'],
-                    'building_id': dados['building_id']
-                })
-        
-        # Buscar dados completos dos contratos cancelados
-        contratos_cancelados = []
-        for c_id in contratos_cancelados_ids:
-            result = supabase.table('sienge_contratos')\
-                .select('*')\
-                .eq('numero_contrato', c_id['numero_contrato'])\
-                .eq('building_id', c_id['building_id'])\
-                .execute()
-            if result.data:
-                contratos_cancelados.extend(result.data)
+        contratos_cancelados = list(ler_tabela(supabase, 'sienge_contratos', filtros=[('eq', 'cancelado', True)]))
         
         print(f"\nEncontrados {len(contratos_cancelados)} contratos com TODAS as comissões canceladas:")
         for c in contratos_cancelados:
@@ -79,11 +51,9 @@ def listar_comissoes_canceladas(supabase):
     print("="*60)
     
     try:
-        result = supabase.table('sienge_comissoes').select('*').execute()
-        
         comissoes_canceladas = []
         comissoes_pagas = []
-        for c in (result.data or []):
+        for c in ler_tabela(supabase, 'sienge_comissoes'):
             status = (c.get('installment_status') or '').lower()
             if any(x in status for x in ['cancel', 'distrat', 'rescind']):
                 comissoes_canceladas.append(c)
@@ -120,11 +90,9 @@ def buscar_duplicatas_comissoes(supabase):
     print("="*60)
     
     try:
-        result = supabase.table('sienge_comissoes').select('*').execute()
-        
         # Agrupar por numero_contrato + unit_name
         grupos = {}
-        for c in (result.data or []):
+        for c in ler_tabela(supabase, 'sienge_comissoes'):
             chave = f"{c.get('numero_contrato')}_{c.get('unit_name')}_{c.get('building_id')}"
             if chave not in grupos:
                 grupos[chave] = []
@@ -0,0 +1,141 @@
+"""
+Respostas HTTP - Sistema de Comissões Young
+Compressão negociada (gzip/brotli) e ETag das respostas grandes da API.
+
+O ETag das rotas marcadas com @com_etag é derivado da versão dos dados
+(versao_dados), da URL e do usuário, e é calculado ANTES da consulta:
+se o navegador já tem essa versão (If-None-Match), a resposta é um 304
+sem ler nada do Supabase. Como a versão lida fica alguns segundos em
+cache por worker (TTL_VERSAO), um 304 pode chegar com esse atraso
+depois de uma alteração feita em outro worker.
+"""
+
+import gzip
+import hashlib
+import os
+from functools import wraps
+from typing import Optional
+
+from flask import request, make_response
+from flask_login import current_user
+from supabase import create_client
+
+from versao_dados import obter_versao
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele as respostas saem em gzip
+    brotli = None
+
+# Respostas menores que isso não compensam a compressão
+TAMANHO_MINIMO_COMPRESSAO = 1024
+
+TIPOS_COMPRIMIVEIS = {'application/json', 'application/x-ndjson', 'text/html', 'text/csv'}
+
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+# Cliente só para ler versao_dados (criado no primeiro uso)
+_supabase = None
+
+
+def com_etag(*chaves: str):
+    """
+    Decorador de rota: responde 304 quando If-None-Match traz o ETag atual das
+    chaves de versao_dados informadas (ex.: @com_etag('comissoes')); senão executa
+    a rota e grava o ETag na resposta 200. Sem versão marcada, não usa ETag.
+    Respostas em streaming ficam sem ETag: se o gerador falhar no meio, o corpo
+    truncado não pode virar a versão guardada pelo navegador.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = calcular_etag(chaves)
+            if etag is None:
+                return view(*args, **kwargs)
+
+            enviado = _etag_enviado(etag)
+            if enviado:
+                # Devolve o ETag que o cliente tem (com o sufixo da codificação, se houver)
+                resposta = make_response('', 304)
+                etag = enviado
+            else:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200 or resposta.is_streamed:
+                    return resposta
+
+            resposta.set_etag(etag)
+            # O navegador guarda a resposta, mas sempre revalida com If-None-Match
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return wrapper
+    return decorador
+
+
+def calcular_etag(chaves) -> Optional[str]:
+    """ETag da requisição atual para as versões das chaves (None se alguma não existir)"""
+    global _supabase
+    if _supabase is None:
+        _supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+
+    versoes = [obter_versao(_supabase, chave) for chave in chaves]
+    if not all(versoes):
+        return None
+
+    usuario = current_user.get_id() if current_user and current_user.is_authenticated else ''
+    parametros = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    base = '|'.join(versoes + [request.path, parametros, str(usuario)])
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()[:32]
+
+
+def comprimir_resposta(resposta):
+    """
+    Hook after_request: comprime a resposta com a melhor codificação aceita pelo
+    cliente (br, se o pacote brotli estiver instalado, ou gzip). Respostas em
+    streaming e arquivos estáticos (direct_passthrough) passam sem alteração.
+    """
+    if resposta.status_code != 200 or resposta.direct_passthrough or resposta.is_streamed \
+            or 'Content-Encoding' in resposta.headers or resposta.mimetype not in TIPOS_COMPRIMIVEIS:
+        return resposta
+
+    resposta.vary.add('Accept-Encoding')
+    codificacao = _negociar_codificacao()
+    if not codificacao:
+        return resposta
+
+    dados = resposta.get_data()
+    if len(dados) < TAMANHO_MINIMO_COMPRESSAO:
+        return resposta
+
+    if codificacao == 'br':
+        resposta.set_data(brotli.compress(dados, quality=QUALIDADE_BROTLI))
+    else:
+        resposta.set_data(gzip.compress(dados, compresslevel=NIVEL_GZIP))
+    resposta.headers['Content-Encoding'] = codificacao
+
+    # ETag forte identifica bytes: cada codificação tem o seu
+    etag, fraca = resposta.get_etag()
+    if etag:
+        resposta.set_etag(f'{etag}-{codificacao}', weak=fraca)
+    return resposta
+
+
+def _negociar_codificacao() -> Optional[str]:
+    aceitas = request.accept_encodings
+    qualidade_gzip = aceitas['gzip']
+    if brotli is not None and aceitas['br'] and aceitas['br'] >= qualidade_gzip:
+        return 'br'
+    return 'gzip' if qualidade_gzip else None
+
+
+def _etag_enviado(etag: str) -> Optional[str]:
+    """Valor de If-None-Match que corresponde ao ETag (em qualquer codificação), ou None"""
+    enviados = request.if_none_match
+    if not enviados:
+        return None
+    if enviados.star_tag:
+        return etag
+    for valor in enviados.as_set(include_weak=True):
+        if valor in (etag, f'{etag}-gzip', f'{etag}-br'):
+            return valor
+    return None
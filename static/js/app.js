@@ -735,7 +735,10 @@ document.addEventListener('click', function(e) {
 // PÁGINA: VISUALIZAR COMISSÕES
 // ================================
 
-async function buscarComissoes() {
+let paginaAtualComissoes = 1;
+const COMISSOES_POR_PAGINA = 100;
+
+async function buscarComissoes(pagina = 1) {
     const loading = document.getElementById('loadingComissoes');
     const tabelaContainer = document.getElementById('tabelaComissoesContainer');
     
@@ -760,14 +763,17 @@ async function buscarComissoes() {
         if (statusAprovacao.length > 0) url += `status_aprovacao=${statusAprovacao.join(',')}&`;
         if (dataInicio) url += `data_inicio=${dataInicio}&`;
         if (dataFim) url += `data_fim=${dataFim}&`;
+        url += `pagina=${pagina}&por_pagina=${COMISSOES_POR_PAGINA}`;
         
         const response = await fetchComRetry(url);
         const data = await response.json();
         
         if (loading) loading.style.display = 'none';
         
-        if (data.sucesso && data.comissoes) {
+        if (data.sucesso && data.comissoes && data.comissoes.length > 0) {
+            paginaAtualComissoes = data.pagina || pagina;
             renderizarTabelaComissoes(data.comissoes);
+            renderizarPaginacaoComissoes(paginaAtualComissoes, data.total_paginas || 1);
             if (tabelaContainer) tabelaContainer.style.display = 'block';
             
             // Mostrar contagem de resultados
@@ -779,6 +785,7 @@ async function buscarComissoes() {
             if (tbody) {
                 tbody.innerHTML = '<tr><td colspan="13" style="text-align: center; padding: 2rem; color: #888;">Nenhuma comissão encontrada com os filtros selecionados</td></tr>';
             }
+            renderizarPaginacaoComissoes(1, 1);
             if (tabelaContainer) tabelaContainer.style.display = 'block';
         }
     } catch (error) {
@@ -788,6 +795,24 @@ async function buscarComissoes() {
     }
 }
 
+function renderizarPaginacaoComissoes(pagina, totalPaginas) {
+    const paginacao = document.getElementById('paginacaoComissoes');
+    if (!paginacao) return;
+    
+    if (totalPaginas <= 1) {
+        paginacao.style.display = 'none';
+        paginacao.innerHTML = '';
+        return;
+    }
+    
+    paginacao.style.display = 'flex';
+    paginacao.innerHTML = `
+        <button class="btn-secondary" onclick="buscarComissoes(${pagina - 1})" ${pagina <= 1 ? 'disabled' : ''}>Anterior</button>
+        <span style="align-self: center; color: #999;">Página ${pagina} de ${totalPaginas}</span>
+        <button class="btn-secondary" onclick="buscarComissoes(${pagina + 1})" ${pagina >= totalPaginas ? 'disabled' : ''}>Próxima</button>
+    `;
+}
+
 function traduzirStatusAprovacao(status) {
     if (!status) return 'Aguardando liberação';
     
@@ -1014,7 +1039,7 @@ async function enviarParaAprovacao() {
             showAlert(data.mensagem || 'Comissões enviadas para aprovação!', 'success');
             comissoesSelecionadas = [];
             atualizarAcoesLote();
-            buscarComissoes();
+            buscarComissoes(paginaAtualComissoes);
         } else {
             const erro = data.erro || data.mensagem || 'Erro ao enviar para aprovação';
             showAlert(erro, 'error');
@@ -1891,6 +1916,22 @@ function populateMultiSelect(filtroId, options, valueField = 'id', textField = '
 
 // Carregar filtros do relatório
 window.carregarFiltrosRelatorio = async function() {
+    try {
+        // Uma chamada com empreendimentos, corretores e regras (com a quantidade de comissões)
+        const facetasResponse = await fetch('/api/comissoes/facetas');
+        const facetas = await facetasResponse.json();
+
+        if (facetas.sucesso && facetas.facetas) {
+            const opcoes = lista => lista.map(f => ({ id: f.valor, nome: `${f.nome || f.valor} (${f.total})` }));
+            populateMultiSelect('relatorioEmpreendimento', opcoes(facetas.facetas.empreendimento), 'id', 'nome');
+            populateMultiSelect('relatorioCorretor', opcoes(facetas.facetas.corretor), 'id', 'nome');
+            populateMultiSelect('relatorioRegra', opcoes(facetas.facetas.regra), 'id', 'nome');
+            return;
+        }
+    } catch (error) {
+        console.warn('Facetas indisponíveis, carregando filtros individualmente:', error);
+    }
+
     try {
         // Carregar empreendimentos
         const empreendimentosResponse = await fetch('/api/empreendimentos');
@@ -1939,54 +1980,53 @@ window.carregarRelatorioComissoes = async function() {
     tbody.innerHTML = '';
     
     try {
-        // Obter valores dos multi-selects
-        const empreendimentos = getMultiSelectValues('relatorioEmpreendimento');
-        const corretores = getMultiSelectValues('relatorioCorretor');
-        const regras = getMultiSelectValues('relatorioRegra');
-        const auditorias = getMultiSelectValues('relatorioAuditoria');
-        
-        // Obter filtros de data
-        const dataInicio = document.getElementById('filtroRelatorioDataInicio')?.value || '';
-        const dataFim = document.getElementById('filtroRelatorioDataFim')?.value || '';
-        
         // Montar URL com filtros
-        let url = '/api/relatorio-comissoes?';
-        
-        if (empreendimentos.length > 0) url += `empreendimento_id=${empreendimentos.join(',')}&`;
-        if (corretores.length > 0) url += `corretor_id=${corretores.join(',')}&`;
-        if (regras.length > 0) url += `regra_id=${regras.join(',')}&`;
-        if (auditorias.length > 0) url += `auditoria=${auditorias.join(',')}&`;
-        if (dataInicio) url += `data_inicio=${dataInicio}&`;
-        if (dataFim) url += `data_fim=${dataFim}&`;
+        let url = urlFiltrosRelatorio('/api/relatorio-comissoes');
         
+        // NDJSON: as linhas chegam e são desenhadas aos poucos; o resumo vem no último registro
+        url += 'format=ndjson';
         const response = await fetch(url);
-        const result = await response.json();
-        
-        if (loading) loading.style.display = 'none';
+        if (!response.ok) {
+            const result = await response.json().catch(() => ({}));
+            throw new Error(result.erro || `HTTP ${response.status}`);
+        }
         
-        console.log('[RELATÓRIO] Resposta da API:', result);
+        dadosRelatorio = [];
+        let resumoRecebido = null;
         
-        if (result.sucesso && result.dados) {
-            dadosRelatorio = result.dados;
-            console.log('[RELATÓRIO] Dados carregados:', dadosRelatorio.length, 'registros');
-            
-            // Atualizar resumo
-            if (resumo) {
-                resumo.style.display = 'block';
-                document.getElementById('totalVendasRelatorio').textContent = result.resumo.total_vendas;
-                document.getElementById('totalComissoesRelatorio').textContent = formatCurrency(result.resumo.total_comissoes);
-                document.getElementById('totalCorretoresRelatorio').textContent = result.resumo.total_corretores;
-                document.getElementById('totalAuditoriasRelatorio').textContent = result.resumo.auditorias_aprovadas;
-                console.log('[RELATÓRIO] Resumo atualizado');
+        await lerNdjson(response, registros => {
+            const linhas = [];
+            registros.forEach(registro => {
+                if (registro.tipo === 'resumo') {
+                    resumoRecebido = registro.resumo;
+                } else if (registro.tipo === 'erro') {
+                    throw new Error(registro.erro);
+                } else {
+                    linhas.push(registro);
+                }
+            });
+            if (linhas.length > 0) {
+                if (dadosRelatorio.length === 0 && loading) loading.style.display = 'none';
+                dadosRelatorio.push(...linhas);
+                tbody.insertAdjacentHTML('beforeend', linhas.map(linhaTabelaRelatorio).join(''));
             }
-            
-            // Renderizar tabela
-            console.log('[RELATÓRIO] Renderizando tabela...');
+        });
+        
+        if (loading) loading.style.display = 'none';
+        console.log('[RELATÓRIO] Dados carregados:', dadosRelatorio.length, 'registros');
+        
+        if (dadosRelatorio.length === 0) {
             renderizarTabelaRelatorio(dadosRelatorio);
-            console.log('[RELATÓRIO] Tabela renderizada');
-        } else {
-            console.error('[RELATÓRIO] Erro na resposta:', result.erro);
-            tbody.innerHTML = `<tr><td colspan="7" style="text-align: center; padding: 2rem; color: #f87171;">Erro ao carregar relatório: ${result.erro || 'Erro desconhecido'}</td></tr>`;
+        }
+        
+        // Atualizar resumo
+        if (resumo && resumoRecebido) {
+            resumo.style.display = 'block';
+            document.getElementById('totalVendasRelatorio').textContent = resumoRecebido.total_vendas;
+            document.getElementById('totalComissoesRelatorio').textContent = formatCurrency(resumoRecebido.total_comissoes);
+            document.getElementById('totalCorretoresRelatorio').textContent = resumoRecebido.total_corretores;
+            document.getElementById('totalAuditoriasRelatorio').textContent = resumoRecebido.auditorias_aprovadas;
+            console.log('[RELATÓRIO] Resumo atualizado');
         }
     } catch (error) {
         console.error('Erro ao carregar relatório:', error);
@@ -1995,6 +2035,42 @@ window.carregarRelatorioComissoes = async function() {
     }
 };
 
+// Lê uma resposta NDJSON em blocos, chamando aoReceber com os registros de cada bloco
+async function lerNdjson(response, aoReceber) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pendente = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        pendente += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const partes = pendente.split('\n');
+        pendente = done ? '' : partes.pop();
+        const registros = partes.filter(p => p.trim()).map(p => JSON.parse(p));
+        if (registros.length > 0) aoReceber(registros);
+        if (done) break;
+    }
+}
+
+// URL com os filtros atuais do relatório (termina em '?' ou '&', pronta para mais parâmetros)
+function urlFiltrosRelatorio(base) {
+    const empreendimentos = getMultiSelectValues('relatorioEmpreendimento');
+    const corretores = getMultiSelectValues('relatorioCorretor');
+    const regras = getMultiSelectValues('relatorioRegra');
+    const auditorias = getMultiSelectValues('relatorioAuditoria');
+    const dataInicio = document.getElementById('filtroRelatorioDataInicio')?.value || '';
+    const dataFim = document.getElementById('filtroRelatorioDataFim')?.value || '';
+    
+    let url = `${base}?`;
+    if (empreendimentos.length > 0) url += `empreendimento_id=${empreendimentos.join(',')}&`;
+    if (corretores.length > 0) url += `corretor_id=${corretores.join(',')}&`;
+    if (regras.length > 0) url += `regra_id=${regras.join(',')}&`;
+    if (auditorias.length > 0) url += `auditoria=${auditorias.join(',')}&`;
+    if (dataInicio) url += `data_inicio=${dataInicio}&`;
+    if (dataFim) url += `data_fim=${dataFim}&`;
+    return url;
+}
+
 // Renderizar tabela do relatório
 function renderizarTabelaRelatorio(dados) {
     const tbody = document.getElementById('corpoTabelaRelatorio');
@@ -2012,42 +2088,46 @@ function renderizarTabelaRelatorio(dados) {
         return;
     }
     
-    tbody.innerHTML = dados.map(item => {
-        // Badge de tipo de regra
-        let regraBadge = '';
-        if (item.tipo_regra === 'faturamento') {
-            regraBadge = `<span style="display: inline-block; background: rgba(96, 165, 250, 0.15); color: #60a5fa; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.7rem; margin-bottom: 0.25rem; font-weight: 500;">Faturamento</span>`;
-        } else {
-            regraBadge = `<span style="display: inline-block; background: rgba(74, 222, 128, 0.15); color: #4ade80; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.7rem; margin-bottom: 0.25rem; font-weight: 500;">Gatilho</span>`;
-        }
-        
-        // Badge de auditoria
-        let auditoriaBadge = '';
-        if (item.auditoria_aprovada === true) {
-            auditoriaBadge = '<span style="background: rgba(74, 222, 128, 0.15); color: #4ade80; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem; font-weight: 500;">Aprovada</span>';
-        } else if (item.auditoria_aprovada === false) {
-            auditoriaBadge = '<span style="background: rgba(248, 113, 113, 0.15); color: #f87171; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem; font-weight: 500;">Reprovada</span>';
-        } else {
-            auditoriaBadge = '<span style="background: rgba(156, 163, 175, 0.15); color: #9ca3af; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem;">Pendente</span>';
-        }
-        
-        return `
-        <tr style="border-bottom: 1px solid #333; transition: background 0.2s;" onmouseover="this.style.background='#1a1a1a'" onmouseout="this.style.background='transparent'">
-            <td style="padding: 1rem; font-weight: 500; color: #FE5009;">${item.lote || '-'}</td>
-            <td style="padding: 1rem;">${item.cliente || '-'}</td>
-            <td style="padding: 1rem; color: #999;">${item.empreendimento || '-'}</td>
-            <td style="padding: 1rem;">${item.corretor || '-'}</td>
-            <td style="padding: 1rem;">
-                <div style="display: flex; flex-direction: column;">
-                    ${regraBadge}
-                    <span style="font-weight: 500;">${item.regra_nome || 'Não definida'}</span>
-                    <span style="font-size: 0.8rem; color: #999;">${item.regra_descricao || ''}</span>
-                </div>
-            </td>
-            <td style="padding: 1rem; text-align: center;">${auditoriaBadge}</td>
-            <td style="padding: 1rem; text-align: right; font-weight: 600; color: #4ade80;">${formatCurrency(item.valor_comissao)}</td>
-        </tr>
-    `}).join('');
+    tbody.innerHTML = dados.map(linhaTabelaRelatorio).join('');
+}
+
+// Linha (tr) da tabela do relatório
+function linhaTabelaRelatorio(item) {
+    // Badge de tipo de regra
+    let regraBadge = '';
+    if (item.tipo_regra === 'faturamento') {
+        regraBadge = `<span style="display: inline-block; background: rgba(96, 165, 250, 0.15); color: #60a5fa; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.7rem; margin-bottom: 0.25rem; font-weight: 500;">Faturamento</span>`;
+    } else {
+        regraBadge = `<span style="display: inline-block; background: rgba(74, 222, 128, 0.15); color: #4ade80; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.7rem; margin-bottom: 0.25rem; font-weight: 500;">Gatilho</span>`;
+    }
+    
+    // Badge de auditoria
+    let auditoriaBadge = '';
+    if (item.auditoria_aprovada === true) {
+        auditoriaBadge = '<span style="background: rgba(74, 222, 128, 0.15); color: #4ade80; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem; font-weight: 500;">Aprovada</span>';
+    } else if (item.auditoria_aprovada === false) {
+        auditoriaBadge = '<span style="background: rgba(248, 113, 113, 0.15); color: #f87171; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem; font-weight: 500;">Reprovada</span>';
+    } else {
+        auditoriaBadge = '<span style="background: rgba(156, 163, 175, 0.15); color: #9ca3af; padding: 0.25rem 0.75rem; border-radius: 4px; font-size: 0.8rem;">Pendente</span>';
+    }
+    
+    return `
+    <tr style="border-bottom: 1px solid #333; transition: background 0.2s;" onmouseover="this.style.background='#1a1a1a'" onmouseout="this.style.background='transparent'">
+        <td style="padding: 1rem; font-weight: 500; color: #FE5009;">${item.lote || '-'}</td>
+        <td style="padding: 1rem;">${item.cliente || '-'}</td>
+        <td style="padding: 1rem; color: #999;">${item.empreendimento || '-'}</td>
+        <td style="padding: 1rem;">${item.corretor || '-'}</td>
+        <td style="padding: 1rem;">
+            <div style="display: flex; flex-direction: column;">
+                ${regraBadge}
+                <span style="font-weight: 500;">${item.regra_nome || 'Não definida'}</span>
+                <span style="font-size: 0.8rem; color: #999;">${item.regra_descricao || ''}</span>
+            </div>
+        </td>
+        <td style="padding: 1rem; text-align: center;">${auditoriaBadge}</td>
+        <td style="padding: 1rem; text-align: right; font-weight: 600; color: #4ade80;">${formatCurrency(item.valor_comissao)}</td>
+    </tr>
+`;
 }
 
 // Limpar filtros do relatório
@@ -2082,55 +2162,17 @@ window.limparFiltrosRelatorio = function() {
     dadosRelatorio = [];
 };
 
-// Exportar relatório para Excel
-window.exportarRelatorioComissoes = async function(formato) {
-    if (dadosRelatorio.length === 0) {
-        showAlert('Carregue o relatório antes de exportar', 'warning');
-        return;
-    }
-    
-    try {
-        // Criar dados para CSV/Excel
-        const headers = ['Lote', 'Cliente', 'Empreendimento', 'Corretor', 'Regra Aplicada', 'Tipo Regra', 'Auditoria', 'Valor Comissão'];
-        
-        const rows = dadosRelatorio.map(item => [
-            item.lote || '',
-            item.cliente || '',
-            item.empreendimento || '',
-            item.corretor || '',
-            `${item.regra_nome || ''} - ${item.regra_descricao || ''}`,
-            item.tipo_regra === 'faturamento' ? 'Faturamento' : 'Gatilho',
-            item.auditoria_aprovada === true ? 'Aprovada' : (item.auditoria_aprovada === false ? 'Reprovada' : 'Pendente'),
-            item.valor_comissao || 0
-        ]);
-        
-        // Criar CSV
-        let csvContent = '\uFEFF'; // BOM para UTF-8
-        csvContent += headers.join(';') + '\n';
-        rows.forEach(row => {
-            csvContent += row.map(cell => {
-                // Escapar aspas e vírgulas
-                const cellStr = String(cell).replace(/"/g, '""');
-                return `"${cellStr}"`;
-            }).join(';') + '\n';
-        });
-        
-        // Download
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-        const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-        link.setAttribute('href', url);
-        link.setAttribute('download', `relatorio_comissoes_${new Date().toISOString().split('T')[0]}.csv`);
-        link.style.visibility = 'hidden';
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        
-        showAlert('Relatório exportado com sucesso!', 'success');
-    } catch (error) {
-        console.error('Erro ao exportar relatório:', error);
-        showAlert('Erro ao exportar relatório', 'error');
-    }
+// Exportar relatório (o servidor gera o arquivo em streaming com os filtros atuais)
+window.exportarRelatorioComissoes = function(formato) {
+    const extensao = formato === 'csv' ? 'csv' : 'xlsx';
+    const link = document.createElement('a');
+    link.setAttribute('href', urlFiltrosRelatorio('/api/relatorio-comissoes/export') + `format=${extensao}`);
+    link.style.visibility = 'hidden';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    
+    showAlert('Exportação iniciada. O download começará em instantes.', 'success');
 };
 
 // Inicializar filtros quando a página de relatório for aberta
@@ -67,6 +67,9 @@ async function carregarComissoesPendentes() {
     const tabelaContainer = document.getElementById('tabelaContainer');
     const emptyState = document.getElementById('emptyState');
     
+    // Cards de totais vêm de /api/dashboard/kpis, em paralelo com a listagem
+    const kpisCarregados = carregarKpisDirecao();
+    
     try {
         loading.style.display = 'block';
         tabelaContainer.style.display = 'none';
@@ -79,13 +82,13 @@ async function carregarComissoesPendentes() {
         
         if (!data.sucesso || !data.comissoes || data.comissoes.length === 0) {
             emptyState.style.display = 'block';
-            atualizarEstatisticas([]);
+            if (!(await kpisCarregados)) atualizarEstatisticas([]);
             return;
         }
         
         tabelaContainer.style.display = 'block';
         renderizarTabelaComissoesDirecao(data.comissoes);
-        atualizarEstatisticas(data.comissoes);
+        if (!(await kpisCarregados)) atualizarEstatisticas(data.comissoes);
         
     } catch (error) {
         console.error('Erro ao carregar comissões:', error);
@@ -94,6 +97,23 @@ async function carregarComissoesPendentes() {
     }
 }
 
+async function carregarKpisDirecao() {
+    try {
+        const response = await fetch('/api/dashboard/kpis');
+        const data = await response.json();
+        
+        if (!data.sucesso || !data.pendentes_aprovacao) return false;
+        
+        animateValue('totalPendente', data.pendentes_aprovacao.quantidade);
+        document.getElementById('valorTotal').textContent = formatCurrency(data.pendentes_aprovacao.valor_total);
+        return true;
+    } catch (error) {
+        console.error('Erro ao carregar indicadores:', error);
+        return false;
+    }
+}
+
+// Totais calculados da listagem (usado se /api/dashboard/kpis não responder)
 function atualizarEstatisticas(comissoes) {
     const total = comissoes.length;
     const valorTotal = comissoes.reduce((sum, c) => sum + parseFloat(c.valor_comissao || c.commission_value || 0), 0);
@@ -284,7 +304,7 @@ async function aprovarComissoesSelecionadas() {
         if (data.sucesso) {
             showAlert(data.mensagem || 'Comissões aprovadas com sucesso!', 'success');
             if (data.email_enviado) {
-                showAlert('E-mail enviado ao financeiro!', 'info');
+                showAlert('E-mail ao financeiro na fila de envio!', 'info');
             }
             comissoesSelecionadasDirecao = [];
             document.getElementById('selecionarTodasDirecao').checked = false;
@@ -4,14 +4,60 @@ Sincroniza dados do Sienge para o banco Supabase
 """
 
 import os
-from datetime import datetime
+import re
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 from supabase import create_client
 from dotenv import load_dotenv
 from sienge_client import sienge_client
+from leitura_paginada import ler_tabela
+from gatilho import avaliar_gatilho
+from versao_dados import marcar_versao
 
 load_dotenv()
 
+# Mapeamento de status PT-BR (filtros do dashboard) para os valores do Sienge
+MAPA_STATUS_PARCELA = {
+    'pago': ['paidout', 'paid out', 'paid', 'pago'],
+    'pendente': ['pending', 'pendente'],
+    'vencido': ['overdue', 'vencido'],
+    'aberto': ['open', 'aberto'],
+    'parcial': ['partial', 'parcial'],
+    'cancelado': ['cancelled', 'canceled', 'cancelado'],
+    'aguardando autorização': ['awaiting authorization', 'awaiting_authorization', 'aguardando autorização'],
+    'liberado': ['released', 'liberado']
+}
+
+# Mapeamento de building_id para nome do empreendimento (strings e inteiros)
+EMPREENDIMENTOS = {
+    '2003': 'Montecarlo',
+    '2004': 'Ilha dos Açores',
+    '2005': 'Aurora',
+    '2007': 'Parque Lorena I',
+    '2009': 'Parque Lorena II',
+    '2010': 'Erico Verissimo',
+    '2011': 'Algarve',
+    '2014': 'Morada da Coxilha',
+    2003: 'Montecarlo',
+    2004: 'Ilha dos Açores',
+    2005: 'Aurora',
+    2007: 'Parque Lorena I',
+    2009: 'Parque Lorena II',
+    2010: 'Erico Verissimo',
+    2011: 'Algarve',
+    2014: 'Morada da Coxilha'
+}
+
+# Modelo de leitura mantido pela sincronização (ver criar_comissoes_enriquecidas.sql)
+TABELA_COMISSOES_ENRIQUECIDAS = 'comissoes_enriquecidas'
+TABELA_KPIS_COMISSOES = 'kpis_comissoes'
+
+# Texto que começa com uma data ISO (DATE ou TIMESTAMPTZ vindos do Supabase)
+_DATA_ISO = re.compile(r'\d{4}-\d{2}-\d{2}(?:$|[T ])')
+
 
 class SiengeSupabaseSync:
     """Sincroniza dados do Sienge para Supabase"""
@@ -84,6 +130,8 @@ class SiengeSupabaseSync:
                     'valor_a_vista': contract.get('cashValue') or contract.get('totalValue'),
                     'status': contract.get('status'),
                     'unidade': contract.get('unitName'),
+                    # Sem o trigger de criar_versao_dados.sql; com ele, o banco carimba
+                    # NOW() e mantém o valor anterior quando o contrato não mudou
                     'atualizado_em': datetime.now().isoformat()
                 }
                 
@@ -136,9 +184,14 @@ class SiengeSupabaseSync:
             
             pagos = 0
             
+            # Status de todas as comissões de cada contrato (inclusive as canceladas)
+            status_por_contrato = {}
+            
             for commission in commissions:
                 # Verificar se a comissão está cancelada ou paga (campo installmentStatus)
                 status = (commission.get('installmentStatus') or commission.get('status') or '').upper()
+                chave_contrato = f"{commission.get('contractNumber')}|{commission.get('buildingId')}"
+                status_por_contrato.setdefault(chave_contrato, []).append(status)
                 
                 # Ignorar comissões canceladas
                 if 'CANCEL' in status:
@@ -212,12 +265,45 @@ class SiengeSupabaseSync:
                 ).execute()
                 count += 1
             
+            contratos_cancelados = self._gravar_contratos_cancelados(status_por_contrato, building_id)
+            
             print(f"[Sync] Comissões: {count} sincronizadas, {cancelados} canceladas ignoradas, {pagos} pagas ignoradas")
-            return {'sucesso': True, 'total': count, 'cancelados': cancelados, 'pagos': pagos}
+            return {'sucesso': True, 'total': count, 'cancelados': cancelados, 'pagos': pagos,
+                    'contratos_cancelados': contratos_cancelados}
         except Exception as e:
             print(f"Erro ao sincronizar comissões: {str(e)}")
             return {'sucesso': False, 'erro': str(e)}
     
+    def _gravar_contratos_cancelados(self, status_por_contrato: Dict[str, List[str]], building_id: int = None) -> int:
+        """
+        Grava sienge_contratos.cancelado: TRUE quando todas as comissões do contrato
+        vieram canceladas do Sienge. Só atualiza contratos em que o valor mudou.
+        """
+        cancelados = {chave for chave, statuses in status_por_contrato.items()
+                      if statuses and all('CANCEL' in s for s in statuses)}
+        
+        try:
+            filtros = [('eq', 'building_id', building_id)] if building_id else None
+            marcar, desmarcar = [], []
+            for c in ler_tabela(self.supabase, 'sienge_contratos', 'id, numero_contrato, building_id, cancelado', filtros=filtros):
+                cancelado = f"{c.get('numero_contrato')}|{c.get('building_id')}" in cancelados
+                if cancelado != bool(c.get('cancelado')):
+                    (marcar if cancelado else desmarcar).append(c['id'])
+            
+            agora = datetime.now().isoformat()
+            for valor, ids in ((True, marcar), (False, desmarcar)):
+                for i in range(0, len(ids), 200):
+                    self.supabase.table('sienge_contratos')\
+                        .update({'cancelado': valor, 'atualizado_em': agora})\
+                        .in_('id', ids[i:i + 200])\
+                        .execute()
+            
+            print(f"[Sync] Contratos cancelados: {len(cancelados)} ({len(marcar)} marcados, {len(desmarcar)} desmarcados)")
+        except Exception as e:
+            print(f"[Sync] Erro ao gravar contratos cancelados (coluna pode não existir): {str(e)}")
+        
+        return len(cancelados)
+    
     def sync_itbi(self, building_id: int = None) -> dict:
         """Sincroniza valores de ITBI"""
         try:
@@ -304,9 +390,20 @@ class SiengeSupabaseSync:
         print("Sincronizando valores pagos...")
         resultados['valores_pagos'] = self.sync_valores_pagos(building_id)
         
+        filtros = [('eq', 'building_id', building_id)] if building_id else None
+        
+        print("Avaliando gatilhos...")
+        resultados['gatilhos'] = self.avaliar_gatilhos(filtros)
+        
+        print("Atualizando comissões enriquecidas...")
+        resultados['comissoes_enriquecidas'] = self.atualizar_comissoes_enriquecidas(filtros)
+        
         # Registrar última sincronização
         self.registrar_sincronizacao(resultados)
         
+        # Caches em memória dos workers (ex.: índice da busca por lote) se recarregam
+        marcar_versao(self.supabase, 'contratos')
+        
         return resultados
     
     def registrar_sincronizacao(self, resultados: dict):
@@ -335,51 +432,200 @@ class SiengeSupabaseSync:
         except Exception as e:
             print(f"Erro ao buscar última sincronização: {str(e)}")
             return None
-    
+
+    # ==================== MODELO DE LEITURA ====================
+
+    def atualizar_comissoes_enriquecidas(self, filtros: Optional[List[tuple]] = None) -> dict:
+        """
+        Recalcula as linhas de comissoes_enriquecidas a partir de sienge_comissoes,
+        sienge_contratos, sienge_valor_pago, sienge_itbi e regras_gatilho.
+        filtros: escopo opcional no formato de ler_tabela, aplicado às duas tabelas
+        (ex.: [('eq', 'building_id', 2003)] ou [('in_', 'id', ids)]).
+        Só grava linhas que mudaram e remove as de comissões que não existem mais.
+        """
+        try:
+            comissoes = list(ler_tabela(self.supabase, 'sienge_comissoes', filtros=filtros))
+            dados = self._carregar_dados_contratos(comissoes, completo=not filtros)
+            regras_map = self._carregar_regras()
+
+            novas = []
+            for c in comissoes:
+                contrato, valor_pago, valor_itbi = dados.da_comissao(c)
+                novas.append(montar_comissao_enriquecida(
+                    c, contrato, valor_pago, valor_itbi,
+                    regras_map.get(c.get('regra_gatilho_id'))
+                ))
+
+            existentes = {r['id']: r for r in ler_tabela(self.supabase, TABELA_COMISSOES_ENRIQUECIDAS, filtros=filtros)}
+
+            agora = datetime.now().isoformat()
+            alteradas = []
+            for linha in novas:
+                atual = existentes.get(linha['id'])
+                if atual is None or any(_valor_mudou(atual.get(k), v) for k, v in linha.items()):
+                    alteradas.append({**linha, 'atualizado_em': agora})
+
+            for i in range(0, len(alteradas), 500):
+                self.supabase.table(TABELA_COMISSOES_ENRIQUECIDAS)\
+                    .upsert(alteradas[i:i + 500], on_conflict='id')\
+                    .execute()
+
+            ids_novos = {linha['id'] for linha in novas}
+            removidas = [i for i in existentes if i not in ids_novos]
+            for i in range(0, len(removidas), 200):
+                self.supabase.table(TABELA_COMISSOES_ENRIQUECIDAS)\
+                    .delete()\
+                    .in_('id', removidas[i:i + 200])\
+                    .execute()
+
+            # Nova versão invalida os ETags da listagem e do relatório
+            if alteradas or removidas:
+                marcar_versao(self.supabase, 'comissoes')
+
+            print(f"[Sync] Comissões enriquecidas: {len(novas)} no escopo, {len(alteradas)} gravadas, {len(removidas)} removidas")
+            return {'sucesso': True, 'total': len(novas), 'gravadas': len(alteradas), 'removidas': len(removidas)}
+        except Exception as e:
+            print(f"Erro ao atualizar comissões enriquecidas: {str(e)}")
+            return {'sucesso': False, 'erro': str(e)}
+
+    def avaliar_gatilhos(self, filtros: Optional[List[tuple]] = None) -> dict:
+        """
+        Avalia as comissões contra a regra de gatilho com o valor pago e o ITBI
+        sincronizados, e grava valor_gatilho, atingiu_gatilho e data_atingiu_gatilho
+        apenas nas comissões em que algo mudou.
+        filtros: escopo opcional no formato de ler_tabela (ex.: [('eq', 'building_id', 2003)])
+        """
+        try:
+            comissoes = list(ler_tabela(
+                self.supabase, 'sienge_comissoes',
+                'id, numero_contrato, building_id, regra_gatilho_id, regra_gatilho, '
+                'valor_gatilho, atingiu_gatilho, data_atingiu_gatilho',
+                filtros=filtros
+            ))
+            dados = self._carregar_dados_contratos(comissoes, completo=not filtros)
+            regras_map = self._carregar_regras()
+
+            agora = datetime.now().isoformat()
+            alteradas = []
+            atingidas = 0
+
+            for c in comissoes:
+                contrato, valor_pago, valor_itbi = dados.da_comissao(c)
+                contrato = contrato or {}
+                avaliacao = avaliar_gatilho(
+                    float(contrato.get('valor_a_vista') or contrato.get('valor_total') or 0),
+                    float(valor_itbi or 0),
+                    float(valor_pago or 0),
+                    regra=regras_map.get(c.get('regra_gatilho_id')),
+                    regra_texto=c.get('regra_gatilho')
+                )
+                if avaliacao['atingiu_gatilho']:
+                    atingidas += 1
+
+                mudou_status = bool(c.get('atingiu_gatilho')) != avaliacao['atingiu_gatilho']
+                if not mudou_status and not _valor_mudou(c.get('valor_gatilho'), avaliacao['valor_gatilho']):
+                    continue
+
+                # Todas as linhas com as mesmas colunas (gravar_gatilhos_comissoes exige)
+                alteradas.append({
+                    'id': c['id'],
+                    **avaliacao,
+                    'data_atingiu_gatilho': (agora if avaliacao['atingiu_gatilho'] else None)
+                                            if mudou_status else c.get('data_atingiu_gatilho')
+                })
+
+            for i in range(0, len(alteradas), 500):
+                self._gravar_gatilhos(alteradas[i:i + 500])
+
+            print(f"[Sync] Gatilhos: {len(comissoes)} avaliadas, {atingidas} atingidas, {len(alteradas)} alteradas")
+            return {'sucesso': True, 'total': len(comissoes), 'atingidas': atingidas, 'alteradas': len(alteradas)}
+        except Exception as e:
+            print(f"Erro ao avaliar gatilhos: {str(e)}")
+            return {'sucesso': False, 'erro': str(e)}
+
+    def _gravar_gatilhos(self, linhas: List[Dict]):
+        """
+        Grava um bloco de avaliações de gatilho só com UPDATE (nunca insere: uma comissão
+        apagada entre a leitura e a gravação não volta). Uma chamada à função
+        gravar_gatilhos_comissoes; sem ela, um update por grupo de valores iguais.
+        """
+        try:
+            self.supabase.rpc('gravar_gatilhos_comissoes', {'p_linhas': linhas}).execute()
+            return
+        except Exception as e:
+            print(f"[Sync] Erro ao gravar gatilhos em lote (função pode não existir), agrupando por valores: {str(e)}")
+
+        grupos = {}
+        for linha in linhas:
+            dados = {k: v for k, v in linha.items() if k != 'id'}
+            grupos.setdefault(tuple(sorted(dados.items())), []).append(linha['id'])
+
+        for dados, ids in grupos.items():
+            self.supabase.table('sienge_comissoes')\
+                .update(dict(dados))\
+                .in_('id', ids)\
+                .execute()
+
+    def _carregar_dados_contratos(self, comissoes: List[Dict], completo: bool = True) -> '_DadosContratos':
+        """
+        Carrega contratos, valores pagos e ITBI das comissões informadas.
+        completo=True lê as tabelas inteiras; senão, só os contratos das comissões.
+        """
+        tabelas = [
+            ('sienge_contratos', '*'),
+            ('sienge_valor_pago', 'id, numero_contrato, building_id, valor_pago'),
+            ('sienge_itbi', 'id, numero_contrato, building_id, valor_itbi')
+        ]
+        if completo:
+            def ler(tabela, colunas):
+                return list(ler_tabela(self.supabase, tabela, colunas))
+        else:
+            numeros = sorted({str(c.get('numero_contrato')) for c in comissoes if c.get('numero_contrato') is not None})
+
+            def ler(tabela, colunas):
+                return self._ler_por_contratos(tabela, colunas, numeros)
+
+        # As três leituras são independentes: em paralelo
+        with ThreadPoolExecutor(max_workers=len(tabelas)) as executor:
+            futuros = [executor.submit(ler, tabela, colunas) for tabela, colunas in tabelas]
+            contratos, valores_pagos, itbis = [f.result() for f in futuros]
+        return _DadosContratos(contratos, valores_pagos, itbis)
+
+    def _carregar_regras(self) -> Dict:
+        """Regras de gatilho por id (vazio se a tabela não existir)"""
+        try:
+            return {r['id']: r for r in ler_tabela(self.supabase, 'regras_gatilho')}
+        except Exception as e:
+            print(f"[Sync] Erro ao buscar regras_gatilho (tabela pode não existir): {e}")
+            return {}
+
+    def _ler_por_contratos(self, tabela: str, colunas: str, numeros: List[str]) -> List[Dict]:
+        """Lê as linhas de uma tabela dos contratos informados, em blocos de números"""
+        linhas = []
+        for i in range(0, len(numeros), 200):
+            linhas.extend(ler_tabela(self.supabase, tabela, colunas,
+                                     filtros=[('in_', 'numero_contrato', numeros[i:i + 200])]))
+        return linhas
+
     # ==================== MÉTODOS DE CONSULTA ====================
     
     def get_empreendimentos(self) -> List[Dict]:
         """Retorna todos os empreendimentos"""
-        # Mapeamento de building_id para nome do empreendimento (strings e inteiros)
-        EMPREENDIMENTOS = {
-            '2003': 'Montecarlo',
-            '2004': 'Ilha dos Açores',
-            '2005': 'Aurora',
-            '2007': 'Parque Lorena I',
-            '2009': 'Parque Lorena II',
-            '2010': 'Erico Verissimo',
-            '2011': 'Algarve',
-            '2014': 'Morada da Coxilha',
-            2003: 'Montecarlo',
-            2004: 'Ilha dos Açores',
-            2005: 'Aurora',
-            2007: 'Parque Lorena I',
-            2009: 'Parque Lorena II',
-            2010: 'Erico Verissimo',
-            2011: 'Algarve',
-            2014: 'Morada da Coxilha'
-        }
-        
         try:
             # Buscar building_ids unicos de sienge_contratos
-            result = self.supabase.table('sienge_contratos')\
-                .select('building_id')\
-                .execute()
+            building_ids = set()
+            for c in ler_tabela(self.supabase, 'sienge_contratos', 'id, building_id'):
+                bid = c.get('building_id')
+                if bid:
+                    building_ids.add(bid)
             
-            if result.data:
-                # Extrair building_ids unicos
-                building_ids = set()
-                for c in result.data:
-                    bid = c.get('building_id')
-                    if bid:
-                        building_ids.add(bid)
-                
+            if building_ids:
                 print(f"[Sync] building_ids encontrados: {sorted(building_ids, key=str)}")
                 
                 # Criar lista de empreendimentos
                 empreendimentos = []
                 for bid in building_ids:
-                    nome = EMPREENDIMENTOS.get(bid, f'Empreendimento {bid}')
+                    nome = nome_empreendimento(bid)
                     empreendimentos.append({
                         'sienge_id': bid,
                         'id': bid,
@@ -398,50 +644,75 @@ class SiengeSupabaseSync:
     def get_contratos_por_empreendimento(self, building_id: int) -> List[Dict]:
         """Retorna contratos de um empreendimento da tabela sienge_contratos (exclui cancelados)"""
         try:
-            result = self.supabase.table('sienge_contratos')\
-                .select('*')\
-                .eq('building_id', building_id)\
-                .order('numero_contrato')\
-                .execute()
-            data = result.data if result.data else []
+            data = list(ler_tabela(
+                self.supabase, 'sienge_contratos',
+                filtros=[('eq', 'building_id', building_id), ('not_.is_', 'cancelado', 'true')],
+                ordem=['numero_contrato', 'id']
+            ))
             
-            # Buscar comissões para identificar contratos cancelados
-            result_comissoes = self.supabase.table('sienge_comissoes')\
-                .select('numero_contrato, installment_status')\
-                .eq('building_id', building_id)\
-                .execute()
-            
-            # Agrupar comissões por contrato e verificar se todas estão canceladas
-            contratos_cancelados = set()
-            contratos_comissoes = {}
-            for c in (result_comissoes.data or []):
-                nc = c.get('numero_contrato')
-                if nc not in contratos_comissoes:
-                    contratos_comissoes[nc] = []
-                contratos_comissoes[nc].append(c.get('installment_status') or '')
-            
-            for nc, statuses in contratos_comissoes.items():
-                # Contrato cancelado se TODAS as comissões estão canceladas
-                if statuses and all('CANCEL' in s.upper() for s in statuses):
-                    contratos_cancelados.add(nc)
-            
-            # Filtrar contratos cancelados
-            data_filtrada = []
             for c in data:
-                nc = c.get('numero_contrato')
-                if nc in contratos_cancelados:
-                    continue
                 # Mapear unidades -> unidade
                 if 'unidades' in c and 'unidade' not in c:
                     c['unidade'] = c.get('unidades')
-                data_filtrada.append(c)
             
-            print(f"[Sync] get_contratos_por_empreendimento({building_id}): {len(data_filtrada)} registros (excluídos {len(contratos_cancelados)} cancelados)")
-            return data_filtrada
+            print(f"[Sync] get_contratos_por_empreendimento({building_id}): {len(data)} registros")
+            return data
         except Exception as e:
             print(f"[Sync] Erro ao buscar contratos: {str(e)}")
             return []
     
+    def get_contratos_pagina(self, building_id: int = None, cursor: str = None, limite: int = 200,
+                             campos: List[str] = None) -> Dict:
+        """
+        Retorna uma página de contratos ordenada por (building_id, numero_contrato).
+        A paginação é por cursor (keyset): o cursor codifica a chave do último contrato
+        da página anterior, então cada página é uma consulta indexada de tamanho fixo.
+        campos: projeção opcional de colunas (building_id e numero_contrato sempre vêm)
+        """
+        if campos:
+            colunas = ['building_id', 'numero_contrato'] + [c for c in campos if c not in ('building_id', 'numero_contrato')]
+            select = ', '.join(colunas)
+        else:
+            select = '*'
+
+        query = self.supabase.table('sienge_contratos').select(select)\
+            .not_.is_('cancelado', 'true')
+
+        if building_id:
+            query = query.eq('building_id', building_id)
+
+        if cursor:
+            ultimo_building, ultimo_numero = decodificar_cursor(cursor)
+            if building_id:
+                query = query.gt('numero_contrato', ultimo_numero)
+            else:
+                query = query.or_(
+                    f'building_id.gt.{ultimo_building},'
+                    f'and(building_id.eq.{ultimo_building},numero_contrato.gt.{_texto_filtro(ultimo_numero)})'
+                )
+
+        # Busca um registro a mais para saber se existe próxima página
+        try:
+            result = query\
+                .order('building_id')\
+                .order('numero_contrato')\
+                .limit(limite + 1)\
+                .execute()
+        except Exception as e:
+            # 42703: coluna pedida em campos não existe na tabela
+            if campos and getattr(e, 'code', None) == '42703':
+                raise ValueError(f"Campos inválidos: {', '.join(campos)}")
+            raise
+        contratos = result.data if result.data else []
+
+        proximo_cursor = None
+        if len(contratos) > limite:
+            contratos = contratos[:limite]
+            ultimo = contratos[-1]
+            proximo_cursor = codificar_cursor(ultimo.get('building_id'), ultimo.get('numero_contrato'))
+
+        return {'contratos': contratos, 'proximo_cursor': proximo_cursor}
+
     def get_contrato_por_numero(self, numero_contrato: str, building_id) -> Optional[Dict]:
         """Retorna um contrato pelo numero da tabela sienge_contratos"""
         try:
@@ -480,13 +751,11 @@ class SiengeSupabaseSync:
         
         # Fallback: extrair corretores unicos de sienge_contratos
         try:
-            result = self.supabase.table('sienge_contratos')\
-                .select('corretor_id, corretor')\
-                .execute()
+            contratos = list(ler_tabela(self.supabase, 'sienge_contratos', 'id, corretor_id, corretor'))
             
-            if result.data:
+            if contratos:
                 corretores_map = {}
-                for c in result.data:
+                for c in contratos:
                     cid = c.get('corretor_id')
                     nome = c.get('corretor')
                     if cid and nome and cid not in corretores_map:
@@ -508,19 +777,182 @@ class SiengeSupabaseSync:
     def get_comissoes_por_corretor(self, corretor_id: int = None, corretor_nome: str = None) -> List[Dict]:
         """Retorna comissões de um corretor"""
         try:
-            query = self.supabase.table('sienge_comissoes').select('*')
-            
+            filtros = []
             if corretor_id:
-                query = query.eq('broker_id', corretor_id)
+                filtros.append(('eq', 'broker_id', corretor_id))
             elif corretor_nome:
-                query = query.ilike('broker_nome', f'%{corretor_nome}%')
+                filtros.append(('ilike', 'broker_nome', f'%{corretor_nome}%'))
             
-            result = query.execute()
-            return result.data if result.data else []
+            return list(ler_tabela(self.supabase, 'sienge_comissoes', filtros=filtros))
         except Exception as e:
             print(f"Erro ao buscar comissões do corretor: {str(e)}")
             return []
+
+    def listar_comissoes_paginado(self, status_parcela: List[str] = None, status_aprovacao: List[str] = None,
+                                  gatilho: List[bool] = None, data_inicio: str = '', data_fim: str = '',
+                                  pagina: int = 1, por_pagina: int = 100) -> Dict:
+        """
+        Lista comissões de comissoes_enriquecidas com os filtros aplicados no próprio Supabase
+        e paginação por range. Retorna {'comissoes': [...], 'total': N}, onde total é a
+        contagem de todas as páginas. valor_pago e data_contrato já vêm na linha.
+        """
+        query = self.supabase.table(TABELA_COMISSOES_ENRIQUECIDAS).select('*', count='exact')
+
+        # Cancelados nunca aparecem (pagas devem aparecer)
+        query = query.eq('cancelada', False)
+
+        # Status da parcela: busca parcial pelos valores equivalentes do Sienge
+        if status_parcela:
+            padroes = [f'"*{valor}*"' for valor in valores_status_parcela(status_parcela)]
+            query = query.ilike_any_of('installment_status', ','.join(padroes))
+
+        if status_aprovacao:
+            query = query.in_('status_aprovacao', status_aprovacao)
+
+        if gatilho:
+            query = query.in_('atingiu_gatilho', sorted({'true' if g else 'false' for g in gatilho}))
+
+        # Período da data do contrato (data_fim inclusiva)
+        for operador, valor in _filtros_periodo(data_inicio, data_fim):
+            query = getattr(query, operador)('data_contrato', valor)
+
+        inicio = (pagina - 1) * por_pagina
+        result = query\
+            .order('commission_date', desc=True, nullsfirst=False)\
+            .order('id')\
+            .range(inicio, inicio + por_pagina - 1)\
+            .execute()
+
+        comissoes = result.data if result.data else []
+        total = result.count if result.count is not None else len(comissoes)
+
+        return {'comissoes': comissoes, 'total': total}
+
+    def listar_relatorio_comissoes(self, empreendimentos: List[str] = None, corretores: List[str] = None,
+                                   regras: List[str] = None, auditorias: List[str] = None,
+                                   data_inicio: str = '', data_fim: str = ''):
+        """
+        Itera sobre as linhas de comissoes_enriquecidas do relatório, já filtradas
+        e ordenadas por empreendimento e lote no Supabase.
+        auditorias: valores 'sim', 'nao' e/ou 'pendente'
+        """
+        filtros = [('eq', 'cancelada', False)]
+
+        if empreendimentos:
+            filtros.append(('in_', 'building_id', empreendimentos))
+        if corretores:
+            filtros.append(('in_', 'broker_id', corretores))
+        if regras:
+            filtros.append(('in_', 'regra_gatilho_id', regras))
+
+        if auditorias:
+            condicoes = {
+                'sim': 'auditoria_aprovada.is.true',
+                'nao': 'auditoria_aprovada.is.false',
+                'pendente': 'auditoria_aprovada.is.null'
+            }
+            clausulas = [condicoes[a] for a in auditorias if a in condicoes]
+            if not clausulas:
+                return
+            filtros.append(('or_', ','.join(clausulas)))
+
+        for operador, valor in _filtros_periodo(data_inicio, data_fim):
+            filtros.append((operador, 'data_contrato', valor))
+
+        yield from ler_tabela(self.supabase, TABELA_COMISSOES_ENRIQUECIDAS, filtros=filtros,
+                              ordem=['empreendimento_nome', 'lote', 'id'])
+
+    def get_facetas_comissoes(self, status_parcela: List[str] = None, status_aprovacao: List[str] = None,
+                              corretores: List[str] = None, empreendimentos: List[str] = None,
+                              regras: List[str] = None, gatilho: List[bool] = None,
+                              data_inicio: str = '', data_fim: str = '') -> Dict:
+        """
+        Valores distintos com contagem para os filtros de comissões (status da parcela,
+        status de aprovação, corretor, empreendimento e regra), em uma única chamada à
+        função facetas_comissoes. As contagens respeitam os filtros informados; cada
+        faceta ignora apenas o próprio filtro.
+        """
+        params = {
+            'p_status_parcela': [f'%{valor}%' for valor in valores_status_parcela(status_parcela)] or None,
+            'p_status_aprovacao': status_aprovacao or None,
+            'p_corretores': [int(c) for c in corretores or [] if str(c).isdigit()] or None,
+            'p_empreendimentos': [str(e) for e in empreendimentos or []] or None,
+            'p_regras': [int(r) for r in regras or [] if str(r).isdigit()] or None,
+            'p_gatilho': sorted(set(gatilho)) if gatilho else None,
+            'p_data_inicio': data_inicio or None,
+            'p_data_fim': data_fim or None
+        }
+        result = self.supabase.rpc('facetas_comissoes', params).execute()
+        facetas = result.data or {}
+        for chave in ('status_parcela', 'status_aprovacao', 'corretor', 'empreendimento', 'regra'):
+            facetas.setdefault(chave, [])
+        facetas.setdefault('total', 0)
+        return facetas
+    
+    def get_kpis_comissoes(self) -> Dict:
+        """
+        Totais do dashboard da direção lidos de kpis_comissoes (uma linha por status de
+        aprovação × status da parcela × empreendimento × mês, mantida por gatilho em
+        comissoes_enriquecidas). A consulta não cresce com o número de comissões.
+        """
+        linhas = list(ler_tabela(
+            self.supabase, TABELA_KPIS_COMISSOES,
+            'status_aprovacao, installment_status, building_id, mes, empreendimento_nome, quantidade, valor_total',
+            ordem=['mes', 'status_aprovacao', 'installment_status', 'building_id']
+        ))
+
+        # Pendentes de aprovação, sem parcelas canceladas (como em listar_comissoes_por_status)
+        pendentes = [l for l in linhas if l.get('status_aprovacao') == 'Pendente de Aprovação'
+                     and 'CANCEL' not in (l.get('installment_status') or '').upper()]
+
+        por_empreendimento = _somar_kpis(linhas, 'building_id')
+        nomes = {str(l.get('building_id')): l.get('empreendimento_nome') for l in linhas}
+        for item in por_empreendimento:
+            item['empreendimento_nome'] = nomes.get(item['building_id']) or nome_empreendimento(item['building_id'])
+
+        return {
+            'total': _somar_kpis(linhas)[0] if linhas else {'quantidade': 0, 'valor_total': 0.0},
+            'pendentes_aprovacao': _somar_kpis(pendentes)[0] if pendentes else {'quantidade': 0, 'valor_total': 0.0},
+            'por_status_aprovacao': _somar_kpis(linhas, 'status_aprovacao'),
+            'por_status_parcela': _somar_kpis(linhas, 'installment_status'),
+            'por_empreendimento': por_empreendimento,
+            'por_mes': _somar_kpis(linhas, 'mes')
+        }
     
+    def get_contratos_enriquecidos(self, pares: List[tuple]) -> Dict[tuple, Dict]:
+        """
+        Dados completos de vários contratos (numero_contrato, building_id) com poucas consultas.
+        Vêm de comissoes_enriquecidas (uma consulta por bloco de números); contratos sem
+        comissão são montados das tabelas de origem, lidas em lote e em paralelo.
+        Retorna {(numero_contrato, building_id) como strings: linha no formato de comissoes_enriquecidas}
+        """
+        chaves = {(str(n), str(b)) for n, b in pares}
+        numeros = sorted({n for n, _ in chaves})
+        encontrados = {}
+
+        try:
+            for i in range(0, len(numeros), 200):
+                for linha in ler_tabela(self.supabase, TABELA_COMISSOES_ENRIQUECIDAS, filtros=[
+                    ('in_', 'numero_contrato', numeros[i:i + 200]),
+                    ('not_.is_', 'contrato_id', 'null')
+                ]):
+                    chave = (str(linha.get('numero_contrato')), str(linha.get('building_id')))
+                    if chave in chaves and chave not in encontrados:
+                        encontrados[chave] = linha
+        except Exception as e:
+            print(f"[Sync] Erro ao buscar comissões enriquecidas (tabela pode não existir): {str(e)}")
+
+        faltantes = [{'numero_contrato': n, 'building_id': b} for n, b in chaves if (n, b) not in encontrados]
+        if faltantes:
+            dados = self._carregar_dados_contratos(faltantes, completo=False)
+            for f in faltantes:
+                contrato, valor_pago, valor_itbi = dados.da_comissao(f)
+                if contrato:
+                    encontrados[(f['numero_contrato'], f['building_id'])] = \
+                        montar_comissao_enriquecida(f, contrato, valor_pago, valor_itbi, None)
+
+        return encontrados
+
     def get_itbi_por_contrato(self, numero_contrato: str, building_id: int) -> Optional[float]:
         """Retorna valor ITBI de um contrato"""
         try:
@@ -557,97 +989,30 @@ class SiengeSupabaseSync:
     
     def buscar_contratos_por_lote(self, numero_lote: str) -> List[Dict]:
         """Busca contratos que contenham o numero do lote na tabela sienge_contratos"""
-        import json
-        
-        # Mapeamento de building_id para nome do empreendimento (strings e inteiros)
-        EMPREENDIMENTOS = {
-            '2003': 'Montecarlo',
-            '2004': 'Ilha dos Açores',
-            '2005': 'Aurora',
-            '2007': 'Parque Lorena I',
-            '2009': 'Parque Lorena II',
-            '2010': 'Erico Verissimo',
-            '2011': 'Algarve',
-            '2014': 'Morada da Coxilha',
-            2003: 'Montecarlo',
-            2004: 'Ilha dos Açores',
-            2005: 'Aurora',
-            2007: 'Parque Lorena I',
-            2009: 'Parque Lorena II',
-            2010: 'Erico Verissimo',
-            2011: 'Algarve',
-            2014: 'Morada da Coxilha'
-        }
-        
-        def extrair_numero_lote(unidades_data):
-            """Extrai numeros de lote do campo unidades (pode ser jsonb)"""
-            if not unidades_data:
-                return []
-            
-            if isinstance(unidades_data, list):
-                # Ja e uma lista de objetos
-                return [str(u.get('name', '')) for u in unidades_data if isinstance(u, dict)]
-            elif isinstance(unidades_data, str):
-                try:
-                    parsed = json.loads(unidades_data)
-                    if isinstance(parsed, list):
-                        return [str(u.get('name', '')) for u in parsed if isinstance(u, dict)]
-                except:
-                    return [unidades_data]
-            return [str(unidades_data)]
-        
         try:
             # Buscar por numero_contrato ou nome_cliente (campos texto)
             result = self.supabase.table('sienge_contratos')\
                 .select('*')\
                 .or_(f'numero_contrato.ilike.%{numero_lote}%,nome_cliente.ilike.%{numero_lote}%')\
+                .not_.is_('cancelado', 'true')\
                 .limit(100)\
                 .execute()
             
             contratos_texto = result.data if result.data else []
             
-            # Tambem buscar todos e filtrar pelo campo unidades em Python
-            result_all = self.supabase.table('sienge_contratos')\
-                .select('*')\
-                .limit(2000)\
-                .execute()
-            
+            # Tambem percorrer todos e filtrar pelo campo unidades em Python
             contratos_por_unidade = []
-            if result_all.data:
-                for c in result_all.data:
-                    lotes = extrair_numero_lote(c.get('unidades'))
-                    # Verificar se algum lote contem o termo buscado
-                    if any(numero_lote.lower() in lote.lower() for lote in lotes):
-                        contratos_por_unidade.append(c)
-            
-            # Buscar comissões para identificar contratos cancelados
-            result_comissoes = self.supabase.table('sienge_comissoes')\
-                .select('numero_contrato, building_id, installment_status')\
-                .execute()
-            
-            # Agrupar comissões por contrato e verificar se todas estão canceladas
-            contratos_cancelados = set()
-            contratos_comissoes = {}
-            for c in (result_comissoes.data or []):
-                chave = f"{c.get('numero_contrato')}_{c.get('building_id')}"
-                if chave not in contratos_comissoes:
-                    contratos_comissoes[chave] = []
-                contratos_comissoes[chave].append(c.get('installment_status') or '')
+            for c in ler_tabela(self.supabase, 'sienge_contratos', filtros=[('not_.is_', 'cancelado', 'true')]):
+                lotes = extrair_lotes(c.get('unidades'))
+                # Verificar se algum lote contem o termo buscado
+                if any(numero_lote.lower() in lote.lower() for lote in lotes):
+                    contratos_por_unidade.append(c)
             
-            for chave, statuses in contratos_comissoes.items():
-                if statuses and all('CANCEL' in s.upper() for s in statuses):
-                    contratos_cancelados.add(chave)
-            
-            # Combinar resultados sem duplicatas e filtrar cancelados
+            # Combinar resultados sem duplicatas (cancelados já filtrados nas consultas)
             contratos_ids = set()
             contratos = []
             
             for c in contratos_texto + contratos_por_unidade:
-                # Filtrar cancelados (baseado nas comissões)
-                chave = f"{c.get('numero_contrato')}_{c.get('building_id')}"
-                if chave in contratos_cancelados:
-                    continue
-                    
                 cid = c.get('sienge_id') or c.get('id') or c.get('numero_contrato')
                 if cid not in contratos_ids:
                     contratos_ids.add(cid)
@@ -663,10 +1028,244 @@ class SiengeSupabaseSync:
                     c['unidade'] = c.get('unidades')
                 # Adicionar nome do empreendimento
                 bid = c.get('building_id')
-                c['sienge_empreendimentos'] = {'nome': EMPREENDIMENTOS.get(bid, f'Empreendimento {bid}')}
+                c['sienge_empreendimentos'] = {'nome': nome_empreendimento(bid)}
             
             print(f"[Sync] buscar_contratos_por_lote('{numero_lote}'): {len(contratos)} registros")
             return contratos
         except Exception as e:
             print(f"[Sync] Erro ao buscar contratos por lote: {str(e)}")
             return []
+
+
+def codificar_cursor(building_id, numero_contrato) -> str:
+    """Codifica a chave (building_id, numero_contrato) em um cursor opaco para a URL"""
+    bruto = json.dumps([int(building_id), str(numero_contrato)]).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    """Decodifica um cursor gerado por codificar_cursor (ValueError se inválido)"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        building_id, numero_contrato = json.loads(bruto)
+    except Exception:
+        raise ValueError('Cursor inválido')
+    # Os valores vão para o filtro do PostgREST: só a chave que codificar_cursor gera
+    if type(building_id) is not int or not isinstance(numero_contrato, str):
+        raise ValueError('Cursor inválido')
+    return building_id, numero_contrato
+
+
+def _texto_filtro(valor: str) -> str:
+    """Valor entre aspas para filtros or_/and do PostgREST (vírgulas, parênteses e aspas ficam literais)"""
+    return '"' + valor.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class _DadosContratos:
+    """Contratos, valores pagos e ITBI indexados por "numero_contrato|building_id" """
+
+    def __init__(self, contratos: List[Dict], valores_pagos: List[Dict], itbis: List[Dict]):
+        self.contratos = {}
+        self.contratos_por_numero = {}
+        for ct in contratos:
+            self.contratos[f"{ct.get('numero_contrato')}|{ct.get('building_id')}"] = ct
+            self.contratos_por_numero.setdefault(str(ct.get('numero_contrato')), ct)
+        self.valores_pagos = {f"{vp.get('numero_contrato')}|{vp.get('building_id')}": vp.get('valor_pago') for vp in valores_pagos}
+        self.itbi = {f"{it.get('numero_contrato')}|{it.get('building_id')}": it.get('valor_itbi') for it in itbis}
+
+    def da_comissao(self, comissao: Dict) -> tuple:
+        """Retorna (contrato, valor_pago, valor_itbi) da comissão"""
+        chave = f"{comissao.get('numero_contrato')}|{comissao.get('building_id')}"
+        if comissao.get('building_id'):
+            contrato = self.contratos.get(chave)
+        else:
+            # Sem building na comissão: casa só pelo número do contrato
+            contrato = self.contratos_por_numero.get(str(comissao.get('numero_contrato')))
+            if contrato:
+                chave = f"{contrato.get('numero_contrato')}|{contrato.get('building_id')}"
+        return contrato, self.valores_pagos.get(chave), self.itbi.get(chave)
+
+
+def extrair_lotes(unidades_data) -> List[str]:
+    """Extrai numeros de lote do campo unidades (pode ser jsonb)"""
+    if not unidades_data:
+        return []
+    
+    if isinstance(unidades_data, list):
+        # Ja e uma lista de objetos
+        return [str(u.get('name', '')) for u in unidades_data if isinstance(u, dict)]
+    elif isinstance(unidades_data, str):
+        try:
+            parsed = json.loads(unidades_data)
+            if isinstance(parsed, list):
+                return [str(u.get('name', '')) for u in parsed if isinstance(u, dict)]
+        except:
+            return [unidades_data]
+    return [str(unidades_data)]
+
+
+def nome_empreendimento(building_id) -> str:
+    """Retorna o nome do empreendimento de um building_id"""
+    return EMPREENDIMENTOS.get(building_id, f'Empreendimento {building_id}')
+
+
+def extrair_corretor_principal(contrato: Dict, comissao: Dict = None) -> Optional[str]:
+    """
+    Nome do corretor principal: campo do contrato, depois a comissão e,
+    por último, o corretor marcado como principal (ou o primeiro) em brokers.
+    """
+    contrato = contrato or {}
+    comissao = comissao or {}
+
+    corretor = contrato.get('corretor') or contrato.get('broker_nome') or contrato.get('broker_name')
+    if corretor:
+        return corretor
+
+    corretor = comissao.get('broker_nome') or comissao.get('broker_name') or comissao.get('corretor')
+    if corretor:
+        return corretor
+
+    brokers = contrato.get('brokers') or contrato.get('corretores')
+    if brokers and isinstance(brokers, str):
+        try:
+            brokers = json.loads(brokers)
+        except Exception:
+            return None
+    if not brokers or not isinstance(brokers, list):
+        return None
+
+    brokers = [b for b in brokers if isinstance(b, dict)]
+    for b in brokers:
+        if b.get('main') or b.get('principal'):
+            return b.get('name') or b.get('nome')
+    if brokers:
+        return brokers[0].get('name') or brokers[0].get('nome')
+    return None
+
+
+def montar_comissao_enriquecida(comissao: Dict, contrato: Optional[Dict], valor_pago, valor_itbi,
+                                regra: Optional[Dict]) -> Dict:
+    """
+    Monta a linha de comissoes_enriquecidas de uma comissão e dos dados do seu contrato.
+    Também usado para contratos sem comissão (comissao só com numero_contrato e building_id).
+    """
+    contrato = contrato or {}
+    regra = regra or {}
+    numero_contrato = comissao.get('numero_contrato')
+    building_id = comissao.get('building_id') or contrato.get('building_id')
+    status_parcela = comissao.get('installment_status') or ''
+
+    return {
+        'id': comissao.get('id'),
+        'sienge_id': comissao.get('sienge_id'),
+        'numero_contrato': numero_contrato,
+        'building_id': building_id,
+        'company_id': comissao.get('company_id') or contrato.get('company_id'),
+        'broker_id': comissao.get('broker_id'),
+        'broker_nome': comissao.get('broker_nome') or comissao.get('broker_name'),
+        'customer_name': comissao.get('customer_name'),
+        'enterprise_name': comissao.get('enterprise_name'),
+        'unit_name': comissao.get('unit_name'),
+        'commission_value': comissao.get('commission_value'),
+        'valor_comissao': float(comissao.get('valor_comissao') or comissao.get('commission_value') or 0),
+        'installment_status': comissao.get('installment_status'),
+        'commission_date': comissao.get('commission_date'),
+        'cancelada': 'CANCEL' in status_parcela.upper(),
+        'status_aprovacao': comissao.get('status_aprovacao'),
+        'data_envio_aprovacao': comissao.get('data_envio_aprovacao'),
+        'enviado_por': comissao.get('enviado_por'),
+        'data_aprovacao': comissao.get('data_aprovacao'),
+        'aprovado_por': comissao.get('aprovado_por'),
+        'observacoes': comissao.get('observacoes'),
+        'observacoes_corretor': comissao.get('observacoes_corretor'),
+        'observacoes_direcao': comissao.get('observacoes_direcao'),
+        'auditoria_aprovada': comissao.get('auditoria_aprovada'),
+        'regra_gatilho_id': comissao.get('regra_gatilho_id'),
+        'regra_gatilho': comissao.get('regra_gatilho'),
+        'valor_gatilho': comissao.get('valor_gatilho'),
+        'atingiu_gatilho': comissao.get('atingiu_gatilho'),
+        'data_atingiu_gatilho': comissao.get('data_atingiu_gatilho'),
+        'contrato_id': contrato.get('id'),
+        'data_contrato': contrato.get('data_contrato'),
+        'nome_cliente': contrato.get('nome_cliente'),
+        'valor_total': contrato.get('valor_total'),
+        'valor_a_vista': contrato.get('valor_a_vista'),
+        'corretor_principal': extrair_corretor_principal(contrato, comissao),
+        'lote': contrato.get('numero_lote') or comissao.get('unit_name') or f"Contrato {numero_contrato}",
+        'cliente': contrato.get('nome_cliente') or comissao.get('customer_name') or 'Não informado',
+        'empreendimento_nome': nome_empreendimento(building_id),
+        'valor_pago': float(valor_pago or 0),
+        'valor_itbi': float(valor_itbi or 0),
+        'regra_nome': regra.get('nome'),
+        'tipo_regra': regra.get('tipo_regra'),
+        'regra_percentual': regra.get('percentual'),
+        'regra_inclui_itbi': regra.get('inclui_itbi'),
+        'regra_faturamento_minimo': regra.get('faturamento_minimo'),
+        'regra_percentual_auditoria': regra.get('percentual_auditoria')
+    }
+
+
+def valores_status_parcela(status_parcela: List[str] = None) -> List[str]:
+    """Valores do Sienge (em minúsculas) equivalentes aos status de parcela do filtro"""
+    valores = []
+    for status in status_parcela or []:
+        status_lower = status.lower()
+        valores.extend(MAPA_STATUS_PARCELA.get(status_lower, [status_lower]))
+    return valores
+
+
+def _filtros_periodo(data_inicio: str = '', data_fim: str = '') -> List[tuple]:
+    """Filtros (operador, valor) de data_contrato para o período; data_fim é inclusiva"""
+    filtros = []
+    if data_inicio:
+        filtros.append(('gte', data_inicio))
+    if data_fim:
+        # Inclusiva mesmo quando data_contrato tiver horário
+        dia_seguinte = (datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        filtros.append(('lt', dia_seguinte))
+    return filtros
+
+
+def _somar_kpis(linhas: List[Dict], campo: str = None) -> List[Dict]:
+    """Soma quantidade e valor_total das linhas de kpis_comissoes por campo (sem campo: total geral)"""
+    totais = {}
+    for linha in linhas:
+        chave = str(linha.get(campo) or '') if campo else ''
+        item = totais.setdefault(chave, {'quantidade': 0, 'valor_total': 0.0})
+        item['quantidade'] += int(linha.get('quantidade') or 0)
+        item['valor_total'] += float(linha.get('valor_total') or 0)
+
+    resultado = []
+    for chave, item in totais.items():
+        item['valor_total'] = round(item['valor_total'], 2)
+        resultado.append({campo: chave, **item} if campo else item)
+    # Meses em ordem cronológica; as demais dimensões do maior valor para o menor
+    if campo == 'mes':
+        resultado.sort(key=lambda item: item['mes'])
+    else:
+        resultado.sort(key=lambda item: item['valor_total'], reverse=True)
+    return resultado
+
+
+def _valor_mudou(atual, novo) -> bool:
+    """Compara um valor lido do banco com o recalculado (números com tolerância de centavo)"""
+    if isinstance(atual, (int, float)) and isinstance(novo, (int, float)) \
+            and not isinstance(atual, bool) and not isinstance(novo, bool):
+        return abs(float(atual) - float(novo)) >= 0.005
+    if atual is None or novo is None:
+        return atual is not novo
+    if isinstance(atual, str) and isinstance(novo, str) and _DATA_ISO.match(atual) and _DATA_ISO.match(novo):
+        # O banco devolve TIMESTAMPTZ com fuso ('+00:00') e colunas DATE só com o dia
+        if len(atual) == 10 or len(novo) == 10:
+            return atual[:10] != novo[:10]
+        return _instante(atual) != _instante(novo)
+    return str(atual) != str(novo)
+
+
+def _instante(texto: str):
+    """Timestamp ISO como datetime com fuso (sem fuso = UTC, como o Supabase grava)"""
+    try:
+        instante = datetime.fromisoformat(texto.replace('Z', '+00:00'))
+    except ValueError:
+        return texto
+    return instante if instante.tzinfo else instante.replace(tzinfo=timezone.utc)
@@ -0,0 +1,109 @@
+"""
+Versão dos Dados - Sistema de Comissões Young
+Carimbo de versão por assunto (ex.: 'contratos') gravado na tabela versao_dados.
+
+Quem altera os dados marca uma nova versão; cada worker compara a versão
+lida com a que usou para montar seus caches em memória e só recarrega
+quando ela muda. A leitura fica em cache por alguns segundos para não
+custar uma consulta por requisição.
+
+Os caches que se recarregam só com as linhas alteradas (atualizado_em >= marca)
+usam marca_mais_recente e inicio_releitura: a marca é a maior atualizado_em já
+lida, e cada releitura volta SOBREPOSICAO_SEGUNDOS para pegar transações que
+começaram antes dela mas só foram confirmadas depois da última leitura.
+As linhas apagadas desde a marca vêm de registros_removidos (ids_removidos).
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from leitura_paginada import ler_tabela
+
+TABELA_VERSAO = 'versao_dados'
+TABELA_REMOVIDOS = 'registros_removidos'
+
+# Segundos em que a versão lida do banco é reaproveitada
+TTL_VERSAO = 5
+
+# Margem da releitura incremental: maior que a duração de uma transação de escrita
+SOBREPOSICAO_SEGUNDOS = 120
+
+_cache: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def marcar_versao(supabase, chave: str) -> Optional[str]:
+    """Grava uma nova versão (carimbo de tempo) para a chave e a retorna"""
+    versao = datetime.now().isoformat()
+    try:
+        supabase.table(TABELA_VERSAO).upsert({
+            'chave': chave,
+            'versao': versao,
+            'atualizado_em': versao
+        }, on_conflict='chave').execute()
+    except Exception as e:
+        print(f"[Versão] Erro ao marcar versão '{chave}' (tabela pode não existir): {str(e)}")
+        return None
+
+    with _lock:
+        _cache[chave] = (versao, time.monotonic())
+    return versao
+
+
+def obter_versao(supabase, chave: str, ttl: float = TTL_VERSAO) -> Optional[str]:
+    """Retorna a versão atual da chave (None se nunca marcada ou se a tabela não existir)"""
+    agora = time.monotonic()
+    with _lock:
+        em_cache = _cache.get(chave)
+    if em_cache and agora - em_cache[1] < ttl:
+        return em_cache[0]
+
+    versao = None
+    try:
+        result = supabase.table(TABELA_VERSAO)\
+            .select('versao')\
+            .eq('chave', chave)\
+            .limit(1)\
+            .execute()
+        if result.data:
+            versao = result.data[0].get('versao')
+    except Exception as e:
+        print(f"[Versão] Erro ao ler versão '{chave}': {str(e)}")
+
+    with _lock:
+        _cache[chave] = (versao, agora)
+    return versao
+
+
+def marca_mais_recente(marca: Optional[datetime], atualizado_em) -> Optional[datetime]:
+    """A maior entre a marca e o atualizado_em (texto ISO do Supabase) de uma linha lida"""
+    if not atualizado_em:
+        return marca
+    try:
+        instante = datetime.fromisoformat(str(atualizado_em).replace('Z', '+00:00'))
+    except ValueError:
+        return marca
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=timezone.utc)
+    return instante if marca is None or instante > marca else marca
+
+
+def inicio_releitura(marca: datetime) -> str:
+    """Valor para o filtro atualizado_em >= ... da próxima releitura incremental"""
+    return (marca - timedelta(seconds=SOBREPOSICAO_SEGUNDOS)).isoformat()
+
+
+def ids_removidos(supabase, tabela: str, marca: datetime) -> Optional[List[int]]:
+    """Ids apagados da tabela desde a marca (com a mesma margem); None se a tabela de remoções não existir"""
+    try:
+        # Um id repetido (apagado, recriado e apagado de novo) basta uma vez
+        return [r['registro_id'] for r in ler_tabela(
+            supabase, TABELA_REMOVIDOS, 'registro_id',
+            filtros=[('eq', 'tabela', tabela), ('gte', 'removido_em', inicio_releitura(marca))],
+            ordem='registro_id'
+        )]
+    except Exception as e:
+        print(f"[Versão] Erro ao ler remoções de '{tabela}' (tabela pode não existir): {str(e)}")
+        return None